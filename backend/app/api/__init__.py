@@ -1,2 +1,2 @@
 # API Package
-from . import auth, budgets, cards, transactions, policies, analytics, card_budgets, receipts 
\ No newline at end of file
+# Routers are imported individually by app.main so their import cost can be measured
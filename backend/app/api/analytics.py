@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.security import HTTPBearer
-from ..models.analytics import SpendingAnalyticsResponse, RecentTransactionResponse, BalanceResponse
+from ..models.analytics import SpendingAnalyticsResponse, RecentTransactionResponse, BalanceResponse, DashboardResponse, TimeSeriesResponse
 from ..services.analytics_service import AnalyticsService
 from ..utils.jwt import verify_token
 
@@ -35,4 +35,27 @@ async def get_balances(
     """Get balance information for the user"""
     payload = verify_token(token.credentials)
     user_id = payload.get("sub")
-    return await AnalyticsService.get_balances(user_id, period) 
\ No newline at end of file
+    return await AnalyticsService.get_balances(user_id, period)
+
+@router.get("/dashboard", response_model=DashboardResponse)
+async def get_dashboard(
+    token: str = Depends(security),
+    period: str = Query("month", description="Time period: week, month, quarter, year"),
+    recent_limit: int = Query(10, description="Number of recent transactions to return")
+):
+    """Get balances, spending, recent transactions and cards from one shared fetch"""
+    payload = verify_token(token.credentials)
+    user_id = payload.get("sub")
+    return await AnalyticsService.get_dashboard(user_id, period, recent_limit)
+
+@router.get("/timeseries", response_model=TimeSeriesResponse)
+async def get_timeseries(
+    token: str = Depends(security),
+    period: str = Query("year", description="Time period: week, month, quarter, year"),
+    interval: str = Query("month", description="Bucket size: day, week, month"),
+    split_by: str = Query(None, description="Optional split: card, budget, category")
+):
+    """Get spend per bucket for trend charts, with empty buckets filled"""
+    payload = verify_token(token.credentials)
+    user_id = payload.get("sub")
+    return await AnalyticsService.get_timeseries(user_id, period, interval, split_by)
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from fastapi.security import HTTPBearer
 from ..models.auth import UserSignup, UserLogin, UserResponse, UserProfileUpdate
 from ..services.auth_service import AuthService
+from ..services.analytics_service import AnalyticsService
+from ..config.settings import settings
 from ..utils.jwt import verify_token
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
@@ -13,9 +15,13 @@ async def signup(user_data: UserSignup):
     return await AuthService.signup(user_data)
 
 @router.post("/login")
-async def login(user_data: UserLogin):
+async def login(user_data: UserLogin, background_tasks: BackgroundTasks):
     """User login endpoint"""
-    return await AuthService.login(user_data)
+    result = await AuthService.login(user_data)
+    if settings.LOGIN_WARMUP_TTL > 0:
+        # Warm the dashboard's caches once the response has been sent
+        background_tasks.add_task(AnalyticsService.warm_account, result["user"]["id"])
+    return result
 
 @router.get("/profile")
 async def get_profile(token: str = Depends(security)):
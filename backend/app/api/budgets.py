@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import HTTPBearer
-from ..models.budget import BudgetCreate, BudgetResponse
+from ..models.budget import BudgetCreate, BudgetResponse, BudgetBulkRequest, BudgetBulkResponse
 from ..services.budget_service import BudgetService
 from ..utils.jwt import verify_token
 
@@ -21,6 +21,13 @@ async def get_budgets(token: str = Depends(security)):
     user_id = payload.get("sub")
     return await BudgetService.get_budgets(user_id)
 
+@router.post("/bulk", response_model=BudgetBulkResponse)
+async def bulk_budgets(bulk_data: BudgetBulkRequest, token: str = Depends(security)):
+    """Create, update and delete many budgets in one request, with a result per item"""
+    payload = verify_token(token.credentials)
+    user_id = payload.get("sub")
+    return await BudgetService.bulk_budgets(user_id, bulk_data)
+
 @router.put("/{budget_id}", response_model=BudgetResponse)
 async def update_budget(budget_id: str, budget_data: BudgetCreate, token: str = Depends(security)):
     """Update a budget"""
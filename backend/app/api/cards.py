@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import HTTPBearer
-from ..models.card import CardCreate, CardResponse
+from ..models.card import CardCreate, CardResponse, CardBulkRequest, CardBulkResponse
 from ..services.card_service import CardService
 from ..services.analytics_service import AnalyticsService
 from ..utils.jwt import verify_token
@@ -22,6 +22,13 @@ async def create_card(card_data: CardCreate, token: str = Depends(security)):
     user_id = payload.get("sub")
     return await CardService.create_card(user_id, card_data)
 
+@router.post("/bulk", response_model=CardBulkResponse)
+async def bulk_cards(bulk_data: CardBulkRequest, token: str = Depends(security)):
+    """Create, update and delete many cards in one request, with a result per item"""
+    payload = verify_token(token.credentials)
+    user_id = payload.get("sub")
+    return await CardService.bulk_cards(user_id, bulk_data)
+
 @router.put("/{card_id}", response_model=CardResponse)
 async def update_card(card_id: str, card_data: CardCreate, token: str = Depends(security)):
     """Update a card"""
@@ -0,0 +1,53 @@
+from datetime import timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPBearer
+from ..config.settings import settings
+from ..models.transaction import StreamTokenResponse
+from ..utils.events import STREAM_TOKEN_PURPOSE, event_bus
+from ..utils.jwt import create_signed_token, verify_signed_token, verify_token
+
+router = APIRouter(prefix="/api/events", tags=["Events"])
+security = HTTPBearer(auto_error=False)
+
+@router.post("/token", response_model=StreamTokenResponse)
+async def create_stream_token(token: str = Depends(HTTPBearer())):
+    """Issue a short-lived token for opening a stream from EventSource, which
+    cannot send an Authorization header"""
+    payload = verify_token(token.credentials)
+    return StreamTokenResponse(
+        token=create_signed_token(
+            {"sub": payload.get("sub")},
+            STREAM_TOKEN_PURPOSE,
+            timedelta(seconds=settings.EVENTS_TOKEN_TTL)
+        ),
+        expires_in=settings.EVENTS_TOKEN_TTL
+    )
+
+@router.get("/stream")
+async def stream_events(
+    token: str = Depends(security),
+    stream_token: str = Query(None, alias="token", description="Token from POST /api/events/token, for EventSource clients")
+):
+    """Server-Sent Events stream of the account's transaction changes and budget balances"""
+    if token:
+        user_id = verify_token(token.credentials).get("sub")
+    elif stream_token:
+        payload = verify_signed_token(stream_token, STREAM_TOKEN_PURPOSE)
+        if not payload:
+            raise HTTPException(status_code=401, detail="Invalid or expired stream token")
+        user_id = payload.get("sub")
+    else:
+        raise HTTPException(status_code=403, detail="Not authenticated")
+    return StreamingResponse(
+        event_bus.stream(user_id, keepalive=settings.EVENTS_KEEPALIVE_SECONDS),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop proxies from buffering the stream
+            "X-Accel-Buffering": "no",
+            # GZipMiddleware would hold events in its compressor; an explicit
+            # encoding makes it pass the stream through untouched
+            "Content-Encoding": "identity",
+        }
+    )
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.security import HTTPBearer
-from ..models.policy import PolicyCreate, PolicyResponse
+from ..models.policy import PolicyCreate, PolicyResponse, PolicyEvaluationResponse
 from ..services.policy_service import PolicyService
 from ..utils.jwt import verify_token
 
@@ -19,4 +19,15 @@ async def get_policies(token: str = Depends(security)):
     """Get all policies for the user"""
     payload = verify_token(token.credentials)
     user_id = payload.get("sub")
-    return await PolicyService.get_policies(user_id) 
\ No newline at end of file
+    return await PolicyService.get_policies(user_id)
+
+@router.get("/violations", response_model=PolicyEvaluationResponse)
+async def get_policy_violations(
+    start_date: str = Query(None, description="Only evaluate transactions on or after this ISO date"),
+    end_date: str = Query(None, description="Only evaluate transactions on or before this ISO date"),
+    token: str = Depends(security)
+):
+    """Evaluate historical transactions against the user's policies"""
+    payload = verify_token(token.credentials)
+    user_id = payload.get("sub")
+    return await PolicyService.evaluate_transactions(user_id, start_date, end_date)
@@ -1,17 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, Header, HTTPException, UploadFile, File, Form, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer
+from starlette.requests import ClientDisconnect
 from typing import Optional
-from ..models.receipt import ReceiptCreate, ReceiptResponse, ReceiptUploadResponse, ReceiptUpdate
+from ..config.storage import TUS_VERSION
+from ..models.receipt import ReceiptCreate, ReceiptResponse, ReceiptUploadResponse, ReceiptUpdate, ReceiptPresignRequest, ReceiptPresignResponse, ReceiptCompleteRequest
 from ..services.receipt_service import ReceiptService
+from ..services.upload_service import ResumableUploadService, PresignedUploadService
 from ..utils.jwt import verify_token
+from ..utils.idempotency import idempotency_store, fingerprint, file_digest, REPLAYED_HEADER
 
 router = APIRouter(prefix="/api/receipts", tags=["Receipts"])
 security = HTTPBearer()
 
 @router.post("/upload", response_model=ReceiptUploadResponse)
 async def upload_receipt(
+    response: Response,
     file: UploadFile = File(...),
-    token: str = Depends(security)
+    token: str = Depends(security),
+    idempotency_key: str = Header(None, description="Retries with the same key replay the first response")
 ):
     """Upload a receipt file only"""
     print(f"=== UPLOAD RECEIPT API ENDPOINT ===")
@@ -30,7 +37,18 @@ async def upload_receipt(
         )
         print(f"DEBUG: Created receipt data object: {receipt_data}")
         
-        result = await ReceiptService.upload_receipt_file(user_id, file, receipt_data)
+        # Retries of the same upload are answered without touching storage. Only
+        # keyed requests pay for hashing the file.
+        request_fingerprint = None
+        if idempotency_key is not None:
+            request_fingerprint = fingerprint(file.filename, file.content_type, await run_in_threadpool(file_digest, file.file))
+        result, replayed = await idempotency_store.run(
+            user_id, "upload_receipt", idempotency_key,
+            request_fingerprint,
+            lambda: ReceiptService.upload_receipt_file(user_id, file, receipt_data)
+        )
+        if replayed:
+            response.headers[REPLAYED_HEADER] = "true"
         print(f"DEBUG: Upload completed successfully: {result}")
         return result
         
@@ -38,10 +56,92 @@ async def upload_receipt(
         print(f"DEBUG: Upload endpoint error: {str(e)}")
         raise
 
+@router.post("/upload-and-create", response_model=ReceiptUploadResponse)
+async def upload_and_create_receipt(
+    response: Response,
+    file: UploadFile = File(...),
+    name: Optional[str] = Form(None),
+    description: Optional[str] = Form(None),
+    amount: Optional[float] = Form(None),
+    date_of_purchase: Optional[str] = Form(None),
+    transaction_id: Optional[str] = Form(None, description="Transaction to attach the receipt to"),
+    token: str = Depends(security),
+    idempotency_key: str = Header(None, description="Retries with the same key replay the first response")
+):
+    """Upload a receipt file and create its record in one request"""
+    print(f"=== UPLOAD AND CREATE RECEIPT API ENDPOINT ===")
+    print(f"DEBUG: File: {file.filename}")
+    
+    try:
+        payload = verify_token(token.credentials)
+        user_id = payload.get("sub")
+        print(f"DEBUG: Authenticated user ID: {user_id}")
+        
+        receipt_data = ReceiptCreate(
+            name=name or file.filename or "Uploaded File",
+            type="image" if file.content_type and file.content_type.startswith("image/") else "document",
+            description=description,
+            amount=amount,
+            date_of_purchase=date_of_purchase
+        )
+        print(f"DEBUG: Created receipt data object: {receipt_data}")
+        
+        request_fingerprint = None
+        if idempotency_key is not None:
+            request_fingerprint = fingerprint(file.filename, file.content_type, await run_in_threadpool(file_digest, file.file), receipt_data.model_dump(), transaction_id)
+        result, replayed = await idempotency_store.run(
+            user_id, "upload_and_create_receipt", idempotency_key,
+            request_fingerprint,
+            lambda: ReceiptService.upload_and_create_receipt(user_id, file, receipt_data, transaction_id)
+        )
+        if replayed:
+            response.headers[REPLAYED_HEADER] = "true"
+        print(f"DEBUG: Upload and create completed successfully: {result}")
+        return result
+        
+    except Exception as e:
+        print(f"DEBUG: Upload and create endpoint error: {str(e)}")
+        raise
+
+@router.post("/presign", response_model=ReceiptPresignResponse)
+async def presign_receipt_upload(request: ReceiptPresignRequest, token: str = Depends(security)):
+    """Get a signed URL to upload a receipt file straight to storage"""
+    print(f"=== PRESIGN RECEIPT UPLOAD API ENDPOINT ===")
+    payload = verify_token(token.credentials)
+    user_id = payload.get("sub")
+    print(f"DEBUG: Authenticated user ID: {user_id}")
+    
+    return await PresignedUploadService.presign(user_id, request)
+
+@router.post("/complete", response_model=ReceiptUploadResponse)
+async def complete_receipt_upload(
+    request: ReceiptCompleteRequest,
+    response: Response,
+    token: str = Depends(security),
+    idempotency_key: str = Header(None, description="Retries with the same key replay the first response")
+):
+    """Create the receipt for a file uploaded to a presigned URL"""
+    print(f"=== COMPLETE RECEIPT UPLOAD API ENDPOINT ===")
+    payload = verify_token(token.credentials)
+    user_id = payload.get("sub")
+    print(f"DEBUG: Authenticated user ID: {user_id}")
+    
+    result, replayed = await idempotency_store.run(
+        user_id, "complete_receipt_upload", idempotency_key,
+        fingerprint(request.model_dump()),
+        lambda: PresignedUploadService.complete(user_id, request)
+    )
+    if replayed:
+        response.headers[REPLAYED_HEADER] = "true"
+    print(f"DEBUG: Presigned upload completed: {result}")
+    return result
+
 @router.post("/", response_model=ReceiptResponse)
 async def create_receipt(
     receipt_data: ReceiptCreate,
-    token: str = Depends(security)
+    response: Response,
+    token: str = Depends(security),
+    idempotency_key: str = Header(None, description="Retries with the same key replay the first response")
 ):
     """Create a receipt record in the database"""
     print(f"=== CREATE RECEIPT API ENDPOINT ===")
@@ -53,7 +153,13 @@ async def create_receipt(
         user_id = payload.get("sub")
         print(f"DEBUG: Authenticated user ID: {user_id}")
         
-        result = await ReceiptService.create_receipt(user_id, receipt_data)
+        result, replayed = await idempotency_store.run(
+            user_id, "create_receipt", idempotency_key,
+            fingerprint(receipt_data.model_dump()),
+            lambda: ReceiptService.create_receipt(user_id, receipt_data)
+        )
+        if replayed:
+            response.headers[REPLAYED_HEADER] = "true"
         print(f"DEBUG: Receipt created successfully: {result}")
         return result
         
@@ -61,6 +167,79 @@ async def create_receipt(
         print(f"DEBUG: Create receipt endpoint error: {str(e)}")
         raise
 
+@router.post("/uploads", status_code=201)
+async def create_resumable_upload(
+    token: str = Depends(security),
+    upload_length: int = Header(..., description="Total file size in bytes"),
+    upload_metadata: str = Header(None, description="TUS metadata; filename and filetype are used"),
+):
+    """Start a resumable (TUS) receipt upload; continue it with PATCH on the returned Location"""
+    print(f"=== CREATE RESUMABLE UPLOAD API ENDPOINT ===")
+    payload = verify_token(token.credentials)
+    user_id = payload.get("sub")
+    print(f"DEBUG: Authenticated user ID: {user_id}")
+    
+    metadata = ResumableUploadService.parse_metadata(upload_metadata)
+    upload_id = await ResumableUploadService.create_upload(user_id, upload_length, metadata)
+    return Response(status_code=201, headers={
+        "Location": f"{router.prefix}/uploads/{upload_id}",
+        "Tus-Resumable": TUS_VERSION,
+    })
+
+@router.head("/uploads/{upload_id}")
+async def get_resumable_upload_offset(upload_id: str, token: str = Depends(security)):
+    """Report how many bytes of a resumable upload the bucket has"""
+    payload = verify_token(token.credentials)
+    user_id = payload.get("sub")
+    
+    offset, length = await ResumableUploadService.get_offset(user_id, upload_id)
+    return Response(status_code=200, headers={
+        "Upload-Offset": str(offset),
+        "Upload-Length": str(length),
+        "Tus-Resumable": TUS_VERSION,
+        "Cache-Control": "no-store",
+    })
+
+@router.patch("/uploads/{upload_id}")
+async def append_resumable_upload(
+    upload_id: str,
+    request: Request,
+    token: str = Depends(security),
+    upload_offset: int = Header(..., description="Offset of the first byte in this request"),
+    content_type: str = Header(None),
+):
+    """Append to a resumable upload; the response's Upload-Offset is where to continue"""
+    print(f"=== APPEND RESUMABLE UPLOAD API ENDPOINT ===")
+    payload = verify_token(token.credentials)
+    user_id = payload.get("sub")
+    
+    if content_type != "application/offset+octet-stream":
+        raise HTTPException(status_code=415, detail="Content-Type must be application/offset+octet-stream")
+    
+    async def body():
+        # A dropped connection ends the body; whole chunks already forwarded are kept
+        try:
+            async for data in request.stream():
+                yield data
+        except ClientDisconnect:
+            print("DEBUG: Client disconnected mid-upload")
+    
+    offset, length, url = await ResumableUploadService.append(user_id, upload_id, upload_offset, body())
+    headers = {"Upload-Offset": str(offset), "Tus-Resumable": TUS_VERSION}
+    if url:
+        # Complete: pass this URL to POST /api/receipts/ to create the receipt
+        headers["Upload-Url"] = url
+    return Response(status_code=204, headers=headers)
+
+@router.delete("/uploads/{upload_id}", status_code=204)
+async def cancel_resumable_upload(upload_id: str, token: str = Depends(security)):
+    """Abandon a resumable upload"""
+    payload = verify_token(token.credentials)
+    user_id = payload.get("sub")
+    
+    await ResumableUploadService.cancel(user_id, upload_id)
+    return Response(status_code=204, headers={"Tus-Resumable": TUS_VERSION})
+
 @router.get("/", response_model=list[ReceiptResponse])
 async def get_receipts(token: str = Depends(security)):
     """Get all receipts for the authenticated user"""
@@ -1,18 +1,62 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from fastapi.security import HTTPBearer
-from ..models.transaction import TransactionCreate, TransactionResponse
+from ..models.transaction import TransactionCreate, TransactionResponse, AuthorizationRequest, AuthorizationResponse, TransactionSearchResponse
 from ..services.transaction_service import TransactionService
+from ..services.authorization_service import AuthorizationService
+from ..services.search_service import SearchService
 from ..utils.jwt import verify_token
+from ..utils.idempotency import idempotency_store, fingerprint, REPLAYED_HEADER
+from ..utils.columnar import negotiate_format, columnar_response, JSON_MEDIA_TYPE
+
+# Columns repeated across many rows are dictionary-encoded in the columnar format
+TRANSACTION_COLUMNS = list(TransactionResponse.model_fields.keys())
+TRANSACTION_DICTIONARY_COLUMNS = ["card_budget_id", "card_id", "budget_id", "category"]
 
 router = APIRouter(prefix="/api/transactions", tags=["Transactions"])
 security = HTTPBearer()
 
 @router.post("/", response_model=TransactionResponse)
-async def create_transaction(transaction_data: TransactionCreate, token: str = Depends(security)):
+async def create_transaction(
+    transaction_data: TransactionCreate,
+    response: Response,
+    token: str = Depends(security),
+    idempotency_key: str = Header(None, description="Retries with the same key replay the first response")
+):
     """Create a new transaction"""
     payload = verify_token(token.credentials)
     user_id = payload.get("sub")
-    return await TransactionService.create_transaction(user_id, transaction_data)
+    result, replayed = await idempotency_store.run(
+        user_id, "create_transaction", idempotency_key,
+        fingerprint(transaction_data.model_dump()),
+        lambda: TransactionService.create_transaction(user_id, transaction_data)
+    )
+    if replayed:
+        response.headers[REPLAYED_HEADER] = "true"
+    return result
+
+@router.post("/authorize", response_model=AuthorizationResponse)
+async def authorize_transaction(authorization_data: AuthorizationRequest, token: str = Depends(security)):
+    """Approve or decline a spend against card status and remaining budget"""
+    payload = verify_token(token.credentials)
+    user_id = payload.get("sub")
+    return await AuthorizationService.authorize(user_id, authorization_data.card_budget_id, authorization_data.amount)
+
+@router.get("/search", response_model=TransactionSearchResponse)
+async def search_transactions(
+    q: str = Query(..., min_length=1, description="Words to match in name, merchant, category or description"),
+    limit: int = Query(20, ge=1, le=100, description="Results per page"),
+    offset: int = Query(0, ge=0, description="Number of ranked results to skip"),
+    fuzzy: bool = Query(True, description="Also match misspellings by trigram similarity"),
+    token: str = Depends(security)
+):
+    """Search transactions, best matches first.
+
+    Every word must match, either exactly, as a prefix or (with fuzzy) as a
+    close misspelling.
+    """
+    payload = verify_token(token.credentials)
+    user_id = payload.get("sub")
+    return await SearchService.search_transactions(user_id, q, limit, offset, fuzzy)
 
 @router.put("/{transaction_id}", response_model=TransactionResponse)
 async def update_transaction(transaction_id: str, transaction_data: TransactionCreate, token: str = Depends(security)):
@@ -30,12 +74,26 @@ async def delete_transaction(transaction_id: str, token: str = Depends(security)
 
 @router.get("/", response_model=list[TransactionResponse])
 async def get_transactions(
+    request: Request,
+    response: Response,
     token: str = Depends(security),
     card_id: str = Query(None),
     budget_id: str = Query(None),
-    card_budget_id: str = Query(None)
+    card_budget_id: str = Query(None),
+    response_format: str = Query(None, alias="format", description="Response format: json, columnar, msgpack (overrides Accept)")
 ):
-    """Get transactions with optional filters"""
+    """Get transactions with optional filters.
+
+    Clients sending Accept: application/vnd.takeback.columnar+json (or
+    application/x-msgpack) receive parallel column arrays instead of objects.
+    """
     payload = verify_token(token.credentials)
     user_id = payload.get("sub")
-    return await TransactionService.get_transactions(user_id, card_id, budget_id, card_budget_id) 
\ No newline at end of file
+    media_type = negotiate_format(request.headers.get("accept"), response_format)
+    transactions = await TransactionService.get_transactions(user_id, card_id, budget_id, card_budget_id)
+    if media_type == JSON_MEDIA_TYPE:
+        # The same URL serves several representations; keep caches from mixing them
+        response.headers["Vary"] = "Accept"
+        return transactions
+    rows = [t.model_dump() for t in transactions]
+    return columnar_response(rows, TRANSACTION_COLUMNS, TRANSACTION_DICTIONARY_COLUMNS, media_type) 
\ No newline at end of file
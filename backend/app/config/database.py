@@ -1,20 +1,81 @@
-from supabase import create_client, Client
+import threading
 from .settings import settings
 
-def get_supabase_client() -> Client:
-    """Initialize and return Supabase client"""
-    if (settings.SUPABASE_URL == "https://placeholder.supabase.co" or 
-        settings.SUPABASE_KEY == "placeholder_key"):
-        print("DEBUG: Supabase client not initialized - using placeholder credentials")
-        return None
-    
-    try:
-        client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
-        print("DEBUG: Supabase client initialized successfully")
-        return client
-    except Exception as e:
-        print(f"DEBUG: Failed to initialize Supabase client: {e}")
-        return None
+# The Supabase SDK is imported lazily (see supabase_pool.py) so that cold starts
+# which never touch the database do not pay for it. The client is created by
+# init_supabase_client() - from the FastAPI lifespan handler when
+# SUPABASE_EAGER_INIT is set, otherwise on first use - and its connection pool
+# is closed by close_supabase_client() on shutdown.
+_client = None
+_initialized = False
+_lock = threading.Lock()
+
+def init_supabase_client():
+    """Initialize the pooled Supabase client (idempotent)"""
+    global _client, _initialized
+
+    with _lock:
+        if _initialized:
+            return _client
+        _initialized = True
+
+        if (settings.SUPABASE_URL == "https://placeholder.supabase.co" or
+            settings.SUPABASE_KEY == "placeholder_key"):
+            print("DEBUG: Supabase client not initialized - using placeholder credentials")
+            return None
+
+        try:
+            from ..utils.startup import startup_report
+            with startup_report.measure("supabase SDK", kind="import"):
+                from . import supabase_pool
+            with startup_report.measure("supabase client", kind="init"):
+                _client = supabase_pool.create_pooled_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+            print("DEBUG: Supabase client initialized successfully")
+        except Exception as e:
+            print(f"DEBUG: Failed to initialize Supabase client: {e}")
+            _client = None
+        return _client
+
+def close_supabase_client():
+    """Close the shared connection pool; the next use re-initializes it"""
+    global _client, _initialized
+
+    with _lock:
+        if _client is not None:
+            try:
+                from . import supabase_pool
+                supabase_pool.close_transport()
+            except Exception as e:
+                print(f"DEBUG: Failed to close Supabase connection pool: {e}")
+        _client = None
+        _initialized = False
+
+def get_supabase_client():
+    """Return the Supabase client, initializing it on first use.
+
+    Serverless runtimes may never run the lifespan handler, so the client is
+    also created lazily here.
+    """
+    if not _initialized:
+        return init_supabase_client()
+    return _client
+
+class SupabaseProxy:
+    """Module-level stand-in for the client.
+
+    Services keep doing `from ..config.database import supabase`; attribute
+    access resolves to the current pooled client, and truthiness reports
+    whether Supabase is configured.
+    """
+
+    def __getattr__(self, name):
+        client = get_supabase_client()
+        if client is None:
+            raise AttributeError(f"Supabase not configured (accessing '{name}')")
+        return getattr(client, name)
+
+    def __bool__(self):
+        return get_supabase_client() is not None
 
 # Global supabase client instance
-supabase = get_supabase_client() 
\ No newline at end of file
+supabase = SupabaseProxy()
@@ -5,15 +5,33 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-print("=== TakeBack Backend Starting ===")
-print(f"Python version: {sys.version}")
-print(f"Current working directory: {os.getcwd()}")
-
 class Settings:
     # Supabase Configuration
     SUPABASE_URL = os.getenv("SUPABASE_URL", "https://placeholder.supabase.co")
     SUPABASE_KEY = os.getenv("SUPABASE_KEY", "placeholder_key")
     
+    # Supabase HTTP Transport
+    # One keep-alive pool is shared by the PostgREST, storage and auth clients
+    SUPABASE_HTTP2 = os.getenv("SUPABASE_HTTP2", "true").lower() == "true"
+    SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20"))
+    SUPABASE_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("SUPABASE_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "30"))
+    SUPABASE_CONNECT_RETRIES = int(os.getenv("SUPABASE_CONNECT_RETRIES", "1"))
+    # Timeouts in seconds
+    SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "30"))
+    SUPABASE_CONNECT_TIMEOUT = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "5"))
+    SUPABASE_POOL_TIMEOUT = float(os.getenv("SUPABASE_POOL_TIMEOUT", "5"))
+    # Create the client during app startup instead of on first use.
+    # Off by default on Vercel, where it would only lengthen cold starts.
+    SUPABASE_EAGER_INIT = os.getenv("SUPABASE_EAGER_INIT", "false" if os.getenv("VERCEL") else "true").lower() == "true"
+    
+    # Supabase Storage REST endpoint (override to point uploads at a local storage server)
+    SUPABASE_STORAGE_URL = os.getenv("SUPABASE_STORAGE_URL") or f"{SUPABASE_URL.rstrip('/')}/storage/v1"
+    
+    # Direct Postgres connection string, used only by the migration runner
+    # (python -m migrations.runner); the app itself talks to Supabase over HTTP
+    DATABASE_URL = os.getenv("DATABASE_URL")
+    
     # JWT Configuration
     JWT_SECRET = os.getenv("JWT_SECRET", "placeholder_secret")
     JWT_ALGORITHM = "HS256"
@@ -36,7 +54,145 @@ class Settings:
     PROJECT_NAME = "TakeBack API"
     VERSION = "1.0.0"
 
+    # Server (run.py)
+    # "production" runs multiple workers without reload; anything else is development
+    APP_ENV = os.getenv("APP_ENV", "development").lower()
+    HOST = os.getenv("HOST", "0.0.0.0")
+    PORT = int(os.getenv("PORT", "8000"))
+    # Worker processes in production (0 = one per available core)
+    WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0"))
+    # Seconds an idle client connection is kept open
+    KEEPALIVE_TIMEOUT = int(os.getenv("KEEPALIVE_TIMEOUT", "5"))
+    # Pending connections queued by the listening socket
+    SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))
+    # Seconds in-flight requests get to finish on shutdown
+    GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+    # Recycle a worker after this many requests, with jitter (0 = never)
+    MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", "0"))
+    # Comma-separated proxy addresses whose X-Forwarded-For/-Proto are trusted, so
+    # the client address (and the rate limit key before login) is the real client's.
+    # "*" trusts any peer; only use it when the server is reachable solely through the proxy
+    FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+    # Response Compression
+    # Responses smaller than this many bytes are sent uncompressed
+    GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1024"))
+
+    # Analytics
+    # Seconds to keep coalesced analytics results (0 = only share in-flight work)
+    ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "5"))
+    # Seconds to keep an account's cards/budgets/card_budgets graph; it is also checked
+    # against the account's entity version (migrations/0011) on every use
+    ENTITY_GRAPH_CACHE_TTL = float(os.getenv("ENTITY_GRAPH_CACHE_TTL", "60"))
+    # Prefetch the dashboard and spend totals in the background after login, in the
+    # login's worker only (dashboard kept this many seconds; 0 = off)
+    LOGIN_WARMUP_TTL = float(os.getenv("LOGIN_WARMUP_TTL", "30"))
+
+    # Spend Authorization
+    # Latency budget for POST /api/transactions/authorize, in milliseconds, once the
+    # account's graph and running totals are loaded (a cold account loads them first);
+    # it covers the entity version check, one database round trip
+    AUTHORIZATION_TIMEOUT_MS = int(os.getenv("AUTHORIZATION_TIMEOUT_MS", "250"))
+    # Approve instead of decline when the latency budget is exceeded
+    AUTHORIZATION_FAIL_OPEN = os.getenv("AUTHORIZATION_FAIL_OPEN", "false").lower() == "true"
+    # Seconds before a card_budget's running period spend is reloaded
+    AUTHORIZATION_SPEND_TTL = float(os.getenv("AUTHORIZATION_SPEND_TTL", "60"))
+
+    # Transaction Archive (migrations/0001_transactions_archive.sql)
+    # Move transactions older than this many days to transactions_archive (0 = off).
+    # Keep it above 365 so every analytics period reads only the hot table.
+    TRANSACTION_ARCHIVE_DAYS = int(os.getenv("TRANSACTION_ARCHIVE_DAYS", "0"))
+    # Rows moved per archive_transactions() call
+    TRANSACTION_ARCHIVE_BATCH_SIZE = int(os.getenv("TRANSACTION_ARCHIVE_BATCH_SIZE", "5000"))
+
+    # Bulk Endpoints
+    # Maximum create + update + delete items in one bulk request
+    BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "200"))
+
+    # Idempotency-Key Replay
+    # "local" keeps keys per process, without touching the database (single
+    # worker only); "database" shares them across workers through the
+    # idempotency_keys table (migrations/0008)
+    IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "local")
+    # Seconds a completed write's response can be replayed to a retry
+    IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+    # Seconds an unfinished request holds its key before a retry may take it over
+    IDEMPOTENCY_LEASE = float(os.getenv("IDEMPOTENCY_LEASE", "60"))
+    # Stored responses kept in memory by the local backend (least recently used are dropped)
+    IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+    # Seconds between prunes of expired keys by the database backend (0 = leave it to the job)
+    IDEMPOTENCY_PRUNE_INTERVAL = float(os.getenv("IDEMPOTENCY_PRUNE_INTERVAL", "3600"))
+
+    # Policies
+    # Seconds a worker keeps an account's compiled policies; policy changes made
+    # through another worker apply to new transactions here within this long
+    POLICY_CACHE_TTL = float(os.getenv("POLICY_CACHE_TTL", "30"))
+
+    # Transaction Search
+    # Seconds an account's in-memory search index lives before it is rebuilt. Each
+    # search also checks it against transaction_versions (migrations/0006), so writes
+    # from other workers are seen at once; only without that table can an index
+    # lag behind them, for at most this long
+    SEARCH_INDEX_TTL = float(os.getenv("SEARCH_INDEX_TTL", "900"))
+    # Number of account indexes kept in memory (least recently used are dropped)
+    SEARCH_INDEX_MAX_ACCOUNTS = int(os.getenv("SEARCH_INDEX_MAX_ACCOUNTS", "256"))
+    # Minimum trigram similarity (0-1) for a fuzzy match
+    SEARCH_FUZZY_THRESHOLD = float(os.getenv("SEARCH_FUZZY_THRESHOLD", "0.3"))
+
+    # Receipt Uploads
+    # Largest receipt file accepted, in bytes
+    RECEIPT_MAX_FILE_SIZE = int(os.getenv("RECEIPT_MAX_FILE_SIZE", str(100 * 1024 * 1024)))
+    # Seconds a resumable upload (POST /api/receipts/uploads) can be continued
+    RECEIPT_UPLOAD_TTL = int(os.getenv("RECEIPT_UPLOAD_TTL", "86400"))
+    # Bytes per chunk sent to the bucket; Supabase resumable uploads require 6MB
+    STORAGE_CHUNK_SIZE = int(os.getenv("STORAGE_CHUNK_SIZE", str(6 * 1024 * 1024)))
+    # Retries per chunk after a network error or 5xx from storage
+    STORAGE_CHUNK_RETRIES = int(os.getenv("STORAGE_CHUNK_RETRIES", "3"))
+    # Seconds a presigned upload (POST /api/receipts/presign) can be completed; enforced
+    # by POST /api/receipts/complete, as Supabase keeps the upload URL valid for two hours
+    RECEIPT_PRESIGN_TTL = int(os.getenv("RECEIPT_PRESIGN_TTL", "600"))
+
+    # Live Updates (GET /api/events/stream)
+    # "local" reaches streams in the same worker; "redis" fans out across workers
+    EVENTS_TRANSPORT = os.getenv("EVENTS_TRANSPORT", "local").lower()
+    EVENTS_REDIS_URL = os.getenv("EVENTS_REDIS_URL", "")
+    # Events buffered per stream before the oldest are dropped
+    EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+    # Seconds between keep-alive comments on an idle stream
+    EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+    # Seconds a stream token (POST /api/events/token) can open a stream; it lands in
+    # access logs as part of the URL, so keep it short
+    EVENTS_TOKEN_TTL = int(os.getenv("EVENTS_TOKEN_TTL", "60"))
+
+    # Rate Limiting (per account, or per client address before login)
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    # Token bucket: sustained cost per second, and the most that can be spent at once
+    RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", "10"))
+    RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "60"))
+    # Requests one account may have in flight at once
+    RATE_LIMIT_MAX_CONCURRENT = int(os.getenv("RATE_LIMIT_MAX_CONCURRENT", "8"))
+    # Cost per request by path prefix (longest match wins; everything else costs 1)
+    RATE_LIMIT_ROUTE_COSTS = os.getenv("RATE_LIMIT_ROUTE_COSTS", "/api/analytics=5,/api/transactions/search=3,/api/policies/violations=3")
+    # Long-lived requests that are charged but do not hold a concurrency slot
+    RATE_LIMIT_UNCAPPED_PATHS = os.getenv("RATE_LIMIT_UNCAPPED_PATHS", "/api/events/stream")
+    # "local" limits each worker separately; "redis" shares limits across workers
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "local").lower()
+    RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "")
+    # Accounts tracked by the local backend before the least recent are forgotten
+    RATE_LIMIT_MAX_ACCOUNTS = int(os.getenv("RATE_LIMIT_MAX_ACCOUNTS", "10000"))
+
+    # Startup Diagnostics
+    # Print configuration and the per-module startup report when the app boots
+    STARTUP_DEBUG = os.getenv("STARTUP_DEBUG", "false").lower() == "true"
+
     def __init__(self):
+        if self.STARTUP_DEBUG:
+            self.log_configuration()
+
+    def log_configuration(self):
+        print("=== TakeBack Backend Starting ===")
+        print(f"Python version: {sys.version}")
+        print(f"Current working directory: {os.getcwd()}")
         print(f"DEBUG: SUPABASE_URL configured: {'Yes' if self.SUPABASE_URL != 'https://placeholder.supabase.co' else 'No (using placeholder)'}")
         print(f"DEBUG: SUPABASE_KEY configured: {'Yes' if self.SUPABASE_KEY != 'placeholder_key' else 'No (using placeholder)'}")
         print(f"DEBUG: JWT_SECRET configured: {'Yes' if self.JWT_SECRET != 'placeholder_secret' else 'No (using placeholder)'}")
@@ -0,0 +1,226 @@
+import asyncio
+import base64
+from typing import AsyncIterator, Optional
+from .settings import settings
+
+# Non-blocking Supabase Storage client. The SDK's storage client is
+# synchronous, so a large upload would hold a worker thread (or the event
+# loop) for its whole duration. This client talks to the Storage REST and
+# resumable (TUS 1.0) endpoints over one pooled httpx.AsyncClient, created on
+# first use and closed by close_storage_client() on shutdown.
+
+TUS_VERSION = "1.0.0"
+
+class StorageError(Exception):
+    """A storage request failed; status is the upstream HTTP status, if any"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+class AsyncStorageClient:
+    def __init__(self, storage_url: str, key: str):
+        import httpx
+
+        self.storage_url = storage_url.rstrip("/")
+        self._client = httpx.AsyncClient(
+            headers={"apikey": key, "Authorization": f"Bearer {key}"},
+            timeout=httpx.Timeout(
+                settings.SUPABASE_TIMEOUT,
+                connect=settings.SUPABASE_CONNECT_TIMEOUT,
+                pool=settings.SUPABASE_POOL_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.SUPABASE_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    def public_url(self, bucket: str, path: str) -> str:
+        return f"{self.storage_url}/object/public/{bucket}/{path}"
+
+    async def _request(self, method: str, url: str, expected: tuple, **kwargs):
+        import httpx
+
+        try:
+            response = await self._client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            raise StorageError(f"{method} {url} failed: {e}")
+        if response.status_code not in expected:
+            raise StorageError(f"{method} {url} returned {response.status_code}: {response.text[:200]}", response.status_code)
+        return response
+
+    async def upload(self, bucket: str, path: str, data: bytes, content_type: str, upsert: bool = False):
+        """Upload a small object in one request"""
+        await self._request(
+            "POST", f"{self.storage_url}/object/{bucket}/{path}", (200, 201),
+            content=data, headers={
+                "Content-Type": content_type or "application/octet-stream",
+                "x-upsert": "true" if upsert else "false",
+            }
+        )
+
+    async def download(self, bucket: str, path: str) -> Optional[bytes]:
+        """Contents of a small object, or None when it does not exist"""
+        try:
+            response = await self._request("GET", f"{self.storage_url}/object/{bucket}/{path}", (200,))
+        except StorageError as e:
+            # Storage answers 400 rather than 404 for some missing objects
+            if e.status in (400, 404):
+                return None
+            raise
+        return response.content
+
+    async def remove(self, bucket: str, paths: list):
+        """Delete objects in one request"""
+        await self._request("DELETE", f"{self.storage_url}/object/{bucket}", (200,), json={"prefixes": paths})
+
+    async def list(self, bucket: str, prefix: str, limit: int = 100, offset: int = 0) -> list:
+        """One page of the objects and folders directly under prefix, by name.
+
+        Folders come back with a null id; objects carry id, created_at and metadata.
+        """
+        response = await self._request(
+            "POST", f"{self.storage_url}/object/list/{bucket}", (200,),
+            json={"prefix": prefix, "limit": limit, "offset": offset, "sortBy": {"column": "name", "order": "asc"}}
+        )
+        return response.json()
+
+    async def info(self, bucket: str, path: str) -> Optional[dict]:
+        """Size and content type of an object, or None when it does not exist"""
+        try:
+            response = await self._request("HEAD", f"{self.storage_url}/object/{bucket}/{path}", (200,))
+        except StorageError as e:
+            # Storage answers 400 rather than 404 for some missing objects
+            if e.status in (400, 404):
+                return None
+            raise
+        return {
+            "size": int(response.headers.get("Content-Length", 0)),
+            "content_type": response.headers.get("Content-Type"),
+        }
+
+    async def create_signed_upload_url(self, bucket: str, path: str) -> str:
+        """URL a client can PUT one new object to without credentials.
+
+        Supabase keeps these valid for two hours and refuses to overwrite an
+        existing object through them.
+        """
+        response = await self._request("POST", f"{self.storage_url}/object/upload/sign/{bucket}/{path}", (200,))
+        return f"{self.storage_url}{response.json()['url']}"
+
+    # Resumable uploads (TUS). Supabase accepts chunks of exactly
+    # STORAGE_CHUNK_SIZE bytes, except for the last one.
+
+    async def create_resumable(self, bucket: str, path: str, length: int, content_type: str) -> str:
+        """Open a resumable upload; returns its upstream URL"""
+        metadata = {
+            "bucketName": bucket,
+            "objectName": path,
+            "contentType": content_type or "application/octet-stream",
+        }
+        response = await self._request(
+            "POST", f"{self.storage_url}/upload/resumable", (201,),
+            headers={
+                "Tus-Resumable": TUS_VERSION,
+                "Upload-Length": str(length),
+                "Upload-Metadata": ",".join(f"{k} {base64.b64encode(v.encode()).decode()}" for k, v in metadata.items()),
+                "x-upsert": "false",
+            }
+        )
+        return response.headers["Location"]
+
+    async def get_offset(self, upload_url: str) -> int:
+        """Bytes the bucket has accepted for a resumable upload"""
+        response = await self._request(
+            "HEAD", upload_url, (200, 204),
+            headers={"Tus-Resumable": TUS_VERSION, "Cache-Control": "no-store"}
+        )
+        return int(response.headers["Upload-Offset"])
+
+    async def upload_chunk(self, upload_url: str, offset: int, chunk: bytes) -> int:
+        """Send one chunk, re-sending it whole after transient failures; returns the new offset.
+
+        Only the last chunk of an upload may be short, so a failed chunk is
+        never resumed part way: either the bucket kept none of it and it is
+        sent again, or it kept all of it and we are done.
+        """
+        start = offset
+        end = start + len(chunk)
+        attempt = 0
+        while True:
+            try:
+                response = await self._request(
+                    "PATCH", upload_url, (204,),
+                    content=chunk,
+                    headers={
+                        "Tus-Resumable": TUS_VERSION,
+                        "Upload-Offset": str(start),
+                        "Content-Type": "application/offset+octet-stream",
+                    }
+                )
+                return int(response.headers["Upload-Offset"])
+            except StorageError as e:
+                # A 4xx (including a 409 for a stale offset) is the caller's to handle
+                if e.status is not None and e.status < 500:
+                    raise
+                attempt += 1
+                if attempt > settings.STORAGE_CHUNK_RETRIES:
+                    raise
+                print(f"DEBUG: Chunk at offset {start} failed ({e}), retry {attempt}/{settings.STORAGE_CHUNK_RETRIES}")
+                await asyncio.sleep(min(2 ** (attempt - 1) * 0.5, 8))
+                # The failed attempt may have landed before the connection dropped
+                offset = await self.get_offset(upload_url)
+                if offset >= end:
+                    return offset
+                if offset != start:
+                    raise StorageError(f"Bucket kept {offset - start} bytes of the chunk at {start}", 409)
+
+    async def upload_stream(self, upload_url: str, offset: int, length: int, stream: AsyncIterator[bytes],
+                            pending: bytes = b"") -> tuple:
+        """Forward pending bytes and then a byte stream, starting at offset, in
+        whole chunks; returns (new offset, bytes not sent).
+
+        Holds at most one chunk in memory. Bytes left over when the stream
+        ends short of a full chunk (and short of the end of the upload) are
+        returned for the caller to keep until more arrive.
+        """
+        chunk_size = settings.STORAGE_CHUNK_SIZE
+        buffer = bytearray(pending)
+        async for data in stream:
+            buffer.extend(data)
+            while len(buffer) >= chunk_size:
+                offset = await self.upload_chunk(upload_url, offset, bytes(buffer[:chunk_size]))
+                del buffer[:chunk_size]
+        if buffer and offset + len(buffer) == length:
+            offset = await self.upload_chunk(upload_url, offset, bytes(buffer))
+            buffer.clear()
+        return offset, bytes(buffer)
+
+    async def cancel_resumable(self, upload_url: str):
+        await self._request("DELETE", upload_url, (204, 404), headers={"Tus-Resumable": TUS_VERSION})
+
+_storage_client = None
+
+def get_storage_client() -> Optional[AsyncStorageClient]:
+    """Return the shared async storage client, or None when Supabase is not configured"""
+    global _storage_client
+
+    if _storage_client is None:
+        if (settings.SUPABASE_URL == "https://placeholder.supabase.co" or
+            settings.SUPABASE_KEY == "placeholder_key"):
+            return None
+        _storage_client = AsyncStorageClient(settings.SUPABASE_STORAGE_URL, settings.SUPABASE_KEY)
+    return _storage_client
+
+async def close_storage_client():
+    global _storage_client
+
+    if _storage_client is not None:
+        await _storage_client.aclose()
+        print("DEBUG: Storage client closed")
+    _storage_client = None
@@ -0,0 +1,107 @@
+import httpx
+from supabase import Client
+from supabase.lib.client_options import ClientOptions
+from supabase.lib.auth_client import SupabaseAuthClient, SyncClient as AuthSession
+from supabase.lib.storage_client import SupabaseStorageClient
+from postgrest import SyncPostgrestClient
+from postgrest.utils import SyncClient as PostgrestSession
+from storage3.utils import SyncClient as StorageSession
+from .settings import settings
+
+# Supabase SDK glue. This module pulls in the SDK (httpx, postgrest, storage3,
+# gotrue), so database.py only imports it when the client is first created.
+
+# Shared keep-alive connection pool used by the PostgREST, storage and auth clients
+_transport = None
+
+def _create_transport() -> httpx.HTTPTransport:
+    """Create the pooled HTTP transport shared by every Supabase sub-client"""
+    http2 = settings.SUPABASE_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            print("DEBUG: h2 not installed - Supabase transport falling back to HTTP/1.1")
+            http2 = False
+
+    limits = httpx.Limits(
+        max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.SUPABASE_KEEPALIVE_EXPIRY,
+    )
+    print(f"DEBUG: Supabase transport: http2={http2}, max_connections={limits.max_connections}, "
+          f"max_keepalive={limits.max_keepalive_connections}")
+    return httpx.HTTPTransport(http2=http2, limits=limits, retries=settings.SUPABASE_CONNECT_RETRIES)
+
+def _create_timeout() -> httpx.Timeout:
+    """Build the request timeout from settings"""
+    return httpx.Timeout(
+        settings.SUPABASE_TIMEOUT,
+        connect=settings.SUPABASE_CONNECT_TIMEOUT,
+        pool=settings.SUPABASE_POOL_TIMEOUT,
+    )
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    """PostgREST client whose session runs on the shared transport"""
+
+    def create_session(self, base_url, headers, timeout):
+        return PostgrestSession(base_url=base_url, headers=headers, timeout=timeout, transport=_transport)
+
+    def aclose(self) -> None:
+        # The transport is owned by close_transport(), not by individual sessions
+        pass
+
+class PooledStorageClient(SupabaseStorageClient):
+    """Storage client whose session runs on the shared transport"""
+
+    def _create_session(self, base_url, headers, timeout):
+        return StorageSession(base_url=base_url, headers=headers, timeout=timeout, transport=_transport)
+
+    def aclose(self) -> None:
+        pass
+
+class PooledClient(Client):
+    """Supabase client that builds its sub-clients on the shared transport.
+
+    The SDK re-creates the PostgREST and storage clients after auth events,
+    so the pool is injected through the factory hooks rather than patched
+    onto existing sessions.
+    """
+
+    @staticmethod
+    def _init_postgrest_client(rest_url, headers, schema, timeout=None):
+        return PooledPostgrestClient(rest_url, headers=headers, schema=schema, timeout=timeout or _create_timeout())
+
+    @staticmethod
+    def _init_storage_client(storage_url, headers, storage_client_timeout=None):
+        return PooledStorageClient(storage_url, headers, storage_client_timeout or _create_timeout())
+
+    @staticmethod
+    def _init_supabase_auth_client(auth_url, client_options):
+        return SupabaseAuthClient(
+            url=auth_url,
+            auto_refresh_token=client_options.auto_refresh_token,
+            persist_session=client_options.persist_session,
+            storage=client_options.storage,
+            headers=client_options.headers,
+            http_client=AuthSession(transport=_transport, timeout=_create_timeout()),
+        )
+
+def create_pooled_client(supabase_url: str, supabase_key: str) -> Client:
+    """Open the shared transport and create a client on top of it"""
+    global _transport
+
+    if _transport is None:
+        _transport = _create_transport()
+    timeout = _create_timeout()
+    options = ClientOptions(postgrest_client_timeout=timeout, storage_client_timeout=timeout)
+    return PooledClient(supabase_url, supabase_key, options)
+
+def close_transport():
+    """Close the shared transport and all pooled connections"""
+    global _transport
+
+    if _transport is not None:
+        _transport.close()
+        print("DEBUG: Supabase connection pool closed")
+    _transport = None
@@ -1,17 +1,56 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+import importlib
+from contextlib import asynccontextmanager
 
 # Handle imports for different execution contexts
 try:
-    from .config.settings import settings
-    from .api import auth, budgets, cards, transactions, policies, analytics, card_budgets, receipts
+    from .utils.startup import startup_report
 except ImportError:
     # When running from backend root
+    from app.utils.startup import startup_report
+
+with startup_report.measure("fastapi"):
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.middleware.gzip import GZipMiddleware
+
+try:
+    from .config.settings import settings
+    from .config.database import init_supabase_client, close_supabase_client
+    from .utils.startup import FirstRequestMiddleware
+    from .config.storage import close_storage_client
+    from .utils.events import event_bus
+    from .middleware.rate_limit import RateLimitMiddleware, rate_limiter
+except ImportError:
     from app.config.settings import settings
-    from app.api import auth, budgets, cards, transactions, policies, analytics, card_budgets, receipts
+    from app.config.database import init_supabase_client, close_supabase_client
+    from app.utils.startup import FirstRequestMiddleware
+    from app.config.storage import close_storage_client
+    from app.utils.events import event_bus
+    from app.middleware.rate_limit import RateLimitMiddleware, rate_limiter
+
+# Router modules, imported one by one so the startup report can attribute cost
+ROUTER_MODULES = ["auth", "budgets", "cards", "transactions", "policies", "analytics", "card_budgets", "receipts", "events"]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the pooled Supabase connections and the event transport on startup
+    and close them (and the rate limiter and storage client) on shutdown"""
+    if settings.SUPABASE_EAGER_INIT:
+        init_supabase_client()
+    await event_bus.start()
+    yield
+    await event_bus.close()
+    await rate_limiter.close()
+    await close_storage_client()
+    close_supabase_client()
 
 # Create FastAPI app
-app = FastAPI(title=settings.PROJECT_NAME, version=settings.VERSION)
+app = FastAPI(title=settings.PROJECT_NAME, version=settings.VERSION, lifespan=lifespan)
+
+# Per-account rate limiting and concurrency caps. Added before CORS so that
+# CORS wraps it and 429 responses still carry CORS headers.
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
 
 # Add CORS middleware with more permissive settings
 app.add_middleware(
@@ -20,19 +59,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Response headers browser clients read (resumable uploads, idempotent replays, rate limits)
+    expose_headers=["Location", "Upload-Offset", "Upload-Length", "Upload-Url", "Tus-Resumable", "Idempotent-Replayed", "Retry-After"],
 )
 
-print("CORS middleware configured successfully")
+# Compress larger payloads (e.g. long transaction histories) for clients that accept gzip
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE)
+
+# Records when the first request reaches this process (cold start diagnostics)
+app.add_middleware(FirstRequestMiddleware, report=startup_report)
 
 # Include routers
-app.include_router(auth.router)
-app.include_router(budgets.router)
-app.include_router(cards.router)
-app.include_router(transactions.router)
-app.include_router(policies.router)
-app.include_router(analytics.router)
-app.include_router(card_budgets.router)
-app.include_router(receipts.router)
+api_package = f"{__package__}.api" if __package__ else "app.api"
+for module_name in ROUTER_MODULES:
+    with startup_report.measure(f"api.{module_name}"):
+        module = importlib.import_module(f"{api_package}.{module_name}")
+    app.include_router(module.router)
+
+startup_report.mark_ready()
+if settings.STARTUP_DEBUG:
+    startup_report.print_report()
 
 @app.get("/")
 async def root():
@@ -50,12 +96,18 @@ async def debug_config():
         from app.config.database import supabase
     
     return {
-        "supabase_configured": supabase is not None,
+        "supabase_configured": bool(supabase),
         "supabase_url": settings.SUPABASE_URL if settings.SUPABASE_URL != "https://placeholder.supabase.co" else "NOT_SET",
         "jwt_secret_configured": settings.JWT_SECRET != "placeholder_secret",
         "environment": "development"
     }
 
+@app.get("/debug/startup")
+async def debug_startup():
+    """Debug endpoint reporting per-module import and initialization cost"""
+    print("DEBUG: Startup report endpoint accessed")
+    return startup_report.as_dict()
+
 @app.get("/debug/user/{email}")
 async def debug_user(email: str):
     """Debug endpoint to check if a user exists in the database"""
@@ -0,0 +1,272 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import parse_qs
+from ..config.settings import settings
+from ..utils.events import STREAM_TOKEN_PURPOSE
+from ..utils.jwt import signed_token_subject, token_subject
+
+def parse_route_costs(value: str) -> list:
+    """Parse "prefix=cost,..." into (prefix, cost) pairs, longest prefix first"""
+    costs = []
+    for item in (value or "").split(","):
+        prefix, _, cost = item.strip().partition("=")
+        if prefix and cost:
+            costs.append((prefix, float(cost)))
+    return sorted(costs, key=lambda pair: len(pair[0]), reverse=True)
+
+class LocalRateLimitBackend:
+    """Token buckets and in-flight counts held in this process.
+
+    Each worker enforces the limits on its own, so with N workers an account
+    can reach up to N times the configured rates; use RedisRateLimitBackend
+    there. The least recently seen accounts are forgotten past max_accounts,
+    which only ever resets them to a full bucket.
+    """
+
+    def __init__(self, max_accounts: int = 10000):
+        self.max_accounts = max_accounts
+        self._buckets = OrderedDict()
+        self._inflight = {}
+
+    async def take(self, key: str, cost: float, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        retry_after = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            retry_after = (cost - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_accounts:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+    async def acquire(self, key: str, limit: int) -> bool:
+        count = self._inflight.get(key, 0)
+        if count >= limit:
+            return False
+        self._inflight[key] = count + 1
+        return True
+
+    async def release(self, key: str):
+        count = self._inflight.get(key, 0) - 1
+        if count > 0:
+            self._inflight[key] = count
+        else:
+            self._inflight.pop(key, None)
+
+    async def close(self):
+        pass
+
+class RedisRateLimitBackend:
+    """Token buckets and in-flight counts shared by every worker through Redis.
+
+    Each check is one atomic script call timed by the Redis clock. Requires
+    the redis package (pip install redis), which the app otherwise does not need.
+    """
+
+    PREFIX = "takeback:ratelimit:"
+    # Bounds how long a worker that died mid-request holds a concurrency slot
+    INFLIGHT_TTL = 120
+
+    TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(retry_after)
+"""
+
+    ACQUIRE_SCRIPT = """
+local count = redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+if count > tonumber(ARGV[1]) then
+    redis.call('DECR', KEYS[1])
+    return 0
+end
+return 1
+"""
+
+    RELEASE_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') > 0 then
+    redis.call('DECR', KEYS[1])
+end
+return 1
+"""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("redis is required for RATE_LIMIT_BACKEND=redis: pip install redis")
+        self._redis = redis.from_url(url)
+        self._take = self._redis.register_script(self.TAKE_SCRIPT)
+        self._acquire = self._redis.register_script(self.ACQUIRE_SCRIPT)
+        self._release = self._redis.register_script(self.RELEASE_SCRIPT)
+
+    async def take(self, key: str, cost: float, rate: float, burst: float) -> float:
+        result = await self._take(keys=[f"{self.PREFIX}{key}:tokens"], args=[rate, burst, cost])
+        return float(result)
+
+    async def acquire(self, key: str, limit: int) -> bool:
+        result = await self._acquire(keys=[f"{self.PREFIX}{key}:inflight"], args=[limit, self.INFLIGHT_TTL])
+        return bool(int(result))
+
+    async def release(self, key: str):
+        await self._release(keys=[f"{self.PREFIX}{key}:inflight"])
+
+    async def close(self):
+        await self._redis.close()
+
+def create_backend(name: str, url: Optional[str] = None, max_accounts: int = 10000):
+    """Build the backend named by RATE_LIMIT_BACKEND"""
+    if name == "local":
+        return LocalRateLimitBackend(max_accounts)
+    if name == "redis":
+        if not url:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is required for RATE_LIMIT_BACKEND=redis")
+        return RedisRateLimitBackend(url)
+    raise RuntimeError(f"Unknown RATE_LIMIT_BACKEND: {name}")
+
+class RateLimiter:
+    """Admission control for API requests, per account.
+
+    Every request spends its route's cost from the account's token bucket
+    (refilled at rate per second, holding at most burst), and at most
+    max_concurrent requests per account run at once. Requests over either
+    limit are refused straight away rather than queued. If the backend
+    fails, requests are admitted: the limiter protects upstream capacity and
+    must not take the API down with it.
+    """
+
+    def __init__(self, backend=None, rate: float = 10, burst: float = 60, max_concurrent: int = 8,
+                 route_costs: Optional[list] = None, uncapped_paths: tuple = ()):
+        self.backend = backend or LocalRateLimitBackend()
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.route_costs = route_costs or []
+        self.uncapped_paths = tuple(uncapped_paths)
+
+    def cost(self, path: str) -> float:
+        for prefix, cost in self.route_costs:
+            if path.startswith(prefix):
+                # A cost above the burst could never be admitted
+                return min(cost, self.burst)
+        return 1.0
+
+    def uncapped(self, path: str) -> bool:
+        return path.startswith(self.uncapped_paths) if self.uncapped_paths else False
+
+    @staticmethod
+    def client_key(scope) -> str:
+        """The account a request is made for; the client address before login.
+
+        Behind a reverse proxy, scope["client"] is the real client only when
+        the proxy is trusted through FORWARDED_ALLOW_IPS (see run.py);
+        otherwise every anonymous request shares the proxy's bucket.
+        """
+        user_id = None
+        for name, value in scope.get("headers", ()):
+            if name == b"authorization":
+                scheme, _, credentials = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer":
+                    user_id = token_subject(credentials.strip())
+                break
+        if user_id is None and scope.get("query_string"):
+            # EventSource cannot send headers, so streams open with a stream token in the query
+            stream_token = parse_qs(scope["query_string"].decode("latin-1")).get("token", [None])[0]
+            user_id = signed_token_subject(stream_token, STREAM_TOKEN_PURPOSE) if stream_token else None
+        if user_id:
+            return f"account:{user_id}"
+        client = scope.get("client")
+        return f"client:{client[0] if client else 'unknown'}"
+
+    async def take(self, key: str, cost: float) -> float:
+        """Spend cost from the key's bucket; returns 0, or seconds until it could be spent"""
+        try:
+            return await self.backend.take(key, cost, self.rate, self.burst)
+        except Exception as e:
+            print(f"DEBUG: Rate limit backend error, admitting request: {str(e)}")
+            return 0.0
+
+    async def acquire(self, key: str) -> bool:
+        try:
+            return await self.backend.acquire(key, self.max_concurrent)
+        except Exception as e:
+            print(f"DEBUG: Rate limit backend error, admitting request: {str(e)}")
+            return True
+
+    async def release(self, key: str):
+        try:
+            await self.backend.release(key)
+        except Exception as e:
+            print(f"DEBUG: Rate limit backend error on release: {str(e)}")
+
+    async def close(self):
+        await self.backend.close()
+
+class RateLimitMiddleware:
+    """ASGI middleware that admits /api requests through a RateLimiter,
+    answering 429 with Retry-After when the account is over its limits"""
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        # CORS preflights, the health check, debug routes and docs are never limited
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        key = self.limiter.client_key(scope)
+        capped = not self.limiter.uncapped(path)
+        if capped and not await self.limiter.acquire(key):
+            await self._reject(scope, receive, send, 1, "Too many concurrent requests")
+            return
+        try:
+            retry_after = await self.limiter.take(key, self.limiter.cost(path))
+            if retry_after > 0:
+                await self._reject(scope, receive, send, retry_after, "Rate limit exceeded")
+                return
+            await self.app(scope, receive, send)
+        finally:
+            if capped:
+                await self.limiter.release(key)
+
+    @staticmethod
+    async def _reject(scope, receive, send, retry_after: float, detail: str):
+        from starlette.responses import JSONResponse
+
+        seconds = max(1, math.ceil(retry_after))
+        print(f"DEBUG: {detail} for {scope['method']} {scope['path']}, retry after {seconds}s")
+        response = JSONResponse({"detail": detail}, status_code=429, headers={"Retry-After": str(seconds)})
+        await response(scope, receive, send)
+
+# Shared by every request in this process
+rate_limiter = RateLimiter(
+    create_backend(settings.RATE_LIMIT_BACKEND, settings.RATE_LIMIT_REDIS_URL, settings.RATE_LIMIT_MAX_ACCOUNTS),
+    rate=settings.RATE_LIMIT_RATE,
+    burst=settings.RATE_LIMIT_BURST,
+    max_concurrent=settings.RATE_LIMIT_MAX_CONCURRENT,
+    route_costs=parse_route_costs(settings.RATE_LIMIT_ROUTE_COSTS),
+    uncapped_paths=tuple(path.strip() for path in settings.RATE_LIMIT_UNCAPPED_PATHS.split(",") if path.strip()),
+)
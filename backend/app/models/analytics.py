@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 from typing import List, Optional
 from .budget import BudgetBalance
-from .card import CardBalance
+from .card import CardBalance, CardResponse
 
 class SpendingAnalyticsResponse(BaseModel):
     budget_id: str
@@ -24,4 +24,24 @@ class BalanceResponse(BaseModel):
     card_balances: List[CardBalance]
     total_spent: float
     total_limit: float
-    total_remaining: float 
\ No newline at end of file
+    total_remaining: float
+
+class DashboardResponse(BaseModel):
+    balances: BalanceResponse
+    spending: List[SpendingAnalyticsResponse]
+    recent_transactions: List[RecentTransactionResponse]
+    cards: List[CardResponse]
+
+class TimeSeriesSeries(BaseModel):
+    key: str  # card_id, budget_id or category
+    label: str
+    values: List[float]  # One per bucket, 0 for buckets without spend
+    total: float
+
+class TimeSeriesResponse(BaseModel):
+    period: str
+    interval: str  # 'day', 'week' or 'month'
+    split_by: Optional[str] = None  # 'card', 'budget' or 'category'
+    buckets: List[str]  # ISO start date of each bucket
+    totals: List[float]
+    series: List[TimeSeriesSeries]  # Empty unless split_by is set
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import List, Optional
 
 class BudgetCreate(BaseModel):
     name: str
@@ -31,4 +32,23 @@ class CardBudgetResponse(BaseModel):
     id: str
     card_id: str
     budget_id: str
-    created_at: str 
\ No newline at end of file
+    created_at: str
+
+class BudgetBulkUpdate(BudgetCreate):
+    id: str
+
+class BudgetBulkRequest(BaseModel):
+    create: List[BudgetCreate] = []
+    update: List[BudgetBulkUpdate] = []
+    delete: List[str] = []  # Budget IDs
+
+class BudgetBulkResult(BaseModel):
+    operation: str  # 'create', 'update' or 'delete'
+    index: int  # Position within the request's list for that operation
+    id: Optional[str] = None
+    status: str  # 'created', 'updated', 'deleted', 'not_found', 'invalid' or 'failed'
+    error: Optional[str] = None
+    budget: Optional[BudgetResponse] = None
+
+class BudgetBulkResponse(BaseModel):
+    results: List[BudgetBulkResult]
@@ -1,11 +1,11 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 from .budget import BudgetBalance
 
 class CardCreate(BaseModel):
     name: str
     status: str = "issued"  # 'issued', 'frozen', 'cancelled'
-    balance: float = 0
+    balance: float = 0  # Ignored; maintained from the card's transactions
     cardholder_name: str
     cvv: str
     expiry: str
@@ -25,12 +25,33 @@ class CardResponse(BaseModel):
     zipcode: str
     address: str
     budget_ids: List[str] = []  # List of associated budget IDs
+    invalid_budget_ids: List[str] = []  # Requested budget IDs that were not found for the user
     created_at: str
 
 class CardBalance(BaseModel):
     card_id: str
     card_name: str
+    balance: Optional[float] = None  # Running total of every transaction on the card
     total_spent: float
     total_limit: float
     remaining_amount: float
-    budget_balances: List[BudgetBalance] 
\ No newline at end of file
+    budget_balances: List[BudgetBalance]
+
+class CardBulkUpdate(CardCreate):
+    id: str
+
+class CardBulkRequest(BaseModel):
+    create: List[CardCreate] = []
+    update: List[CardBulkUpdate] = []
+    delete: List[str] = []  # Card IDs
+
+class CardBulkResult(BaseModel):
+    operation: str  # 'create', 'update' or 'delete'
+    index: int  # Position within the request's list for that operation
+    id: Optional[str] = None
+    status: str  # 'created', 'updated', 'deleted', 'not_found', 'invalid' or 'failed'
+    error: Optional[str] = None
+    card: Optional[CardResponse] = None
+
+class CardBulkResponse(BaseModel):
+    results: List[CardBulkResult]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class PolicyCreate(BaseModel):
     name: str
@@ -14,4 +14,25 @@ class PolicyResponse(BaseModel):
     description: Optional[str]
     memo_threshold: Optional[float]
     memo_prompt: Optional[str]
-    created_at: str 
\ No newline at end of file
+    created_at: str
+
+class PolicyViolation(BaseModel):
+    policy_id: str
+    policy_name: str
+    rule: str  # 'memo_threshold'
+    threshold: Optional[float] = None
+    message: str
+
+class TransactionPolicyViolations(BaseModel):
+    transaction_id: str
+    card_budget_id: str
+    amount: float
+    name: str
+    date: str
+    violations: List[PolicyViolation]
+
+class PolicyEvaluationResponse(BaseModel):
+    evaluated_count: int
+    violation_count: int
+    transactions: List[TransactionPolicyViolations]
+    latency_ms: float
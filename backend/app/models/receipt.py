@@ -31,4 +31,25 @@ class ReceiptUploadResponse(BaseModel):
     success: bool
     message: str
     receipt_id: Optional[str] = None
-    url: Optional[str] = None 
\ No newline at end of file
+    url: Optional[str] = None
+    # Set by POST /api/receipts/upload-and-create, which also creates the record
+    receipt: Optional[ReceiptResponse] = None
+    transaction_id: Optional[str] = None 
+
+class ReceiptPresignRequest(BaseModel):
+    filename: str
+    size: Optional[int] = None  # Declared size in bytes, checked up front when given
+
+class ReceiptPresignResponse(BaseModel):
+    upload_id: str  # Pass to POST /api/receipts/complete after uploading
+    upload_url: str  # PUT the file here, with its Content-Type
+    path: str
+    expires_in: int  # Seconds left to complete the upload
+
+class ReceiptCompleteRequest(BaseModel):
+    upload_id: str
+    name: Optional[str] = None
+    description: Optional[str] = None
+    amount: Optional[float] = None
+    date_of_purchase: Optional[str] = None
+    transaction_id: Optional[str] = None
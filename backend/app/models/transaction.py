@@ -1,5 +1,7 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+from .budget import BudgetBalance
+from .policy import PolicyViolation
 
 class TransactionCreate(BaseModel):
     card_budget_id: str
@@ -21,4 +23,43 @@ class TransactionResponse(BaseModel):
     receipt_id: Optional[str] = None
     # Optionally include related card and budget info for frontend enrichment
     card_id: Optional[str] = None
-    budget_id: Optional[str] = None 
\ No newline at end of file
+    budget_id: Optional[str] = None
+    # Policy rules this transaction breaks, evaluated on create/update
+    policy_violations: List[PolicyViolation] = []
+
+class AuthorizationRequest(BaseModel):
+    card_budget_id: str
+    amount: float
+
+class AuthorizationResponse(BaseModel):
+    approved: bool
+    decision: str  # 'approve' or 'decline'
+    reason: Optional[str] = None  # e.g. 'card_frozen', 'insufficient_budget'
+    card_budget_id: str
+    limit_amount: Optional[float] = None
+    spent_amount: Optional[float] = None
+    remaining_amount: Optional[float] = None  # Remaining after this amount when approved
+    latency_ms: float
+
+class TransactionSearchHit(TransactionResponse):
+    score: float
+
+class TransactionSearchResponse(BaseModel):
+    query: str
+    total: int  # Matches across all pages
+    limit: int
+    offset: int
+    results: List[TransactionSearchHit]
+    latency_ms: float
+
+class StreamTokenResponse(BaseModel):
+    token: str  # Pass as ?token= to GET /api/events/stream
+    expires_in: int  # Seconds left to open the stream with it
+
+class TransactionEvent(BaseModel):
+    type: str  # 'transaction.created', 'transaction.updated' or 'transaction.deleted'
+    transaction_id: str
+    transaction: Optional[TransactionResponse] = None  # Omitted for deletes
+    card_id: Optional[str] = None
+    # The affected card_budget's balance over its budget's current period
+    budget_balance: Optional[BudgetBalance] = None
@@ -1,76 +1,287 @@
 from fastapi import HTTPException
-from datetime import datetime, timedelta
+from fastapi.concurrency import run_in_threadpool
+from datetime import date, datetime, timedelta
+from typing import Optional
 from ..config.database import supabase
-from ..models.analytics import SpendingAnalyticsResponse, RecentTransactionResponse, BalanceResponse
+from ..config.settings import settings
+from ..services.archive_service import ArchiveService
+from ..services.balance_service import BalanceService
+from ..utils.cache import TTLCache, register_account_cache
+from ..utils.singleflight import SingleFlight
+from ..models.analytics import SpendingAnalyticsResponse, RecentTransactionResponse, BalanceResponse, DashboardResponse, TimeSeriesSeries, TimeSeriesResponse
 from ..models.budget import BudgetBalance
-from ..models.card import CardBalance
+from ..models.card import CardBalance, CardResponse
 import traceback
 
+# Coalesces identical concurrent analytics requests (and optionally caches them
+# for ANALYTICS_CACHE_TTL seconds); dropped for an account whenever it writes
+analytics_flight = register_account_cache(SingleFlight(ttl=settings.ANALYTICS_CACHE_TTL))
+
+# Account entity graphs (cards, budgets, card_budgets) keyed by (user_id, "graph"),
+# stored with the entity version they were loaded at (migrations/0011)
+entity_graph_cache = register_account_cache(
+    TTLCache(max_entries=1024, ttl=settings.ENTITY_GRAPH_CACHE_TTL),
+    depends_on_transactions=False
+)
+
+# Colors for pie chart segments
+SPENDING_COLORS = ['#3B82F6', '#F59E0B', '#EF4444', '#10B981', '#8B5CF6', '#EC4899', '#06B6D4', '#84CC16']
+
+TIMESERIES_INTERVALS = ("day", "week", "month")
+TIMESERIES_SPLITS = ("card", "budget", "category")
+
 class AnalyticsService:
+    @staticmethod
+    def _period_start(period: str) -> datetime:
+        """Calculate the start of the date range for a period"""
+        now = datetime.utcnow()
+
+        if period == "week":
+            return now - timedelta(days=7)
+        elif period == "month":
+            return now - timedelta(days=30)
+        elif period == "quarter":
+            return now - timedelta(days=90)
+        elif period == "year":
+            return now - timedelta(days=365)
+        else:
+            return now - timedelta(days=30)  # Default to month
+
+    @staticmethod
+    def _adjust_limit(budget: dict, period: str) -> float:
+        """Scale a budget's limit from its own period to the requested period"""
+        adjusted_limit = budget["limit_amount"]
+        if budget["period"] == "weekly":
+            if period == "month":
+                adjusted_limit = budget["limit_amount"] * 4  # 4 weeks in a month
+            elif period == "quarter":
+                adjusted_limit = budget["limit_amount"] * 13  # ~13 weeks in a quarter
+            elif period == "year":
+                adjusted_limit = budget["limit_amount"] * 52  # 52 weeks in a year
+        elif budget["period"] == "monthly":
+            if period == "week":
+                adjusted_limit = budget["limit_amount"] / 4  # 1/4 of monthly for a week
+            elif period == "quarter":
+                adjusted_limit = budget["limit_amount"] * 3  # 3 months in a quarter
+            elif period == "year":
+                adjusted_limit = budget["limit_amount"] * 12  # 12 months in a year
+        elif budget["period"] == "quarterly":
+            if period == "week":
+                adjusted_limit = budget["limit_amount"] / 13  # 1/13 of quarterly for a week
+            elif period == "month":
+                adjusted_limit = budget["limit_amount"] / 3  # 1/3 of quarterly for a month
+            elif period == "year":
+                adjusted_limit = budget["limit_amount"] * 4  # 4 quarters in a year
+        return adjusted_limit
+
+    @staticmethod
+    def _entity_version(user_id: str) -> Optional[int]:
+        """The account's card, budget and card_budget write count
+        (migrations/0011_entity_versions.sql), or None when it cannot be read"""
+        try:
+            rows = supabase.table("entity_versions").select("version").eq("account_id", user_id).execute().data
+            return rows[0]["version"] if rows else 0
+        except Exception as e:
+            print(f"DEBUG: Entity version lookup error: {str(e)}")
+            return None
+
+    @staticmethod
+    def _load_entity_graph(user_id: str) -> dict:
+        """Load the account's cards, budgets and card_budgets in three queries.
+
+        The graph is cached per account and checked against the account's
+        entity version on every use, so writes made through any worker are
+        seen at once; transaction writes leave it warm. Without a readable
+        version the graph is loaded fresh each time.
+        """
+        cache_key = (user_id, "graph")
+        # Read before the rows, so a write landing mid-load leaves the cached
+        # version behind and the next use reloads
+        current = AnalyticsService._entity_version(user_id)
+        entry = entity_graph_cache.get(cache_key)
+        if entry is not None and current is not None:
+            version, graph = entry
+            if version == current:
+                print(f"DEBUG: Entity graph cache hit")
+                return graph
+            print(f"DEBUG: Entity graph at version {version}, account at {current}; reloading")
+
+        cards = supabase.table("cards").select("*").eq("account_id", user_id).execute().data
+        budgets = supabase.table("budgets").select("*").eq("account_id", user_id).execute().data
+        card_budgets = supabase.table("card_budgets").select("id, card_id, budget_id").eq("account_id", user_id).execute().data
+
+        graph = {
+            "cards": cards,
+            "budgets": budgets,
+            "card_budgets": card_budgets,
+            "cards_by_id": {card["id"]: card for card in cards},
+            "budgets_by_id": {budget["id"]: budget for budget in budgets},
+            "card_budgets_by_id": {cb["id"]: cb for cb in card_budgets},
+        }
+        if current is not None:
+            entity_graph_cache.set(cache_key, (current, graph))
+        return graph
+
+    @staticmethod
+    def _load_snapshot(user_id: str, period: str, with_card_balances: bool = False) -> dict:
+        """Load the entity graph plus the period's spend per card_budget from the
+        daily totals (one more query), and optionally the cards' running balances"""
+        graph = AnalyticsService._load_entity_graph(user_id)
+        start_date = AnalyticsService._period_start(period)
+        spent = BalanceService.period_spend(user_id, list(graph["card_budgets_by_id"]), start_date)
+        snapshot = {**graph, "period": period, "start_date": start_date, "spent": spent}
+        if with_card_balances:
+            # The cached graph's cards are not dropped by transaction writes, so
+            # their balance column is read fresh
+            rows = supabase.table("cards").select("id, balance").eq("account_id", user_id).execute().data
+            snapshot["card_balances"] = {row["id"]: row["balance"] for row in rows}
+        return snapshot
+
+    @staticmethod
+    def _build_spending(snapshot: dict) -> list:
+        """Per-budget spending breakdown for the snapshot's period"""
+        spent = snapshot["spent"]
+        budget_totals = {}
+        for cb in snapshot["card_budgets"]:
+            budget_totals[cb["budget_id"]] = budget_totals.get(cb["budget_id"], 0) + spent.get(cb["id"], 0)
+
+        spending_data = []
+        total_spent = 0
+
+        for i, budget in enumerate(snapshot["budgets"]):
+            budget_total = budget_totals.get(budget["id"], 0)
+            total_spent += budget_total
+
+            if budget_total > 0:
+                spending_data.append({
+                    "budget_id": budget["id"],
+                    "budget_name": budget["name"],
+                    "total_spent": budget_total,
+                    "percentage": 0,  # Will calculate after getting total
+                    "color": SPENDING_COLORS[i % len(SPENDING_COLORS)]
+                })
+
+        # Calculate percentages
+        for item in spending_data:
+            if total_spent > 0:
+                item["percentage"] = (item["total_spent"] / total_spent) * 100
+
+        return spending_data
+
+    @staticmethod
+    def _build_card_balance(snapshot: dict, card: dict, spent: dict) -> CardBalance:
+        """Balance of one card across its budgets for the snapshot's period"""
+        period = snapshot["period"]
+        budget_balances = []
+        card_total_spent = 0
+        card_total_limit = 0
+
+        for card_budget in snapshot["card_budgets"]:
+            if card_budget["card_id"] != card["id"]:
+                continue
+            budget = snapshot["budgets_by_id"].get(card_budget["budget_id"])
+            if not budget:
+                continue
+
+            spent_amount = spent.get(card_budget["id"], 0)
+            adjusted_limit = AnalyticsService._adjust_limit(budget, period)
+            remaining_amount = adjusted_limit - spent_amount
+
+            budget_balances.append(BudgetBalance(
+                budget_id=budget["id"],
+                budget_name=budget["name"],
+                limit_amount=adjusted_limit,
+                spent_amount=spent_amount,
+                remaining_amount=remaining_amount,
+                period=budget["period"]
+            ))
+
+            card_total_spent += spent_amount
+            card_total_limit += adjusted_limit
+
+        return CardBalance(
+            card_id=card["id"],
+            card_name=card["name"],
+            balance=snapshot.get("card_balances", {}).get(card["id"], card.get("balance")),
+            total_spent=card_total_spent,
+            total_limit=card_total_limit,
+            remaining_amount=card_total_limit - card_total_spent,
+            budget_balances=budget_balances
+        )
+
+    @staticmethod
+    def _build_balances(snapshot: dict) -> BalanceResponse:
+        """Balances of every card for the snapshot's period"""
+        spent = snapshot["spent"]
+        card_balances = [AnalyticsService._build_card_balance(snapshot, card, spent) for card in snapshot["cards"]]
+        total_spent = sum(cb.total_spent for cb in card_balances)
+        total_limit = sum(cb.total_limit for cb in card_balances)
+
+        return BalanceResponse(
+            card_balances=card_balances,
+            total_spent=total_spent,
+            total_limit=total_limit,
+            total_remaining=total_limit - total_spent
+        )
+
+    @staticmethod
+    def _build_recent(graph: dict, transactions: list, limit: int) -> list:
+        """Most recent transactions enriched with card and budget names"""
+        recent_transactions = []
+        for transaction in sorted(transactions, key=lambda t: t["date"], reverse=True)[:limit]:
+            cb = graph["card_budgets_by_id"].get(transaction["card_budget_id"])
+            if cb:
+                card = graph["cards_by_id"].get(cb["card_id"])
+                budget = graph["budgets_by_id"].get(cb["budget_id"])
+
+                recent_transactions.append({
+                    "id": transaction["id"],
+                    "name": transaction["name"],
+                    "amount": transaction["amount"],
+                    "date": transaction["date"],
+                    "card_name": card["name"] if card else "Unknown Card",
+                    "budget_name": budget["name"] if budget else "Unknown Budget",
+                    "category": transaction.get("category"),
+                    "merchant": transaction.get("merchant")
+                })
+        return recent_transactions
+
+    @staticmethod
+    def _fetch_recent(user_id: str, limit: int) -> list:
+        """Query the account's latest transactions"""
+        return ArchiveService.select_recent(user_id, limit)
+
+    @staticmethod
+    def _build_cards(snapshot: dict) -> list:
+        """Card listing with associated budget IDs, as served by /api/cards/"""
+        budget_ids_by_card = {}
+        for cb in snapshot["card_budgets"]:
+            budget_ids_by_card.setdefault(cb["card_id"], []).append(cb["budget_id"])
+        balances = snapshot.get("card_balances", {})
+        return [
+            CardResponse(**{**card, "balance": balances.get(card["id"], card.get("balance")), "budget_ids": budget_ids_by_card.get(card["id"], [])})
+            for card in snapshot["cards"]
+        ]
+
     @staticmethod
     async def get_spending_analytics(user_id: str, period: str = "month"):
         """Get spending analytics for a user"""
+        return await analytics_flight.do(
+            (user_id, "spending", period),
+            lambda: run_in_threadpool(AnalyticsService._compute_spending_analytics, user_id, period)
+        )
+
+    @staticmethod
+    def _compute_spending_analytics(user_id: str, period: str = "month"):
+        """Compute spending analytics for a user (blocking, run in a worker thread)"""
         print(f"=== GET SPENDING ANALYTICS ===")
         if not supabase:
             raise HTTPException(status_code=500, detail="Supabase not configured.")
-        
+
         try:
-            # Calculate date range based on period
-            now = datetime.utcnow()
-            
-            if period == "week":
-                start_date = now - timedelta(days=7)
-            elif period == "month":
-                start_date = now - timedelta(days=30)
-            elif period == "quarter":
-                start_date = now - timedelta(days=90)
-            elif period == "year":
-                start_date = now - timedelta(days=365)
-            else:
-                start_date = now - timedelta(days=30)  # Default to month
-            
-            # Get all budgets for the user
-            budgets_response = supabase.table("budgets").select("*").eq("account_id", user_id).execute()
-            budgets = budgets_response.data
-            
-            # Get all user's cards
-            user_cards_response = supabase.table("cards").select("id").eq("account_id", user_id).execute()
-            user_card_ids = [card["id"] for card in user_cards_response.data]
-            
-            spending_data = []
-            total_spent = 0
-            
-            # Colors for pie chart segments
-            colors = ['#3B82F6', '#F59E0B', '#EF4444', '#10B981', '#8B5CF6', '#EC4899', '#06B6D4', '#84CC16']
-            
-            for i, budget in enumerate(budgets):
-                # Get card_budget associations for this budget, but only for the user's cards
-                card_budgets_response = supabase.table("card_budgets").select("id").eq("budget_id", budget["id"]).in_("card_id", user_card_ids).execute()
-                card_budget_ids = [cb["id"] for cb in card_budgets_response.data]
-                
-                if card_budget_ids:
-                    # Get transactions for this budget within the date range using transactions.date
-                    transactions_response = supabase.table("transactions").select("amount").in_("card_budget_id", card_budget_ids).gte("date", start_date.isoformat()).execute()
-                    
-                    budget_total = sum(t["amount"] for t in transactions_response.data)
-                    total_spent += budget_total
-                    
-                    if budget_total > 0:
-                        spending_data.append({
-                            "budget_id": budget["id"],
-                            "budget_name": budget["name"],
-                            "total_spent": budget_total,
-                            "percentage": 0,  # Will calculate after getting total
-                            "color": colors[i % len(colors)]
-                        })
-            
-            # Calculate percentages
-            for item in spending_data:
-                if total_spent > 0:
-                    item["percentage"] = (item["total_spent"] / total_spent) * 100
-            
-            return spending_data
-            
+            snapshot = AnalyticsService._load_snapshot(user_id, period)
+            return AnalyticsService._build_spending(snapshot)
+
         except Exception as e:
             print(f"DEBUG: Get spending analytics error: {str(e)}")
             raise HTTPException(status_code=400, detail=str(e))
@@ -81,46 +292,12 @@ class AnalyticsService:
         print(f"=== GET RECENT TRANSACTIONS ===")
         if not supabase:
             raise HTTPException(status_code=500, detail="Supabase not configured.")
-        
+
         try:
-            # Get all card_budgets for the user's cards
-            card_budgets_response = supabase.table("card_budgets").select("id, card_id, budget_id").execute()
-            card_budget_map = {cb["id"]: cb for cb in card_budgets_response.data}
-            
-            # Filter by user ownership
-            user_card_ids = [c["id"] for c in supabase.table("cards").select("id, account_id").eq("account_id", user_id).execute().data]
-            user_card_budget_ids = [cbid for cbid, cb in card_budget_map.items() if cb["card_id"] in user_card_ids]
-            
-            if not user_card_budget_ids:
-                return []
-            
-            # Get recent transactions
-            transactions_response = supabase.table("transactions").select("*").in_("card_budget_id", user_card_budget_ids).order("date", desc=True).limit(limit).execute()
-            
-            recent_transactions = []
-            for transaction in transactions_response.data:
-                cb = card_budget_map.get(transaction["card_budget_id"])
-                if cb:
-                    # Get card and budget names
-                    card_response = supabase.table("cards").select("name").eq("id", cb["card_id"]).execute()
-                    budget_response = supabase.table("budgets").select("name").eq("id", cb["budget_id"]).execute()
-                    
-                    card_name = card_response.data[0]["name"] if card_response.data else "Unknown Card"
-                    budget_name = budget_response.data[0]["name"] if budget_response.data else "Unknown Budget"
-                    
-                    recent_transactions.append({
-                        "id": transaction["id"],
-                        "name": transaction["name"],
-                        "amount": transaction["amount"],
-                        "date": transaction["date"],
-                        "card_name": card_name,
-                        "budget_name": budget_name,
-                        "category": transaction.get("category"),
-                        "merchant": transaction.get("merchant")
-                    })
-            
-            return recent_transactions
-            
+            graph = AnalyticsService._load_entity_graph(user_id)
+            transactions = AnalyticsService._fetch_recent(user_id, limit)
+            return AnalyticsService._build_recent(graph, transactions, limit)
+
         except Exception as e:
             print(f"DEBUG: Get recent transactions error: {str(e)}")
             raise HTTPException(status_code=400, detail=str(e))
@@ -128,113 +305,190 @@ class AnalyticsService:
     @staticmethod
     async def get_balances(user_id: str, period: str = "month"):
         """Get balance information for a user"""
+        return await analytics_flight.do(
+            (user_id, "balances", period),
+            lambda: run_in_threadpool(AnalyticsService._compute_balances, user_id, period)
+        )
+
+    @staticmethod
+    def _compute_balances(user_id: str, period: str = "month"):
+        """Compute balance information for a user (blocking, run in a worker thread)"""
         print(f"=== GET BALANCES ===")
         if not supabase:
             raise HTTPException(status_code=500, detail="Supabase not configured.")
-        
+
         try:
-            # Calculate date range based on period
-            now = datetime.utcnow()
-            
-            if period == "week":
-                start_date = now - timedelta(days=7)
-            elif period == "month":
-                start_date = now - timedelta(days=30)
-            elif period == "quarter":
-                start_date = now - timedelta(days=90)
-            elif period == "year":
-                start_date = now - timedelta(days=365)
-            else:
-                start_date = now - timedelta(days=30)  # Default to month
-            
-            # Get all cards for the user
-            cards_response = supabase.table("cards").select("*").eq("account_id", user_id).execute()
-            cards = cards_response.data
-            
-            card_balances = []
-            total_spent = 0
-            total_limit = 0
-            
-            for card in cards:
-                # Get card-budget associations
-                card_budgets_response = supabase.table("card_budgets").select("id, budget_id").eq("card_id", card["id"]).execute()
-                card_budgets = card_budgets_response.data
-                
-                budget_balances = []
-                card_total_spent = 0
-                card_total_limit = 0
-                
-                for card_budget in card_budgets:
-                    # Get budget details
-                    budget_response = supabase.table("budgets").select("*").eq("id", card_budget["budget_id"]).execute()
-                    if budget_response.data:
-                        budget = budget_response.data[0]
-                        
-                        # Calculate spent amount for this card-budget combination within date range using transactions.date
-                        transactions_response = supabase.table("transactions").select("amount").eq("card_budget_id", card_budget["id"]).gte("date", start_date.isoformat()).execute()
-                        spent_amount = sum(t["amount"] for t in transactions_response.data)
-                        
-                        # Adjust budget limit based on period
-                        adjusted_limit = budget["limit_amount"]
-                        if budget["period"] == "weekly":
-                            if period == "month":
-                                adjusted_limit = budget["limit_amount"] * 4  # 4 weeks in a month
-                            elif period == "quarter":
-                                adjusted_limit = budget["limit_amount"] * 13  # ~13 weeks in a quarter
-                            elif period == "year":
-                                adjusted_limit = budget["limit_amount"] * 52  # 52 weeks in a year
-                        elif budget["period"] == "monthly":
-                            if period == "week":
-                                adjusted_limit = budget["limit_amount"] / 4  # 1/4 of monthly for a week
-                            elif period == "quarter":
-                                adjusted_limit = budget["limit_amount"] * 3  # 3 months in a quarter
-                            elif period == "year":
-                                adjusted_limit = budget["limit_amount"] * 12  # 12 months in a year
-                        elif budget["period"] == "quarterly":
-                            if period == "week":
-                                adjusted_limit = budget["limit_amount"] / 13  # 1/13 of quarterly for a week
-                            elif period == "month":
-                                adjusted_limit = budget["limit_amount"] / 3  # 1/3 of quarterly for a month
-                            elif period == "year":
-                                adjusted_limit = budget["limit_amount"] * 4  # 4 quarters in a year
-                        
-                        remaining_amount = adjusted_limit - spent_amount
-                        
-                        budget_balances.append(BudgetBalance(
-                            budget_id=budget["id"],
-                            budget_name=budget["name"],
-                            limit_amount=adjusted_limit,
-                            spent_amount=spent_amount,
-                            remaining_amount=remaining_amount,
-                            period=budget["period"]
-                        ))
-                        
-                        card_total_spent += spent_amount
-                        card_total_limit += adjusted_limit
-                
-                card_remaining = card_total_limit - card_total_spent
-                
-                card_balances.append(CardBalance(
-                    card_id=card["id"],
-                    card_name=card["name"],
-                    total_spent=card_total_spent,
-                    total_limit=card_total_limit,
-                    remaining_amount=card_remaining,
-                    budget_balances=budget_balances
-                ))
-                
-                total_spent += card_total_spent
-                total_limit += card_total_limit
-            
-            total_remaining = total_limit - total_spent
-            
-            return BalanceResponse(
-                card_balances=card_balances,
-                total_spent=total_spent,
-                total_limit=total_limit,
-                total_remaining=total_remaining
-            )
-            
+            snapshot = AnalyticsService._load_snapshot(user_id, period, with_card_balances=True)
+            return AnalyticsService._build_balances(snapshot)
+
         except Exception as e:
             print(f"DEBUG: Get balances error: {str(e)}")
-            raise HTTPException(status_code=400, detail=str(e)) 
\ No newline at end of file
+            raise HTTPException(status_code=400, detail=str(e))
+
+    @staticmethod
+    async def get_dashboard(user_id: str, period: str = "month", recent_limit: int = 10, cache_ttl: float = None):
+        """Get balances, spending, recent transactions and cards in one call"""
+        return await analytics_flight.do(
+            (user_id, "dashboard", period, recent_limit),
+            lambda: run_in_threadpool(AnalyticsService._compute_dashboard, user_id, period, recent_limit),
+            ttl=cache_ttl
+        )
+
+    @staticmethod
+    async def warm_account(user_id: str, period: str = "month", recent_limit: int = 10):
+        """Prefetch the account's entity graph, running spend totals and
+        dashboard after sign-in.
+
+        Runs as a background task once the login response has been sent. The
+        dashboard result is kept for LOGIN_WARMUP_TTL seconds (or until the
+        account writes), and a dashboard request arriving mid-warm-up joins it.
+        Every cache warmed here belongs to the worker that served the login,
+        so requests routed to other workers (or serverless instances) load cold.
+        """
+        # Imported here: the authorization service builds on this one
+        from ..services.authorization_service import AuthorizationService
+
+        try:
+            # Loads the entity graph too, which the dashboard then reuses
+            await run_in_threadpool(AuthorizationService.warm_spend, user_id)
+        except Exception as e:
+            # Warm-up is best effort; authorization will simply load cold
+            print(f"DEBUG: Spend warm-up failed: {getattr(e, 'detail', str(e))}")
+        try:
+            await AnalyticsService.get_dashboard(user_id, period, recent_limit, cache_ttl=settings.LOGIN_WARMUP_TTL)
+            print(f"DEBUG: Warmed analytics cache for {user_id}")
+        except Exception as e:
+            # Warm-up is best effort; the dashboard will simply load cold
+            print(f"DEBUG: Analytics warm-up failed: {getattr(e, 'detail', str(e))}")
+
+    @staticmethod
+    def _compute_dashboard(user_id: str, period: str = "month", recent_limit: int = 10):
+        """Compute every dashboard view from one shared snapshot (blocking)"""
+        print(f"=== GET DASHBOARD ===")
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Supabase not configured.")
+
+        try:
+            snapshot = AnalyticsService._load_snapshot(user_id, period, with_card_balances=True)
+            recent = AnalyticsService._fetch_recent(user_id, recent_limit)
+
+            return DashboardResponse(
+                balances=AnalyticsService._build_balances(snapshot),
+                spending=AnalyticsService._build_spending(snapshot),
+                recent_transactions=AnalyticsService._build_recent(snapshot, recent, recent_limit),
+                cards=AnalyticsService._build_cards(snapshot)
+            )
+
+        except Exception as e:
+            print(f"DEBUG: Get dashboard error: {str(e)}")
+            raise HTTPException(status_code=400, detail=str(e))
+
+    @staticmethod
+    def _bucket_starts(start: date, end: date, interval: str) -> list:
+        """Start dates of every bucket from the one containing start up to end"""
+        if interval == "day":
+            return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        if interval == "week":
+            # Weeks start on Monday
+            first = start - timedelta(days=start.weekday())
+            return [first + timedelta(weeks=i) for i in range((end - first).days // 7 + 1)]
+        months = (end.year - start.year) * 12 + end.month - start.month + 1
+        return [date(start.year + (start.month - 1 + i) // 12, (start.month - 1 + i) % 12 + 1, 1) for i in range(months)]
+
+    @staticmethod
+    def _build_timeseries(graph: dict, transactions: list, period: str, start: date, end: date, interval: str, split_by: str = None) -> TimeSeriesResponse:
+        """Bucket transaction amounts in a single pass, with empty buckets filled"""
+        buckets = AnalyticsService._bucket_starts(start, end, interval)
+        first = buckets[0]
+        size = len(buckets)
+        card_budgets_by_id = graph["card_budgets_by_id"]
+
+        totals = [0.0] * size
+        series = {}
+        # Most transactions share a day with others; map each day to its bucket once
+        bucket_by_day = {}
+        for transaction in transactions:
+            day = transaction["date"][:10]
+            index = bucket_by_day.get(day)
+            if index is None:
+                d = date.fromisoformat(day)
+                if interval == "day":
+                    index = (d - first).days
+                elif interval == "week":
+                    index = (d - first).days // 7
+                else:
+                    index = (d.year - first.year) * 12 + d.month - first.month
+                bucket_by_day[day] = index
+            if not 0 <= index < size:
+                continue
+
+            amount = transaction["amount"]
+            totals[index] += amount
+            if split_by:
+                if split_by == "category":
+                    key = transaction.get("category") or ""
+                else:
+                    card_budget = card_budgets_by_id.get(transaction["card_budget_id"])
+                    if not card_budget:
+                        continue
+                    key = card_budget["card_id"] if split_by == "card" else card_budget["budget_id"]
+                values = series.get(key)
+                if values is None:
+                    values = series[key] = [0.0] * size
+                values[index] += amount
+
+        def label(key):
+            if split_by == "card":
+                return graph["cards_by_id"].get(key, {}).get("name", "Unknown Card")
+            if split_by == "budget":
+                return graph["budgets_by_id"].get(key, {}).get("name", "Unknown Budget")
+            return key or "Uncategorized"
+
+        return TimeSeriesResponse(
+            period=period,
+            interval=interval,
+            split_by=split_by,
+            buckets=[bucket.isoformat() for bucket in buckets],
+            totals=[round(value, 2) for value in totals],
+            series=sorted(
+                (
+                    TimeSeriesSeries(key=key, label=label(key), values=[round(value, 2) for value in values], total=round(sum(values), 2))
+                    for key, values in series.items()
+                ),
+                key=lambda s: s.total,
+                reverse=True
+            )
+        )
+
+    @staticmethod
+    async def get_timeseries(user_id: str, period: str = "year", interval: str = "month", split_by: str = None):
+        """Get spend per day, week or month, optionally split by card, budget or category"""
+        if interval not in TIMESERIES_INTERVALS:
+            raise HTTPException(status_code=400, detail=f"interval must be one of: {', '.join(TIMESERIES_INTERVALS)}")
+        if split_by is not None and split_by not in TIMESERIES_SPLITS:
+            raise HTTPException(status_code=400, detail=f"split_by must be one of: {', '.join(TIMESERIES_SPLITS)}")
+        return await analytics_flight.do(
+            (user_id, "timeseries", period, interval, split_by),
+            lambda: run_in_threadpool(AnalyticsService._compute_timeseries, user_id, period, interval, split_by)
+        )
+
+    @staticmethod
+    def _compute_timeseries(user_id: str, period: str, interval: str, split_by: str = None):
+        """Compute a bucketed spend time series (blocking, run in a worker thread)"""
+        print(f"=== GET TIMESERIES ===")
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Supabase not configured.")
+
+        try:
+            graph = AnalyticsService._load_entity_graph(user_id)
+            start_date = AnalyticsService._period_start(period)
+            # Only the columns bucketing reads
+            transactions = ArchiveService.select_transactions("card_budget_id, amount, date, category", user_id, since=start_date)
+
+            return AnalyticsService._build_timeseries(
+                graph, transactions, period, start_date.date(), datetime.utcnow().date(), interval, split_by
+            )
+
+        except Exception as e:
+            print(f"DEBUG: Get timeseries error: {str(e)}")
+            raise HTTPException(status_code=400, detail=str(e))
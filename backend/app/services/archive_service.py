@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from ..config.database import supabase
+from ..config.settings import settings
+
+HOT_TABLE = "transactions"
+ARCHIVE_TABLE = "transactions_archive"
+
+class ArchiveService:
+    """Routes transaction reads between the hot table and the archive.
+
+    With TRANSACTION_ARCHIVE_DAYS > 0 (and migrations/0001_transactions_archive.sql
+    applied), the archive job moves transactions dated before the horizon into
+    transactions_archive. Every transaction dated inside the horizon therefore
+    lives in the hot table, so queries that start inside it never touch the
+    archive, while longer ranges read both tables. With the setting at 0 all
+    reads go to the hot table only.
+    """
+
+    @staticmethod
+    def enabled() -> bool:
+        return settings.TRANSACTION_ARCHIVE_DAYS > 0
+
+    @staticmethod
+    def horizon() -> Optional[datetime]:
+        """Oldest date guaranteed to be in the hot table (None when archiving is off)"""
+        if not ArchiveService.enabled():
+            return None
+        return datetime.utcnow() - timedelta(days=settings.TRANSACTION_ARCHIVE_DAYS)
+
+    @staticmethod
+    def tables_for(since: Optional[datetime] = None) -> list:
+        """Tables holding transactions dated on or after since (None = all history)"""
+        horizon = ArchiveService.horizon()
+        if horizon is None or (since is not None and since >= horizon):
+            return [HOT_TABLE]
+        return [HOT_TABLE, ARCHIVE_TABLE]
+
+    @staticmethod
+    def fetch_all(build_query, page_size: int = 1000) -> list:
+        """Run a select in pages until a short page, since PostgREST caps every
+        response at its max-rows (1000 by default) without saying so.
+
+        build_query returns a fresh, ordered query each call: the builder keeps
+        its range, so one instance cannot be paged twice.
+        """
+        rows = []
+        start = 0
+        while True:
+            page = build_query().range(start, start + page_size - 1).execute().data
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            start += page_size
+
+    @staticmethod
+    def select_transactions(columns: str, account_id: str, card_budget_ids: Optional[list] = None, since: Optional[datetime] = None, before: Optional[datetime] = None) -> list:
+        """Select an account's transactions dated from since up to (not including)
+        before, newest first, from every table the range touches, optionally
+        narrowed to some of its card_budgets"""
+        if card_budget_ids is not None and not card_budget_ids:
+            return []
+        rows = []
+        for table in ArchiveService.tables_for(since):
+            def build_query(table=table):
+                query = supabase.table(table).select(columns).eq("account_id", account_id)
+                if card_budget_ids is not None:
+                    query = query.in_("card_budget_id", card_budget_ids)
+                if since is not None:
+                    query = query.gte("date", since.isoformat())
+                if before is not None:
+                    query = query.lt("date", before.isoformat())
+                # id breaks ties, so pages never overlap or skip rows
+                # (migrations/0012 indexes this order)
+                return query.order("date", desc=True).order("id", desc=True)
+            rows.extend(ArchiveService.fetch_all(build_query))
+        if len(ArchiveService.tables_for(since)) > 1:
+            # Rows past the horizon stay in the hot table until the archive job runs
+            rows.sort(key=lambda row: (row["date"], row["id"]), reverse=True)
+        return rows
+
+    @staticmethod
+    def select_recent(account_id: str, limit: int) -> list:
+        """Latest transactions, reading the archive only if the hot table runs short"""
+        rows = supabase.table(HOT_TABLE).select("*").eq("account_id", account_id).order("date", desc=True).limit(limit).execute().data
+        if len(rows) < limit and ArchiveService.enabled():
+            rows.extend(
+                supabase.table(ARCHIVE_TABLE).select("*").eq("account_id", account_id).order("date", desc=True).limit(limit - len(rows)).execute().data
+            )
+        return rows
+
+    @staticmethod
+    def find_table(account_id: str, transaction_id: str, columns: str = "*"):
+        """Return (table, row) for an account's transaction in either table, or (None, None)"""
+        for table in ArchiveService.tables_for():
+            response = supabase.table(table).select(columns).eq("id", transaction_id).eq("account_id", account_id).execute()
+            if response.data:
+                return table, response.data[0]
+        return None, None
+
+    @staticmethod
+    def archive_old_transactions(batch_size: int = None) -> int:
+        """Move transactions older than the horizon into the archive; returns the count.
+
+        The move happens inside the archive_transactions() database function, so
+        each batch is deleted and inserted in one transaction.
+        """
+        if not ArchiveService.enabled():
+            print("DEBUG: Transaction archiving disabled (TRANSACTION_ARCHIVE_DAYS=0)")
+            return 0
+
+        batch_size = batch_size or settings.TRANSACTION_ARCHIVE_BATCH_SIZE
+        total = 0
+        while True:
+            response = supabase.rpc("archive_transactions", {
+                "horizon_days": settings.TRANSACTION_ARCHIVE_DAYS,
+                "batch_size": batch_size
+            }).execute()
+            moved = response.data or 0
+            total += moved
+            print(f"DEBUG: Archived {moved} transactions (total {total})")
+            if moved < batch_size:
+                return total
@@ -0,0 +1,169 @@
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from datetime import datetime, timedelta
+import asyncio
+import threading
+import time
+from ..config.database import supabase
+from ..config.settings import settings
+from ..models.budget import BudgetBalance
+from ..models.transaction import AuthorizationResponse
+from ..services.analytics_service import AnalyticsService
+from ..services.balance_service import BalanceService
+from ..utils.cache import TTLCache
+
+# Length of each budget period, used as the window for running spend totals
+BUDGET_PERIOD_DAYS = {"weekly": 7, "monthly": 30, "quarterly": 90}
+
+# Running spend per card_budget over its budget's current window, keyed by
+# (user_id, "spend", card_budget_id). Creates add to the total in place; updates
+# and deletes drop the account's totals, and entries are reloaded after
+# AUTHORIZATION_SPEND_TTL seconds so the window keeps sliding. These totals and
+# the cached entity graph only see this worker's writes, so decisions made from
+# them are advisory: create_transaction() in the database (migrations/0007)
+# enforces card status and budget limits on every insert.
+period_spend_cache = TTLCache(max_entries=10000, ttl=settings.AUTHORIZATION_SPEND_TTL)
+_spend_lock = threading.Lock()
+
+class AuthorizationService:
+    @staticmethod
+    def _load_period_spend(user_id: str, card_budget_id: str, budget: dict) -> float:
+        """Return the card_budget's spend in its budget window, from cache or one query"""
+        cache_key = (user_id, "spend", card_budget_id)
+        spent = period_spend_cache.get(cache_key)
+        if spent is not None:
+            return spent
+
+        window_days = BUDGET_PERIOD_DAYS.get(budget["period"], 30)
+        window_start = datetime.utcnow() - timedelta(days=window_days)
+        spent = BalanceService.period_spend(user_id, [card_budget_id], window_start)[card_budget_id]
+        period_spend_cache.set(cache_key, spent)
+        return spent
+
+    @staticmethod
+    def warm_spend(user_id: str):
+        """Load the running totals of every card_budget not already cached,
+        one query per budget period length (blocking)"""
+        graph = AnalyticsService._load_entity_graph(user_id)
+        missing = {}
+        for card_budget in graph["card_budgets"]:
+            budget = graph["budgets_by_id"].get(card_budget["budget_id"])
+            if budget and period_spend_cache.get((user_id, "spend", card_budget["id"])) is None:
+                missing.setdefault(BUDGET_PERIOD_DAYS.get(budget["period"], 30), []).append(card_budget["id"])
+        for window_days, card_budget_ids in missing.items():
+            window_start = datetime.utcnow() - timedelta(days=window_days)
+            spent = BalanceService.period_spend(user_id, card_budget_ids, window_start)
+            for card_budget_id in card_budget_ids:
+                period_spend_cache.set((user_id, "spend", card_budget_id), spent[card_budget_id])
+
+    @staticmethod
+    def _decide(user_id: str, card_budget_id: str, amount: float, started: float) -> AuthorizationResponse:
+        """Make the advisory approve/decline decision from cached state (blocking)"""
+        graph = AnalyticsService._load_entity_graph(user_id)
+        card_budget = graph["card_budgets_by_id"].get(card_budget_id)
+
+        def respond(approved, reason=None, limit_amount=None, spent_amount=None, remaining_amount=None):
+            return AuthorizationResponse(
+                approved=approved,
+                decision="approve" if approved else "decline",
+                reason=reason,
+                card_budget_id=card_budget_id,
+                limit_amount=limit_amount,
+                spent_amount=spent_amount,
+                remaining_amount=remaining_amount,
+                latency_ms=round((time.perf_counter() - started) * 1000, 2)
+            )
+
+        if not card_budget:
+            return respond(False, "card_budget_not_found")
+
+        card = graph["cards_by_id"].get(card_budget["card_id"])
+        budget = graph["budgets_by_id"].get(card_budget["budget_id"])
+        if not card or not budget:
+            return respond(False, "card_budget_not_found")
+        if card["status"] in ("frozen", "cancelled"):
+            return respond(False, f"card_{card['status']}")
+
+        limit_amount = budget["limit_amount"]
+        spent_amount = AuthorizationService._load_period_spend(user_id, card_budget_id, budget)
+        remaining_amount = limit_amount - spent_amount
+
+        # Refunds and zero-amount checks never exceed the budget
+        if amount > 0 and amount > remaining_amount:
+            return respond(False, "insufficient_budget", limit_amount, spent_amount, remaining_amount)
+
+        return respond(True, None, limit_amount, spent_amount, remaining_amount - amount)
+
+    @staticmethod
+    async def authorize(user_id: str, card_budget_id: str, amount: float) -> AuthorizationResponse:
+        """Approve or decline a spend within AUTHORIZATION_TIMEOUT_MS of warm state"""
+        print(f"=== AUTHORIZE TRANSACTION ===")
+
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Supabase not configured.")
+
+        started = time.perf_counter()
+        try:
+            if period_spend_cache.get((user_id, "spend", card_budget_id)) is None:
+                # Cold: load the account's graph and running totals before the
+                # latency budget starts, instead of declining the first attempt
+                print(f"DEBUG: Warming authorization state for card_budget {card_budget_id}")
+                await run_in_threadpool(AuthorizationService.warm_spend, user_id)
+            decision = await asyncio.wait_for(
+                run_in_threadpool(AuthorizationService._decide, user_id, card_budget_id, amount, started),
+                timeout=settings.AUTHORIZATION_TIMEOUT_MS / 1000
+            )
+        except asyncio.TimeoutError:
+            # The worker thread keeps running and warms the caches for the next attempt
+            print(f"DEBUG: Authorization exceeded {settings.AUTHORIZATION_TIMEOUT_MS}ms budget")
+            approved = settings.AUTHORIZATION_FAIL_OPEN
+            decision = AuthorizationResponse(
+                approved=approved,
+                decision="approve" if approved else "decline",
+                reason="authorization_timeout",
+                card_budget_id=card_budget_id,
+                latency_ms=round((time.perf_counter() - started) * 1000, 2)
+            )
+        except Exception as e:
+            print(f"DEBUG: Authorization error: {str(e)}")
+            raise HTTPException(status_code=400, detail=str(e))
+
+        print(f"DEBUG: Authorization {decision.decision} ({decision.reason}) in {decision.latency_ms}ms")
+        return decision
+
+    @staticmethod
+    def budget_balance(user_id: str, card_budget_id: str):
+        """Balance of a card_budget over its budget's current period, from the running totals"""
+        graph = AnalyticsService._load_entity_graph(user_id)
+        card_budget = graph["card_budgets_by_id"].get(card_budget_id)
+        budget = graph["budgets_by_id"].get(card_budget["budget_id"]) if card_budget else None
+        if not budget:
+            return None
+        spent_amount = AuthorizationService._load_period_spend(user_id, card_budget_id, budget)
+        return BudgetBalance(
+            budget_id=budget["id"],
+            budget_name=budget["name"],
+            limit_amount=budget["limit_amount"],
+            spent_amount=spent_amount,
+            remaining_amount=budget["limit_amount"] - spent_amount,
+            period=budget["period"]
+        )
+
+    @staticmethod
+    def record_spend(user_id: str, card_budget_id: str, amount: float, date: str = None):
+        """Add a newly created transaction to the card_budget's running total"""
+        cache_key = (user_id, "spend", card_budget_id)
+        with _spend_lock:
+            # Backdated transactions may fall outside the window; reload instead
+            if date and date < (datetime.utcnow() - timedelta(days=1)).isoformat():
+                period_spend_cache.pop(cache_key)
+                return
+            spent = period_spend_cache.get(cache_key)
+            if spent is not None:
+                # Keep the original expiry so the window still gets reloaded on time
+                period_spend_cache.update(cache_key, spent + amount)
+
+    @staticmethod
+    def forget_spend(user_id: str):
+        """Drop the account's running totals after a transaction update or delete"""
+        period_spend_cache.invalidate_account(user_id)
@@ -0,0 +1,39 @@
+from datetime import datetime
+from ..config.database import supabase
+
+DAILY_SPEND_TABLE = "card_budget_daily_spend"
+
+class BalanceService:
+    """Reads the running totals maintained by migrations/0004_card_balances.sql.
+
+    Triggers keep cards.balance and card_budget_daily_spend in step with every
+    transaction write, so reads never aggregate transactions. Period spend is
+    counted to the day: a window starting mid-day includes that whole day.
+    """
+
+    @staticmethod
+    def period_spend(account_id: str, card_budget_ids: list, since: datetime) -> dict:
+        """Spend per card_budget on or after since's day, in one query"""
+        if not card_budget_ids:
+            return {}
+        rows = supabase.table(DAILY_SPEND_TABLE).select("card_budget_id, amount").eq("account_id", account_id).in_("card_budget_id", card_budget_ids).gte("day", since.date().isoformat()).execute().data
+        spent = {card_budget_id: 0 for card_budget_id in card_budget_ids}
+        for row in rows:
+            spent[row["card_budget_id"]] += row["amount"]
+        return spent
+
+    @staticmethod
+    def reconcile(batch_size: int = 500):
+        """Recompute card balances and daily spend chunk by chunk, repairing drift.
+
+        Yields each chunk's result as it completes, so progress streams and
+        memory stays flat however many cards there are.
+        """
+        after_id = None
+        while True:
+            response = supabase.rpc("reconcile_card_balances", {"after_id": after_id, "batch_size": batch_size}).execute()
+            result = response.data[0] if response.data else {}
+            if not result.get("last_id"):
+                return
+            yield result
+            after_id = result["last_id"]
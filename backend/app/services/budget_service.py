@@ -1,10 +1,24 @@
 from fastapi import HTTPException
 from datetime import datetime
 from ..config.database import supabase
-from ..models.budget import BudgetCreate, BudgetResponse
+from ..config.settings import settings
+from ..models.budget import BudgetCreate, BudgetResponse, BudgetBulkRequest, BudgetBulkResult, BudgetBulkResponse
+from ..utils.bulk import duplicate_ids, is_uuid, sort_results
+from ..utils.cache import invalidate_account
+from typing import Optional
 import traceback
 
+# Values allowed by the budgets.period CHECK constraint
+BUDGET_PERIODS = ("monthly", "weekly", "quarterly")
+
 class BudgetService:
+    @staticmethod
+    def _validate(budget_data: BudgetCreate) -> Optional[str]:
+        """Reason a budget would be rejected by the database, checked before writing"""
+        if budget_data.period not in BUDGET_PERIODS:
+            return f"period must be one of: {', '.join(BUDGET_PERIODS)}"
+        return None
+
     @staticmethod
     async def create_budget(user_id: str, budget_data: BudgetCreate):
         """Create a new budget"""
@@ -25,6 +39,7 @@ class BudgetService:
             }
             
             response = supabase.table("budgets").insert(budget_insert_data).execute()
+            invalidate_account(user_id)
             
             if response.data:
                 return BudgetResponse(**response.data[0])
@@ -80,6 +95,7 @@ class BudgetService:
             print(f"DEBUG: Updating budget with data: {budget_update_data}")
             
             response = supabase.table("budgets").update(budget_update_data).eq("id", budget_id).execute()
+            invalidate_account(user_id)
             
             print(f"DEBUG: Update budget response: {response}")
             
@@ -113,6 +129,7 @@ class BudgetService:
             print(f"DEBUG: Deleting budget with ID: {budget_id}")
             
             response = supabase.table("budgets").delete().eq("id", budget_id).execute()
+            invalidate_account(user_id)
             
             print(f"DEBUG: Delete budget response: {response}")
             
@@ -123,4 +140,110 @@ class BudgetService:
                 
         except Exception as e:
             print(f"DEBUG: Delete budget error: {str(e)}")
-            raise HTTPException(status_code=400, detail=str(e)) 
\ No newline at end of file
+            raise HTTPException(status_code=400, detail=str(e))
+
+    @staticmethod
+    async def bulk_budgets(user_id: str, bulk_data: BudgetBulkRequest):
+        """Create, update and delete many budgets with one statement per operation"""
+        print(f"=== BULK BUDGETS ===")
+        print(f"DEBUG: Received bulk request - create {len(bulk_data.create)}, update {len(bulk_data.update)}, delete {len(bulk_data.delete)}")
+        
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Supabase not configured.")
+        
+        item_count = len(bulk_data.create) + len(bulk_data.update) + len(bulk_data.delete)
+        if item_count > settings.BULK_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail=f"Bulk requests are limited to {settings.BULK_MAX_ITEMS} items")
+        
+        results = []
+        try:
+            created_at = datetime.utcnow().isoformat()
+            creates = []
+            for index, item in enumerate(bulk_data.create):
+                error = BudgetService._validate(item)
+                if error:
+                    results.append(BudgetBulkResult(operation="create", index=index, status="invalid", error=error))
+                    continue
+                creates.append((index, {
+                    "account_id": user_id,
+                    "name": item.name,
+                    "limit_amount": item.limit_amount,
+                    "period": item.period,
+                    "require_receipts": item.require_receipts,
+                    "created_at": created_at
+                }))
+            if creates:
+                try:
+                    created = supabase.table("budgets").insert([row for _, row in creates]).execute().data
+                    for (index, _), budget in zip(creates, created):
+                        results.append(BudgetBulkResult(operation="create", index=index, id=budget["id"], status="created", budget=BudgetResponse(**budget)))
+                except Exception as e:
+                    print(f"DEBUG: Bulk budget insert error: {str(e)}")
+                    results.extend(BudgetBulkResult(operation="create", index=index, status="failed", error=str(e)) for index, _ in creates)
+            
+            # An ID listed twice has no single intended value, so neither is applied
+            duplicates = duplicate_ids([item.id for item in bulk_data.update])
+            updates = []
+            for index, item in enumerate(bulk_data.update):
+                if item.id in duplicates:
+                    results.append(BudgetBulkResult(operation="update", index=index, id=item.id, status="invalid", error="Budget listed more than once in update"))
+                    continue
+                if not is_uuid(item.id):
+                    results.append(BudgetBulkResult(operation="update", index=index, id=item.id, status="not_found", error="Budget not found"))
+                    continue
+                error = BudgetService._validate(item)
+                if error:
+                    results.append(BudgetBulkResult(operation="update", index=index, id=item.id, status="invalid", error=error))
+                    continue
+                updates.append((index, {
+                    "id": item.id,
+                    "name": item.name,
+                    "limit_amount": item.limit_amount,
+                    "period": item.period,
+                    "require_receipts": item.require_receipts
+                }))
+            if updates:
+                try:
+                    # Updates the account's own rows in one statement; missing IDs match nothing,
+                    # and a row of another account refuses the whole batch
+                    updated = supabase.rpc("bulk_update_budgets", {"p_account_id": user_id, "p_rows": [row for _, row in updates]}).execute().data
+                    updated_by_id = {budget["id"]: budget for budget in updated}
+                    for index, row in updates:
+                        budget = updated_by_id.get(row["id"])
+                        if budget:
+                            results.append(BudgetBulkResult(operation="update", index=index, id=row["id"], status="updated", budget=BudgetResponse(**budget)))
+                        else:
+                            results.append(BudgetBulkResult(operation="update", index=index, id=row["id"], status="not_found", error="Budget not found"))
+                except Exception as e:
+                    print(f"DEBUG: Bulk budget update error: {str(e)}")
+                    error = str(e)
+                    if getattr(e, "code", None) == "42501":
+                        error = "Update includes a budget of another account; nothing was updated"
+                    results.extend(BudgetBulkResult(operation="update", index=index, id=row["id"], status="failed", error=error) for index, row in updates)
+            
+            delete_ids = [budget_id for budget_id in dict.fromkeys(bulk_data.delete) if is_uuid(budget_id)]
+            deleted = set()
+            delete_error = None
+            if delete_ids:
+                try:
+                    deleted = {budget["id"] for budget in supabase.table("budgets").delete().in_("id", delete_ids).eq("account_id", user_id).execute().data}
+                except Exception as e:
+                    print(f"DEBUG: Bulk budget delete error: {str(e)}")
+                    delete_error = str(e)
+            for index, budget_id in enumerate(bulk_data.delete):
+                if budget_id in deleted:
+                    results.append(BudgetBulkResult(operation="delete", index=index, id=budget_id, status="deleted"))
+                elif delete_error and is_uuid(budget_id):
+                    results.append(BudgetBulkResult(operation="delete", index=index, id=budget_id, status="failed", error=delete_error))
+                else:
+                    results.append(BudgetBulkResult(operation="delete", index=index, id=budget_id, status="not_found", error="Budget not found"))
+            
+            sort_results(results)
+            return BudgetBulkResponse(results=results)
+                
+        except Exception as e:
+            print(f"DEBUG: Bulk budgets error: {str(e)}")
+            raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            if any(result.status in ("created", "updated", "deleted") for result in results):
+                invalidate_account(user_id)
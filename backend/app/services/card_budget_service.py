@@ -1,5 +1,6 @@
 from fastapi import HTTPException
 from ..config.database import supabase
+from ..services.analytics_service import AnalyticsService
 import traceback
 
 class CardBudgetService:
@@ -14,32 +15,23 @@ class CardBudgetService:
         try:
             print(f"DEBUG: Token verified, user ID: {user_id}")
             
-            # Get all card_budgets for the user's cards
-            response = supabase.table("card_budgets").select("id, card_id, budget_id").execute()
+            # The account's card_budgets, cards and budgets, each selected by account_id
+            graph = AnalyticsService._load_entity_graph(user_id)
             
-            print(f"DEBUG: Card budgets response: {response}")
+            card_budgets_with_details = []
+            for cb in graph["card_budgets"]:
+                card = graph["cards_by_id"].get(cb["card_id"])
+                budget = graph["budgets_by_id"].get(cb["budget_id"])
+                if card and budget:
+                    card_budgets_with_details.append({
+                        "id": cb["id"],
+                        "card_id": cb["card_id"],
+                        "budget_id": cb["budget_id"],
+                        "card_name": card["name"],
+                        "budget_name": budget["name"]
+                    })
             
-            if response.data:
-                # Get card and budget details for each card_budget
-                card_budgets_with_details = []
-                for cb in response.data:
-                    # Get card details
-                    card_response = supabase.table("cards").select("name, account_id").eq("id", cb["card_id"]).execute()
-                    if card_response.data and card_response.data[0]["account_id"] == user_id:
-                        # Get budget details
-                        budget_response = supabase.table("budgets").select("name").eq("id", cb["budget_id"]).execute()
-                        if budget_response.data:
-                            card_budgets_with_details.append({
-                                "id": cb["id"],
-                                "card_id": cb["card_id"],
-                                "budget_id": cb["budget_id"],
-                                "card_name": card_response.data[0]["name"],
-                                "budget_name": budget_response.data[0]["name"]
-                            })
-                
-                return card_budgets_with_details
-            else:
-                return []
+            return card_budgets_with_details
                 
         except Exception as e:
             print(f"DEBUG: Get card budgets error: {str(e)}")
@@ -1,11 +1,66 @@
 from fastapi import HTTPException
-from datetime import datetime, timedelta
+from datetime import datetime
 from ..config.database import supabase
-from ..models.card import CardCreate, CardResponse
+from ..config.settings import settings
+from ..models.card import CardCreate, CardResponse, CardBulkRequest, CardBulkResult, CardBulkResponse
 from ..models.analytics import CardBalance, BudgetBalance
+from ..services.analytics_service import AnalyticsService
+from ..services.balance_service import BalanceService
+from ..utils.bulk import duplicate_ids, is_uuid, sort_results
+from ..utils.cache import invalidate_account
+from typing import Optional
 import traceback
 
+# Values allowed by the cards.status CHECK constraint
+CARD_STATUSES = ("issued", "frozen", "cancelled")
+
 class CardService:
+    @staticmethod
+    def _validate(card_data: CardCreate) -> Optional[str]:
+        """Reason a card would be rejected by the database, checked before writing"""
+        if card_data.status not in CARD_STATUSES:
+            return f"status must be one of: {', '.join(CARD_STATUSES)}"
+        return None
+
+    @staticmethod
+    def _verify_budget_ids(user_id: str, budget_ids: list):
+        """Split budget IDs into those owned by the user and the rest, in one query.
+
+        Returns (valid_ids, invalid_ids), both de-duplicated and in request order.
+        """
+        requested = list(dict.fromkeys(budget_ids))
+        if not requested:
+            return [], []
+
+        # Malformed IDs can never be owned, and would fail the whole query
+        lookup = [budget_id for budget_id in requested if is_uuid(budget_id)]
+        owned = set()
+        if lookup:
+            budgets_response = supabase.table("budgets").select("id").in_("id", lookup).eq("account_id", user_id).execute()
+            owned = {budget["id"] for budget in budgets_response.data}
+        valid_ids = [budget_id for budget_id in requested if budget_id in owned]
+        invalid_ids = [budget_id for budget_id in requested if budget_id not in owned]
+        if invalid_ids:
+            print(f"DEBUG: Ignoring budgets not found for user: {invalid_ids}")
+        return valid_ids, invalid_ids
+
+    @staticmethod
+    def _insert_card_budgets(user_id: str, card_id: str, budget_ids: list):
+        """Associate budgets with a card in one bulk insert"""
+        return CardService._insert_card_budget_pairs(user_id, [(card_id, budget_id) for budget_id in budget_ids])
+
+    @staticmethod
+    def _insert_card_budget_pairs(user_id: str, pairs: list):
+        """Insert (card_id, budget_id) associations for any number of cards in one statement"""
+        if not pairs:
+            return []
+        created_at = datetime.utcnow().isoformat()
+        card_budget_rows = [
+            {"account_id": user_id, "card_id": card_id, "budget_id": budget_id, "created_at": created_at}
+            for card_id, budget_id in pairs
+        ]
+        return supabase.table("card_budgets").insert(card_budget_rows).execute().data
+
     @staticmethod
     async def get_cards(user_id: str):
         """Get all cards for a user"""
@@ -53,11 +108,13 @@ class CardService:
         try:
             print(f"DEBUG: Token verified, user ID: {user_id}")
             
+            # Verify all requested budgets belong to the user in a single query
+            valid_budget_ids, invalid_budget_ids = CardService._verify_budget_ids(user_id, card_data.budget_ids)
+            
             card_insert_data = {
                 "account_id": user_id,
                 "name": card_data.name,
                 "status": card_data.status,
-                "balance": card_data.balance,
                 "cardholder_name": card_data.cardholder_name,
                 "cvv": card_data.cvv,
                 "expiry": card_data.expiry,
@@ -75,20 +132,11 @@ class CardService:
             if response.data:
                 created_card = response.data[0]
                 
-                # Associate budgets with the card if provided
-                if card_data.budget_ids:
-                    for budget_id in card_data.budget_ids:
-                        # Verify the budget belongs to the user
-                        budget_response = supabase.table("budgets").select("*").eq("id", budget_id).eq("account_id", user_id).execute()
-                        if budget_response.data:
-                            card_budget_data = {
-                                "card_id": created_card["id"],
-                                "budget_id": budget_id,
-                                "created_at": datetime.utcnow().isoformat()
-                            }
-                            supabase.table("card_budgets").insert(card_budget_data).execute()
+                # Associate the verified budgets with the card in one insert
+                CardService._insert_card_budgets(user_id, created_card["id"], valid_budget_ids)
                 
-                return CardResponse(**{**created_card, "budget_ids": card_data.budget_ids})
+                invalidate_account(user_id)
+                return CardResponse(**{**created_card, "budget_ids": valid_budget_ids, "invalid_budget_ids": invalid_budget_ids})
             else:
                 raise HTTPException(status_code=400, detail="Failed to create card")
                 
@@ -114,10 +162,12 @@ class CardService:
             if not card_response.data:
                 raise HTTPException(status_code=404, detail="Card not found")
             
+            # Verify all requested budgets belong to the user in a single query
+            valid_budget_ids, invalid_budget_ids = CardService._verify_budget_ids(user_id, card_data.budget_ids)
+            
             card_update_data = {
                 "name": card_data.name,
                 "status": card_data.status,
-                "balance": card_data.balance,
                 "cardholder_name": card_data.cardholder_name,
                 "cvv": card_data.cvv,
                 "expiry": card_data.expiry,
@@ -134,24 +184,22 @@ class CardService:
             if response.data:
                 updated_card = response.data[0]
                 
-                # Update budget associations
-                # First, remove all existing budget associations
-                supabase.table("card_budgets").delete().eq("card_id", card_id).execute()
+                # Update budget associations by diffing the existing and requested sets.
+                # Unchanged card_budgets keep their IDs, and with them their transactions
+                # (transactions.card_budget_id cascades on delete).
+                existing_response = supabase.table("card_budgets").select("id, budget_id").eq("card_id", card_id).execute()
+                existing = {cb["budget_id"]: cb["id"] for cb in existing_response.data}
+                
+                removed_ids = [cb_id for budget_id, cb_id in existing.items() if budget_id not in valid_budget_ids]
+                added_budget_ids = [budget_id for budget_id in valid_budget_ids if budget_id not in existing]
+                print(f"DEBUG: Budget associations - removing {len(removed_ids)}, adding {len(added_budget_ids)}")
                 
-                # Then add new budget associations
-                if card_data.budget_ids:
-                    for budget_id in card_data.budget_ids:
-                        # Verify the budget belongs to the user
-                        budget_response = supabase.table("budgets").select("*").eq("id", budget_id).eq("account_id", user_id).execute()
-                        if budget_response.data:
-                            card_budget_data = {
-                                "card_id": card_id,
-                                "budget_id": budget_id,
-                                "created_at": datetime.utcnow().isoformat()
-                            }
-                            supabase.table("card_budgets").insert(card_budget_data).execute()
+                if removed_ids:
+                    supabase.table("card_budgets").delete().in_("id", removed_ids).execute()
+                CardService._insert_card_budgets(user_id, card_id, added_budget_ids)
                 
-                return CardResponse(**{**updated_card, "budget_ids": card_data.budget_ids})
+                invalidate_account(user_id)
+                return CardResponse(**{**updated_card, "budget_ids": valid_budget_ids, "invalid_budget_ids": invalid_budget_ids})
             else:
                 raise HTTPException(status_code=400, detail="Failed to update card")
                 
@@ -180,6 +228,7 @@ class CardService:
             print(f"DEBUG: Deleting card with ID: {card_id}")
             
             response = supabase.table("cards").delete().eq("id", card_id).execute()
+            invalidate_account(user_id)
             
             print(f"DEBUG: Delete card response: {response}")
             
@@ -192,6 +241,161 @@ class CardService:
             print(f"DEBUG: Delete card error: {str(e)}")
             raise HTTPException(status_code=400, detail=str(e))
 
+    @staticmethod
+    def _card_row(user_id: str, card_data: CardCreate) -> dict:
+        return {
+            "account_id": user_id,
+            "name": card_data.name,
+            "status": card_data.status,
+            "cardholder_name": card_data.cardholder_name,
+            "cvv": card_data.cvv,
+            "expiry": card_data.expiry,
+            "zipcode": card_data.zipcode,
+            "address": card_data.address
+        }
+
+    @staticmethod
+    async def bulk_cards(user_id: str, bulk_data: CardBulkRequest):
+        """Create, update and delete many cards with one statement per operation"""
+        print(f"=== BULK CARDS ===")
+        print(f"DEBUG: Received bulk request - create {len(bulk_data.create)}, update {len(bulk_data.update)}, delete {len(bulk_data.delete)}")
+        
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Supabase not configured.")
+        
+        item_count = len(bulk_data.create) + len(bulk_data.update) + len(bulk_data.delete)
+        if item_count > settings.BULK_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail=f"Bulk requests are limited to {settings.BULK_MAX_ITEMS} items")
+        
+        results = []
+        try:
+            # Verify every requested budget across the batch in one query
+            all_budget_ids = [budget_id for item in bulk_data.create + bulk_data.update for budget_id in item.budget_ids]
+            valid_budget_ids = set(CardService._verify_budget_ids(user_id, all_budget_ids)[0])
+            
+            def split_budgets(item):
+                requested = list(dict.fromkeys(item.budget_ids))
+                return (
+                    [budget_id for budget_id in requested if budget_id in valid_budget_ids],
+                    [budget_id for budget_id in requested if budget_id not in valid_budget_ids]
+                )
+            
+            created_at = datetime.utcnow().isoformat()
+            creates = []
+            for index, item in enumerate(bulk_data.create):
+                error = CardService._validate(item)
+                if error:
+                    results.append(CardBulkResult(operation="create", index=index, status="invalid", error=error))
+                    continue
+                creates.append((index, item, {**CardService._card_row(user_id, item), "created_at": created_at}))
+            if creates:
+                try:
+                    created = supabase.table("cards").insert([row for _, _, row in creates]).execute().data
+                    budgets_by_card = [split_budgets(item) for _, item, _ in creates]
+                    # Associate budgets for every new card in one insert
+                    CardService._insert_card_budget_pairs(user_id, [
+                        (card["id"], budget_id)
+                        for card, (valid, _) in zip(created, budgets_by_card)
+                        for budget_id in valid
+                    ])
+                    for (index, _, _), card, (valid, invalid) in zip(creates, created, budgets_by_card):
+                        results.append(CardBulkResult(
+                            operation="create", index=index, id=card["id"], status="created",
+                            card=CardResponse(**{**card, "budget_ids": valid, "invalid_budget_ids": invalid})
+                        ))
+                except Exception as e:
+                    print(f"DEBUG: Bulk card insert error: {str(e)}")
+                    results.extend(CardBulkResult(operation="create", index=index, status="failed", error=str(e)) for index, _, _ in creates)
+            
+            # An ID listed twice has no single intended value, so neither is applied
+            duplicates = duplicate_ids([item.id for item in bulk_data.update])
+            updates = []
+            for index, item in enumerate(bulk_data.update):
+                if item.id in duplicates:
+                    results.append(CardBulkResult(operation="update", index=index, id=item.id, status="invalid", error="Card listed more than once in update"))
+                    continue
+                if not is_uuid(item.id):
+                    results.append(CardBulkResult(operation="update", index=index, id=item.id, status="not_found", error="Card not found"))
+                    continue
+                error = CardService._validate(item)
+                if error:
+                    results.append(CardBulkResult(operation="update", index=index, id=item.id, status="invalid", error=error))
+                    continue
+                row = CardService._card_row(user_id, item)
+                del row["account_id"]
+                updates.append((index, item, {"id": item.id, **row}))
+            if updates:
+                try:
+                    # Updates the account's own rows in one statement; missing IDs match nothing,
+                    # and a row of another account refuses the whole batch
+                    updated = supabase.rpc("bulk_update_cards", {"p_account_id": user_id, "p_rows": [row for _, _, row in updates]}).execute().data
+                    updated_by_id = {card["id"]: card for card in updated}
+                    
+                    # Diff budget associations for the updated cards: one read, one delete, one insert
+                    existing = {}
+                    if updated_by_id:
+                        existing_response = supabase.table("card_budgets").select("id, card_id, budget_id").in_("card_id", list(updated_by_id)).execute()
+                        for cb in existing_response.data:
+                            existing.setdefault(cb["card_id"], {})[cb["budget_id"]] = cb["id"]
+                    
+                    removed_ids = []
+                    added_pairs = []
+                    for _, item, row in updates:
+                        if row["id"] not in updated_by_id:
+                            continue
+                        valid, _ = split_budgets(item)
+                        card_existing = existing.get(row["id"], {})
+                        removed_ids.extend(cb_id for budget_id, cb_id in card_existing.items() if budget_id not in valid)
+                        added_pairs.extend((row["id"], budget_id) for budget_id in valid if budget_id not in card_existing)
+                    print(f"DEBUG: Budget associations - removing {len(removed_ids)}, adding {len(added_pairs)}")
+                    if removed_ids:
+                        supabase.table("card_budgets").delete().in_("id", removed_ids).execute()
+                    CardService._insert_card_budget_pairs(user_id, added_pairs)
+                    
+                    for index, item, row in updates:
+                        card = updated_by_id.get(row["id"])
+                        if card:
+                            valid, invalid = split_budgets(item)
+                            results.append(CardBulkResult(
+                                operation="update", index=index, id=row["id"], status="updated",
+                                card=CardResponse(**{**card, "budget_ids": valid, "invalid_budget_ids": invalid})
+                            ))
+                        else:
+                            results.append(CardBulkResult(operation="update", index=index, id=row["id"], status="not_found", error="Card not found"))
+                except Exception as e:
+                    print(f"DEBUG: Bulk card update error: {str(e)}")
+                    error = str(e)
+                    if getattr(e, "code", None) == "42501":
+                        error = "Update includes a card of another account; nothing was updated"
+                    results.extend(CardBulkResult(operation="update", index=index, id=row["id"], status="failed", error=error) for index, _, row in updates)
+            
+            delete_ids = [card_id for card_id in dict.fromkeys(bulk_data.delete) if is_uuid(card_id)]
+            deleted = set()
+            delete_error = None
+            if delete_ids:
+                try:
+                    deleted = {card["id"] for card in supabase.table("cards").delete().in_("id", delete_ids).eq("account_id", user_id).execute().data}
+                except Exception as e:
+                    print(f"DEBUG: Bulk card delete error: {str(e)}")
+                    delete_error = str(e)
+            for index, card_id in enumerate(bulk_data.delete):
+                if card_id in deleted:
+                    results.append(CardBulkResult(operation="delete", index=index, id=card_id, status="deleted"))
+                elif delete_error and is_uuid(card_id):
+                    results.append(CardBulkResult(operation="delete", index=index, id=card_id, status="failed", error=delete_error))
+                else:
+                    results.append(CardBulkResult(operation="delete", index=index, id=card_id, status="not_found", error="Card not found"))
+            
+            sort_results(results)
+            return CardBulkResponse(results=results)
+                
+        except Exception as e:
+            print(f"DEBUG: Bulk cards error: {str(e)}")
+            raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            if any(result.status in ("created", "updated", "deleted") for result in results):
+                invalidate_account(user_id)
+
     @staticmethod
     async def get_card_balance(user_id: str, card_id: str, period: str = "month"):
         """Get balance information for a specific card"""
@@ -204,70 +408,31 @@ class CardService:
         try:
             print(f"DEBUG: Token verified, user ID: {user_id}")
             
-            # Verify the card belongs to the user
-            card_response = supabase.table("cards").select("*").eq("id", card_id).eq("account_id", user_id).execute()
+            # The card's running balance is a single row; verifies ownership too
+            card_response = supabase.table("cards").select("id, name, balance").eq("id", card_id).eq("account_id", user_id).execute()
             
             if not card_response.data:
                 raise HTTPException(status_code=404, detail="Card not found")
             
             card = card_response.data[0]
             
-            # Calculate date range based on period
-            now = datetime.utcnow()
-            
-            if period == "week":
-                start_date = now - timedelta(days=7)
-            elif period == "month":
-                start_date = now - timedelta(days=30)
-            elif period == "quarter":
-                start_date = now - timedelta(days=90)
-            elif period == "year":
-                start_date = now - timedelta(days=365)
-            else:
-                start_date = now - timedelta(days=30)  # Default to month
+            # Budget associations come from the cached entity graph
+            graph = AnalyticsService._load_entity_graph(user_id)
+            card_budgets = [cb for cb in graph["card_budgets"] if cb["card_id"] == card_id]
             
-            # Get card-budget associations
-            card_budgets_response = supabase.table("card_budgets").select("id, budget_id").eq("card_id", card_id).execute()
-            card_budgets = card_budgets_response.data
+            # Spend for every card-budget combination from the maintained daily totals
+            start_date = AnalyticsService._period_start(period)
+            spent = BalanceService.period_spend(user_id, [cb["id"] for cb in card_budgets], start_date)
             
             budget_balances = []
             card_total_spent = 0
             card_total_limit = 0
             
             for card_budget in card_budgets:
-                # Get budget details
-                budget_response = supabase.table("budgets").select("*").eq("id", card_budget["budget_id"]).execute()
-                if budget_response.data:
-                    budget = budget_response.data[0]
-                    
-                    # Calculate spent amount for this card-budget combination within date range
-                    transactions_response = supabase.table("transactions").select("amount").eq("card_budget_id", card_budget["id"]).gte("date", start_date.isoformat()).execute()
-                    spent_amount = sum(t["amount"] for t in transactions_response.data)
-                    
-                    # Adjust budget limit based on period
-                    adjusted_limit = budget["limit_amount"]
-                    if budget["period"] == "weekly":
-                        if period == "month":
-                            adjusted_limit = budget["limit_amount"] * 4  # 4 weeks in a month
-                        elif period == "quarter":
-                            adjusted_limit = budget["limit_amount"] * 13  # ~13 weeks in a quarter
-                        elif period == "year":
-                            adjusted_limit = budget["limit_amount"] * 52  # 52 weeks in a year
-                    elif budget["period"] == "monthly":
-                        if period == "week":
-                            adjusted_limit = budget["limit_amount"] / 4  # 1/4 of monthly for a week
-                        elif period == "quarter":
-                            adjusted_limit = budget["limit_amount"] * 3  # 3 months in a quarter
-                        elif period == "year":
-                            adjusted_limit = budget["limit_amount"] * 12  # 12 months in a year
-                    elif budget["period"] == "quarterly":
-                        if period == "week":
-                            adjusted_limit = budget["limit_amount"] / 13  # 1/13 of quarterly for a week
-                        elif period == "month":
-                            adjusted_limit = budget["limit_amount"] / 3  # 1/3 of quarterly for a month
-                        elif period == "year":
-                            adjusted_limit = budget["limit_amount"] * 4  # 4 quarters in a year
-                    
+                budget = graph["budgets_by_id"].get(card_budget["budget_id"])
+                if budget:
+                    spent_amount = spent.get(card_budget["id"], 0)
+                    adjusted_limit = AnalyticsService._adjust_limit(budget, period)
                     remaining_amount = adjusted_limit - spent_amount
                     
                     budget_balances.append(BudgetBalance(
@@ -287,12 +452,15 @@ class CardService:
             return CardBalance(
                 card_id=card["id"],
                 card_name=card["name"],
+                balance=card["balance"],
                 total_spent=card_total_spent,
                 total_limit=card_total_limit,
                 remaining_amount=card_remaining,
                 budget_balances=budget_balances
             )
             
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"DEBUG: Get card balance error: {str(e)}")
             raise HTTPException(status_code=400, detail=str(e)) 
\ No newline at end of file
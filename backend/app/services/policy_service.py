@@ -1,9 +1,63 @@
 from fastapi import HTTPException
-from datetime import datetime
+from fastapi.concurrency import run_in_threadpool
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
 from ..config.database import supabase
-from ..models.policy import PolicyCreate, PolicyResponse
+from ..config.settings import settings
+from ..models.policy import PolicyCreate, PolicyResponse, PolicyViolation, TransactionPolicyViolations, PolicyEvaluationResponse
+from ..services.archive_service import ArchiveService
+from ..utils.cache import TTLCache
+import time
 import traceback
 
+# Compiled rule sets keyed by (user_id, "policies"). Policy writes drop them in
+# the worker that handles the write; other workers pick the change up within
+# POLICY_CACHE_TTL seconds.
+compiled_policy_cache = TTLCache(max_entries=1024, ttl=settings.POLICY_CACHE_TTL)
+
+class CompiledPolicySet:
+    """Immutable, pre-sorted view of an account's policies.
+
+    memo_threshold rules are kept ordered by threshold, so finding every rule a
+    transaction breaks is one bisect rather than a scan over the policies.
+    """
+
+    __slots__ = ("_thresholds", "_memo_rules")
+
+    def __init__(self, policies: list):
+        memo_rules = sorted(
+            (
+                (float(p["memo_threshold"]), p["id"], p["name"], p.get("memo_prompt"))
+                for p in policies
+                if p.get("memo_threshold") is not None
+            ),
+            key=lambda rule: rule[0]
+        )
+        object.__setattr__(self, "_memo_rules", tuple(memo_rules))
+        object.__setattr__(self, "_thresholds", tuple(rule[0] for rule in memo_rules))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledPolicySet is immutable")
+
+    def __bool__(self):
+        return bool(self._memo_rules)
+
+    def evaluate(self, transaction: dict) -> list:
+        """Return the PolicyViolations for one transaction (a dict or model dump)"""
+        if not self._memo_rules or (transaction.get("description") or "").strip():
+            return []
+        broken = bisect_right(self._thresholds, transaction["amount"])
+        return [
+            PolicyViolation(
+                policy_id=policy_id,
+                policy_name=name,
+                rule="memo_threshold",
+                threshold=threshold,
+                message=prompt or f"A memo is required for transactions of {threshold:.2f} or more"
+            )
+            for threshold, policy_id, name, prompt in self._memo_rules[:broken]
+        ]
+
 class PolicyService:
     @staticmethod
     async def create_policy(user_id: str, policy_data: PolicyCreate):
@@ -24,6 +78,7 @@ class PolicyService:
             }
             
             response = supabase.table("policies").insert(policy_insert_data).execute()
+            compiled_policy_cache.invalidate_account(user_id)
             
             if response.data:
                 return PolicyResponse(**response.data[0])
@@ -49,4 +104,78 @@ class PolicyService:
             
         except Exception as e:
             print(f"DEBUG: Get policies error: {str(e)}")
-            raise HTTPException(status_code=400, detail=str(e)) 
\ No newline at end of file
+            raise HTTPException(status_code=400, detail=str(e))
+
+    @staticmethod
+    def get_compiled_policies(user_id: str, fresh: bool = False) -> CompiledPolicySet:
+        """Return the account's compiled rule set, compiling it on a cache miss
+        (or always, with fresh)"""
+        cache_key = (user_id, "policies")
+        compiled = None if fresh else compiled_policy_cache.get(cache_key)
+        if compiled is None:
+            response = supabase.table("policies").select("id, name, memo_threshold, memo_prompt").eq("account_id", user_id).execute()
+            compiled = CompiledPolicySet(response.data)
+            compiled_policy_cache.set(cache_key, compiled)
+        return compiled
+
+    @staticmethod
+    def evaluate_transaction(user_id: str, transaction: dict) -> list:
+        """Evaluate one transaction inline; policy lookup failures never block the write"""
+        try:
+            return PolicyService.get_compiled_policies(user_id).evaluate(transaction)
+        except Exception as e:
+            print(f"DEBUG: Policy evaluation error: {str(e)}")
+            return []
+
+    @staticmethod
+    def _evaluate_history(user_id: str, start_date: str = None, end_date: str = None) -> PolicyEvaluationResponse:
+        """Evaluate every transaction in the range against one compiled rule set (blocking)"""
+        started = time.perf_counter()
+        # One small query; a scan over history should not use rules another worker has since changed
+        compiled = PolicyService.get_compiled_policies(user_id, fresh=True)
+
+        transactions = []
+        if compiled:
+            # Only the columns the rules read, paged from each table the range touches
+            since = datetime.fromisoformat(start_date).replace(tzinfo=None) if start_date else None
+            # end_date is inclusive: everything before the start of the following day
+            before = datetime.combine(date.fromisoformat(end_date[:10]) + timedelta(days=1), datetime.min.time()) if end_date else None
+            transactions = ArchiveService.select_transactions("id, card_budget_id, amount, name, date, description", user_id, since=since, before=before)
+
+        results = []
+        for transaction in transactions:
+            violations = compiled.evaluate(transaction)
+            if violations:
+                results.append(TransactionPolicyViolations(
+                    transaction_id=transaction["id"],
+                    card_budget_id=transaction["card_budget_id"],
+                    amount=transaction["amount"],
+                    name=transaction["name"],
+                    date=transaction["date"],
+                    violations=violations
+                ))
+
+        return PolicyEvaluationResponse(
+            evaluated_count=len(transactions),
+            violation_count=len(results),
+            transactions=results,
+            latency_ms=round((time.perf_counter() - started) * 1000, 2)
+        )
+
+    @staticmethod
+    async def evaluate_transactions(user_id: str, start_date: str = None, end_date: str = None):
+        """Flag historical transactions that violate the account's policies"""
+        print(f"=== EVALUATE POLICIES ===")
+        
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Supabase not configured.")
+        
+        try:
+            result = await run_in_threadpool(PolicyService._evaluate_history, user_id, start_date, end_date)
+            print(f"DEBUG: Evaluated {result.evaluated_count} transactions in {result.latency_ms}ms, {result.violation_count} in violation")
+            return result
+            
+        except Exception as e:
+            print(f"DEBUG: Policy evaluation error: {str(e)}")
+            print(f"DEBUG: Traceback: {traceback.format_exc()}")
+            raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,129 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from ..config.database import supabase
+from ..config.storage import get_storage_client
+from ..services.receipt_service import RECEIPTS_BUCKET
+from ..utils.bulk import is_uuid
+
+RECEIPTS_PREFIX = "receipts"
+
+class _Throttle:
+    """Spaces calls at least 1/rate seconds apart (no limit when rate is 0)"""
+
+    def __init__(self, rate: float = 0):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._next > now:
+            await asyncio.sleep(self._next - now)
+        self._next = max(now, self._next) + self.interval
+
+class ReceiptCleanupService:
+    """Finds and removes receipt files that no receipts row points to.
+
+    Files are stored before their row is created (and presigned or resumable
+    uploads may never be completed), so abandoned uploads leave objects
+    behind. The sweep pages through each receipts/{user_id}/ folder, checks
+    the page against the account's receipt URLs, and removes unreferenced
+    objects older than the grace period in one call per page.
+    """
+
+    @staticmethod
+    def _path_from_url(url: str) -> Optional[str]:
+        # Compared by path so URLs minted for another storage host still count
+        if not url or f"{RECEIPTS_BUCKET}/" not in url:
+            return None
+        return url.split(f"{RECEIPTS_BUCKET}/", 1)[1].split("?", 1)[0]
+
+    @staticmethod
+    def _referenced_paths(account_id: str, page_size: int = 1000) -> set:
+        """Object paths of every receipt the account has, fetched in pages"""
+        paths = set()
+        start = 0
+        while True:
+            rows = supabase.table("receipts").select("id, url").eq("account_id", account_id).order("id").range(start, start + page_size - 1).execute().data
+            for row in rows:
+                path = ReceiptCleanupService._path_from_url(row.get("url"))
+                if path:
+                    paths.add(path)
+            if len(rows) < page_size:
+                return paths
+            start += page_size
+
+    @staticmethod
+    def _created_at(entry: dict) -> Optional[datetime]:
+        value = entry.get("created_at") or entry.get("updated_at")
+        if not value:
+            return None
+        created = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return created if created.tzinfo else created.replace(tzinfo=timezone.utc)
+
+    @staticmethod
+    async def _folders(storage, batch_size: int, throttle: _Throttle):
+        """Names of the per-user folders under receipts/"""
+        offset = 0
+        while True:
+            await throttle.wait()
+            entries = await storage.list(RECEIPTS_BUCKET, RECEIPTS_PREFIX, limit=batch_size, offset=offset)
+            for entry in entries:
+                if entry.get("id") is None:
+                    yield entry["name"]
+            if len(entries) < batch_size:
+                return
+            offset += len(entries)
+
+    @staticmethod
+    async def sweep(grace: timedelta, batch_size: int = 100, dry_run: bool = False, rate: float = 0):
+        """Remove unreferenced receipt files older than grace.
+
+        Yields one result per folder page as it completes. With dry_run, only
+        reports what would be removed. rate caps storage requests per second.
+        """
+        storage = get_storage_client()
+        if storage is None or not supabase:
+            raise RuntimeError("Supabase not configured.")
+        cutoff = datetime.now(timezone.utc) - grace
+        throttle = _Throttle(rate)
+
+        async for folder in ReceiptCleanupService._folders(storage, batch_size, throttle):
+            if not is_uuid(folder):
+                # Not an account's folder; filtering account_id on it would fail the sweep
+                print(f"DEBUG: Skipping {RECEIPTS_PREFIX}/{folder}/, not an account folder")
+                continue
+            prefix = f"{RECEIPTS_PREFIX}/{folder}"
+            referenced = ReceiptCleanupService._referenced_paths(folder)
+            offset = 0
+            while True:
+                await throttle.wait()
+                entries = await storage.list(RECEIPTS_BUCKET, prefix, limit=batch_size, offset=offset)
+                files = 0
+                orphans = []
+                for entry in entries:
+                    if entry.get("id") is None:
+                        continue
+                    files += 1
+                    path = f"{prefix}/{entry['name']}"
+                    created = ReceiptCleanupService._created_at(entry)
+                    if path not in referenced and created is not None and created < cutoff:
+                        orphans.append(path)
+
+                if orphans and not dry_run:
+                    await throttle.wait()
+                    await storage.remove(RECEIPTS_BUCKET, orphans)
+                yield {
+                    "folder": folder,
+                    "checked": files,
+                    "orphaned": orphans,
+                    "removed": 0 if dry_run else len(orphans),
+                }
+
+                if len(entries) < batch_size:
+                    break
+                # Removed objects no longer take up positions in the listing
+                offset += len(entries) - (0 if dry_run else len(orphans))
@@ -4,12 +4,18 @@ import os
 import uuid
 from typing import Optional
 from ..config.database import supabase
+from ..config.settings import settings
+from ..config.storage import StorageError, get_storage_client
 from ..models.receipt import ReceiptCreate, ReceiptResponse, ReceiptUploadResponse, ReceiptUpdate
+from ..services.archive_service import ArchiveService
+from ..services.transaction_service import TransactionService
 import traceback
 
+RECEIPTS_BUCKET = "supporting-documents-storage-bucket"
+
 class ReceiptService:
     ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.pdf'}
-    MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+    MAX_FILE_SIZE = settings.RECEIPT_MAX_FILE_SIZE
     
     @staticmethod
     def _is_valid_file_type(filename: str) -> bool:
@@ -28,12 +34,110 @@ class ReceiptService:
         import re
         # Remove special characters and spaces
         sanitized = re.sub(r'[^a-zA-Z0-9._-]', '_', filename)
-        # Add timestamp to prevent conflicts
+        print(f"DEBUG: Sanitized filename: {sanitized}")
+        return sanitized
+    
+    @staticmethod
+    def _object_path(user_id: str, filename: str) -> str:
+        """Unique storage path for a receipt file: receipts/{user_id}/{timestamp}_{id}_{name}"""
+        sanitized_filename = ReceiptService._sanitize_filename(filename)
         timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        name, ext = os.path.splitext(sanitized)
-        final_name = f"{name}_{timestamp}{ext}"
-        print(f"DEBUG: Sanitized filename: {final_name}")
-        return final_name
+        # The random part keeps same-second uploads of one name apart, so removing
+        # an orphaned file can never take another receipt's file with it
+        return f"receipts/{user_id}/{timestamp}_{uuid.uuid4().hex[:8]}_{sanitized_filename}"
+    
+    @staticmethod
+    async def _store_upload_file(file: UploadFile, file_path: str) -> int:
+        """Stream an uploaded file to the bucket without reading it into memory.
+        
+        Files up to one chunk go up in a single request; larger ones through a
+        resumable upload, one chunk at a time with per-chunk retries.
+        """
+        storage = get_storage_client()
+        if storage is None:
+            raise HTTPException(status_code=500, detail="Supabase not configured.")
+        
+        chunk_size = settings.STORAGE_CHUNK_SIZE
+        first = await file.read(chunk_size)
+        if len(first) < chunk_size:
+            await storage.upload(RECEIPTS_BUCKET, file_path, first, file.content_type)
+            return len(first)
+        
+        async def chunks():
+            data = first
+            while data:
+                yield data
+                data = await file.read(chunk_size)
+        
+        upload_url = await storage.create_resumable(RECEIPTS_BUCKET, file_path, file.size, file.content_type)
+        offset, _ = await storage.upload_stream(upload_url, 0, file.size, chunks())
+        if offset != file.size:
+            raise StorageError(f"Upload stopped at {offset} of {file.size} bytes")
+        print(f"DEBUG: Stored {offset} bytes in {-(-offset // chunk_size)} chunks")
+        return offset
+    
+    @staticmethod
+    async def _store_validated_file(user_id: str, file: UploadFile):
+        """Validate an uploaded file and stream it to the user's folder; returns (path, public URL)"""
+        # Validate file type
+        print(f"DEBUG: Validating file type...")
+        if not ReceiptService._is_valid_file_type(file.filename):
+            print(f"DEBUG: Invalid file type detected")
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Invalid file type. Allowed types: {', '.join(ReceiptService.ALLOWED_EXTENSIONS)}"
+            )
+        
+        # Validate file size (the multipart parser has already spooled the file to disk)
+        file_size = file.size
+        print(f"DEBUG: File size: {file_size} bytes")
+        print(f"DEBUG: Max allowed size: {ReceiptService.MAX_FILE_SIZE} bytes")
+        
+        if file_size is not None and file_size > ReceiptService.MAX_FILE_SIZE:
+            print(f"DEBUG: File too large - {file_size} > {ReceiptService.MAX_FILE_SIZE}")
+            raise HTTPException(
+                status_code=400, 
+                detail=f"File too large. Maximum size: {ReceiptService.MAX_FILE_SIZE // (1024*1024)}MB"
+            )
+        
+        file_path = ReceiptService._object_path(user_id, file.filename)
+        print(f"DEBUG: Full file path: {file_path}")
+        
+        # Upload file to Supabase Storage
+        print(f"DEBUG: Uploading file to Supabase Storage...")
+        print(f"DEBUG: Bucket: {RECEIPTS_BUCKET}")
+        print(f"DEBUG: Path: {file_path}")
+        
+        try:
+            await ReceiptService._store_upload_file(file, file_path)
+        except StorageError as storage_error:
+            print(f"DEBUG: Storage upload error: {storage_error}")
+            if "row-level security policy" in str(storage_error).lower():
+                raise HTTPException(
+                    status_code=500, 
+                    detail="Storage access denied. Please check Supabase storage configuration. Error: " + str(storage_error)
+                )
+            else:
+                raise HTTPException(
+                    status_code=500, 
+                    detail=f"Storage upload failed: {str(storage_error)}"
+                )
+        
+        # Get public URL for the uploaded file
+        print(f"DEBUG: Getting public URL for uploaded file...")
+        file_url = get_storage_client().public_url(RECEIPTS_BUCKET, file_path)
+        print(f"DEBUG: Public URL: {file_url}")
+        return file_path, file_url
+    
+    @staticmethod
+    async def _remove_stored_file(file_path: str):
+        """Best-effort removal of a file whose record was never created"""
+        try:
+            await get_storage_client().remove(RECEIPTS_BUCKET, [file_path])
+            print(f"DEBUG: Removed orphaned file: {file_path}")
+        except Exception as e:
+            # Left for jobs that sweep unreferenced files
+            print(f"DEBUG: Failed to remove orphaned file {file_path}: {str(e)}")
     
     @staticmethod
     async def upload_receipt_file(user_id: str, file: UploadFile, receipt_data: ReceiptCreate) -> ReceiptUploadResponse:
@@ -49,77 +153,7 @@ class ReceiptService:
             raise HTTPException(status_code=500, detail="Supabase not configured.")
         
         try:
-            # Validate file type
-            print(f"DEBUG: Validating file type...")
-            if not ReceiptService._is_valid_file_type(file.filename):
-                print(f"DEBUG: Invalid file type detected")
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Invalid file type. Allowed types: {', '.join(ReceiptService.ALLOWED_EXTENSIONS)}"
-                )
-            
-            # Validate file size
-            print(f"DEBUG: Reading file content for size validation...")
-            file_content = await file.read()
-            file_size = len(file_content)
-            print(f"DEBUG: File size: {file_size} bytes")
-            print(f"DEBUG: Max allowed size: {ReceiptService.MAX_FILE_SIZE} bytes")
-            
-            if file_size > ReceiptService.MAX_FILE_SIZE:
-                print(f"DEBUG: File too large - {file_size} > {ReceiptService.MAX_FILE_SIZE}")
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"File too large. Maximum size: {ReceiptService.MAX_FILE_SIZE // (1024*1024)}MB"
-                )
-            
-            # Generate unique filename
-            print(f"DEBUG: Generating unique filename...")
-            sanitized_filename = ReceiptService._sanitize_filename(file.filename)
-            timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-            file_extension = os.path.splitext(file.filename)[1].lower()
-            unique_filename = f"{timestamp}_{sanitized_filename}"
-            print(f"DEBUG: Unique filename generated: {unique_filename}")
-            
-            # Create user folder path: receipts/{user_id}/
-            user_folder_path = f"receipts/{user_id}/"
-            file_path = f"{user_folder_path}{unique_filename}"
-            print(f"DEBUG: Full file path: {file_path}")
-            
-            # Upload file to Supabase Storage
-            print(f"DEBUG: Uploading file to Supabase Storage...")
-            print(f"DEBUG: Bucket: supporting-documents-storage-bucket")
-            print(f"DEBUG: Path: {file_path}")
-            
-            try:
-                storage_response = supabase.storage.from_("supporting-documents-storage-bucket").upload(
-                    path=file_path,
-                    file=file_content,
-                    file_options={"content-type": file.content_type}
-                )
-                
-                print(f"DEBUG: Storage response: {storage_response}")
-                
-                if not storage_response:
-                    print("DEBUG: Storage upload failed - no response")
-                    raise HTTPException(status_code=500, detail="Failed to upload file to storage")
-                    
-            except Exception as storage_error:
-                print(f"DEBUG: Storage upload error: {storage_error}")
-                if "row-level security policy" in str(storage_error).lower():
-                    raise HTTPException(
-                        status_code=500, 
-                        detail="Storage access denied. Please check Supabase storage configuration. Error: " + str(storage_error)
-                    )
-                else:
-                    raise HTTPException(
-                        status_code=500, 
-                        detail=f"Storage upload failed: {str(storage_error)}"
-                    )
-            
-            # Get public URL for the uploaded file
-            print(f"DEBUG: Getting public URL for uploaded file...")
-            file_url = supabase.storage.from_("supporting-documents-storage-bucket").get_public_url(file_path)
-            print(f"DEBUG: Public URL: {file_url}")
+            file_path, file_url = await ReceiptService._store_validated_file(user_id, file)
             
             # Return upload response without creating database record
             print(f"DEBUG: File uploaded successfully, returning URL")
@@ -141,6 +175,99 @@ class ReceiptService:
             print(f"DEBUG: Traceback: {traceback.format_exc()}")
             raise HTTPException(status_code=500, detail=f"Failed to upload receipt: {str(e)}")
     
+    @staticmethod
+    def _find_transaction(user_id: str, transaction_id: Optional[str]) -> Optional[dict]:
+        """The user's transaction a new receipt will be linked to (hot or archived), if any"""
+        if not transaction_id:
+            return None
+        _, transaction = ArchiveService.find_table(user_id, transaction_id)
+        if not transaction:
+            print("DEBUG: Transaction not found")
+            raise HTTPException(status_code=404, detail="Transaction not found")
+        return transaction
+    
+    @staticmethod
+    def _insert_receipt(user_id: str, receipt_data: ReceiptCreate, file_url: str, transaction: Optional[dict] = None) -> ReceiptResponse:
+        """Create a receipt record for a stored file, linking the transaction in the same
+        database transaction (create_receipt() in migrations/0005_create_receipt.sql)"""
+        print(f"DEBUG: Creating receipt record...")
+        try:
+            db_response = supabase.rpc("create_receipt", {
+                "p_account_id": user_id,
+                "p_name": receipt_data.name,
+                "p_type": receipt_data.type,
+                "p_url": file_url,
+                "p_description": receipt_data.description,
+                "p_amount": receipt_data.amount,
+                "p_date_of_purchase": receipt_data.date_of_purchase,
+                "p_transaction_id": transaction["id"] if transaction else None
+            }).execute()
+            print(f"DEBUG: Database response: {db_response}")
+        except Exception as e:
+            print(f"DEBUG: Create receipt error: {str(e)}")
+            # no_data_found: the transaction went away after it was checked
+            if getattr(e, "code", None) == "P0002":
+                raise HTTPException(status_code=404, detail="Transaction not found")
+            raise HTTPException(status_code=500, detail=f"Failed to create receipt: {str(e)}")
+        
+        if not db_response.data:
+            print("DEBUG: Database insert failed - no data returned")
+            raise HTTPException(status_code=500, detail="Failed to create receipt record")
+        
+        receipt = ReceiptResponse(**db_response.data[0])
+        print(f"DEBUG: Receipt created successfully: {receipt}")
+        if transaction:
+            TransactionService.receipt_linked(user_id, {**transaction, "receipt_id": receipt.id})
+        return receipt
+    
+    @staticmethod
+    async def upload_and_create_receipt(user_id: str, file: UploadFile, receipt_data: ReceiptCreate, transaction_id: Optional[str] = None) -> ReceiptUploadResponse:
+        """Upload a receipt file and create its record, optionally linked to a transaction.
+        
+        The record and the link are written by one create_receipt() call
+        (migrations/0005_create_receipt.sql), so they commit together; if that
+        call fails, the stored file is removed again.
+        """
+        print(f"=== UPLOAD AND CREATE RECEIPT ===")
+        print(f"DEBUG: User ID: {user_id}")
+        print(f"DEBUG: File name: {file.filename}")
+        print(f"DEBUG: Receipt data: {receipt_data}")
+        print(f"DEBUG: Transaction ID: {transaction_id}")
+        
+        if not supabase:
+            print("DEBUG: Supabase not configured")
+            raise HTTPException(status_code=500, detail="Supabase not configured.")
+        
+        try:
+            # Check the transaction before spending time on the upload
+            transaction = ReceiptService._find_transaction(user_id, transaction_id)
+            
+            file_path, file_url = await ReceiptService._store_validated_file(user_id, file)
+            
+            try:
+                receipt = ReceiptService._insert_receipt(user_id, receipt_data, file_url, transaction)
+            except HTTPException:
+                print(f"DEBUG: Removing stored file after failed insert")
+                await ReceiptService._remove_stored_file(file_path)
+                raise
+            
+            return ReceiptUploadResponse(
+                success=True,
+                message="Receipt created successfully",
+                receipt_id=receipt.id,
+                url=file_url,
+                receipt=receipt,
+                transaction_id=transaction_id
+            )
+            
+        except HTTPException:
+            print("DEBUG: Re-raising HTTPException")
+            raise
+        except Exception as e:
+            print(f"DEBUG: Receipt upload error: {str(e)}")
+            print(f"DEBUG: Traceback: {traceback.format_exc()}")
+            raise HTTPException(status_code=500, detail=f"Failed to upload receipt: {str(e)}")
+    
     @staticmethod
     async def create_receipt(user_id: str, receipt_data: ReceiptCreate) -> ReceiptResponse:
         """Create a receipt record in the database"""
@@ -268,7 +395,7 @@ class ReceiptService:
             # Extract file path from URL
             # URL format: https://xxx.supabase.co/storage/v1/object/public/supporting-documents-storage-bucket/receipts/user_id/filename
             try:
-                file_path = file_url.split("supporting-documents-storage-bucket/")[1]
+                file_path = file_url.split(f"{RECEIPTS_BUCKET}/")[1]
                 print(f"DEBUG: Extracted file path: {file_path}")
             except Exception as e:
                 print(f"DEBUG: Failed to extract file path from URL: {e}")
@@ -283,8 +410,8 @@ class ReceiptService:
             if file_path:
                 try:
                     print(f"DEBUG: Deleting file from storage...")
-                    storage_delete_response = supabase.storage.from_("supporting-documents-storage-bucket").remove([file_path])
-                    print(f"DEBUG: Storage delete response: {storage_delete_response}")
+                    await get_storage_client().remove(RECEIPTS_BUCKET, [file_path])
+                    print(f"DEBUG: Removed file from storage: {file_path}")
                 except Exception as e:
                     print(f"DEBUG: Failed to delete file from storage: {str(e)}")
                     # Don't fail the request if file deletion fails
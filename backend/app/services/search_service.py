@@ -0,0 +1,135 @@
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from ..config.database import supabase
+from ..config.settings import settings
+from ..models.transaction import TransactionSearchHit, TransactionSearchResponse
+from ..services.analytics_service import AnalyticsService
+from ..services.archive_service import ArchiveService
+from ..utils.cache import TTLCache, register_account_cache
+from ..utils.search_index import InvertedIndex
+from ..utils.singleflight import SingleFlight
+from typing import Optional
+import time
+import traceback
+
+# Indexed transaction fields and their ranking weights
+SEARCH_FIELDS = {"name": 3.0, "merchant": 2.5, "category": 2.0, "description": 1.0}
+
+# Per-account transaction indexes keyed by (user_id, "search"), stored as
+# (transaction version, index). Transaction writes update a live index in
+# place; card and budget writes drop it, since deleting a card or budget also
+# removes its transactions. Writes made by other workers are caught by
+# comparing the version with transaction_versions before each search.
+search_index_cache = register_account_cache(
+    TTLCache(max_entries=settings.SEARCH_INDEX_MAX_ACCOUNTS, ttl=settings.SEARCH_INDEX_TTL),
+    depends_on_transactions=False
+)
+search_index_flight = SingleFlight()
+
+class SearchService:
+    @staticmethod
+    def _transaction_version(user_id: str) -> Optional[int]:
+        """The account's transaction write count (migrations/0006_transaction_versions.sql),
+        or None when it cannot be read"""
+        try:
+            rows = supabase.table("transaction_versions").select("version").eq("account_id", user_id).execute().data
+            return rows[0]["version"] if rows else 0
+        except Exception as e:
+            print(f"DEBUG: Transaction version lookup error: {str(e)}")
+            return None
+
+    @staticmethod
+    def _build_index(user_id: str) -> InvertedIndex:
+        """Index every transaction for the account, fetched in pages from each table (blocking)"""
+        # Read before the rows, so a write landing mid-build leaves the cached
+        # version behind and the next search rebuilds
+        version = SearchService._transaction_version(user_id)
+        started = time.perf_counter()
+        index = InvertedIndex(SEARCH_FIELDS, fuzzy_threshold=settings.SEARCH_FUZZY_THRESHOLD)
+        transactions = ArchiveService.select_transactions("*", user_id)
+        index.add_many((transaction["id"], transaction) for transaction in transactions)
+
+        search_index_cache.set((user_id, "search"), (version, index))
+        print(f"DEBUG: Built search index of {len(index)} transactions in {(time.perf_counter() - started) * 1000:.1f}ms")
+        return index
+
+    @staticmethod
+    async def _get_index(user_id: str) -> InvertedIndex:
+        entry = search_index_cache.get((user_id, "search"))
+        if entry is not None:
+            version, index = entry
+            # Without a readable version, the index is trusted until SEARCH_INDEX_TTL
+            current = SearchService._transaction_version(user_id)
+            if version is None or current is None or current == version:
+                return index
+            print(f"DEBUG: Search index at version {version}, account at {current}; rebuilding")
+        return await search_index_flight.do(
+            (user_id, "search_index"),
+            lambda: run_in_threadpool(SearchService._build_index, user_id)
+        )
+
+    @staticmethod
+    def _apply_write(user_id: str, apply):
+        """Apply one written transaction to the account's live index, counting
+        it the way the version trigger does (one per row)"""
+        entry = search_index_cache.get((user_id, "search"))
+        if entry is None:
+            return
+        version, index = entry
+        apply(index)
+        search_index_cache.update((user_id, "search"), (None if version is None else version + 1, index))
+
+    @staticmethod
+    def index_transaction(user_id: str, transaction: dict):
+        """Add or replace a created/updated transaction in the account's live index"""
+        SearchService._apply_write(user_id, lambda index: index.add(transaction["id"], transaction))
+
+    @staticmethod
+    def unindex_transaction(user_id: str, transaction_id: str):
+        """Remove a deleted transaction from the account's live index"""
+        SearchService._apply_write(user_id, lambda index: index.remove(transaction_id))
+
+    @staticmethod
+    async def search_transactions(user_id: str, query: str, limit: int = 20, offset: int = 0, fuzzy: bool = True):
+        """Search transactions by name, merchant, category and description"""
+        print(f"=== SEARCH TRANSACTIONS ===")
+
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Supabase not configured.")
+
+        try:
+            started = time.perf_counter()
+            index = await SearchService._get_index(user_id)
+            matches = index.search(query, fuzzy=fuzzy)
+            # Best score first, most recent first among equal scores
+            matches.sort(key=lambda match: match[2].get("date") or "", reverse=True)
+            matches.sort(key=lambda match: match[1], reverse=True)
+
+            card_budgets_by_id = AnalyticsService._load_entity_graph(user_id)["card_budgets_by_id"]
+            results = []
+            for transaction_id, score, transaction in matches[offset:offset + limit]:
+                card_budget = card_budgets_by_id.get(transaction["card_budget_id"], {})
+                results.append(TransactionSearchHit(
+                    **transaction,
+                    card_id=card_budget.get("card_id"),
+                    budget_id=card_budget.get("budget_id"),
+                    score=round(score, 4)
+                ))
+
+            latency_ms = round((time.perf_counter() - started) * 1000, 2)
+            print(f"DEBUG: Search '{query}' matched {len(matches)} transactions in {latency_ms}ms")
+            return TransactionSearchResponse(
+                query=query,
+                total=len(matches),
+                limit=limit,
+                offset=offset,
+                results=results,
+                latency_ms=latency_ms
+            )
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"DEBUG: Search transactions error: {str(e)}")
+            print(f"DEBUG: Traceback: {traceback.format_exc()}")
+            raise HTTPException(status_code=400, detail=str(e))
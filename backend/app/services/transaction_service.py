@@ -1,10 +1,54 @@
 from fastapi import HTTPException
 from datetime import datetime
 from ..config.database import supabase
-from ..models.transaction import TransactionCreate, TransactionResponse
+from ..config.settings import settings
+from ..models.transaction import TransactionCreate, TransactionResponse, TransactionEvent
+from ..services.analytics_service import AnalyticsService
+from ..services.authorization_service import AuthorizationService
+from ..services.policy_service import PolicyService
+from ..services.search_service import SearchService
+from ..services.archive_service import ArchiveService, HOT_TABLE
+from ..utils.cache import invalidate_account
+from ..utils.events import event_bus
 import traceback
 
 class TransactionService:
+    @staticmethod
+    def _publish(user_id: str, event_type: str, transaction_id: str, card_budget_id: str, transaction: TransactionResponse = None):
+        """Push a transaction event and the affected budget balance to the account's live streams"""
+        if not event_bus.has_subscribers(user_id):
+            return
+        try:
+            card_budget = AnalyticsService._load_entity_graph(user_id)["card_budgets_by_id"].get(card_budget_id, {})
+            event = TransactionEvent(
+                type=event_type,
+                transaction_id=transaction_id,
+                transaction=transaction,
+                card_id=card_budget.get("card_id"),
+                budget_balance=AuthorizationService.budget_balance(user_id, card_budget_id)
+            )
+            event_bus.publish(user_id, event_type, event.model_dump())
+        except Exception as e:
+            # Live updates are best effort; the write has already succeeded
+            print(f"DEBUG: Publish transaction event error: {str(e)}")
+
+    @staticmethod
+    def receipt_linked(user_id: str, transaction: dict):
+        """Refresh caches and live streams after a receipt was linked to a transaction row"""
+        invalidate_account(user_id, transactions_only=True)
+        try:
+            card_budget = AnalyticsService._load_entity_graph(user_id)["card_budgets_by_id"].get(transaction["card_budget_id"], {})
+            policy_violations = PolicyService.evaluate_transaction(user_id, transaction)
+            result = TransactionResponse(**transaction, card_id=card_budget.get("card_id"), budget_id=card_budget.get("budget_id"), policy_violations=policy_violations)
+            TransactionService._publish(user_id, "transaction.updated", result.id, result.card_budget_id, result)
+        except Exception as e:
+            print(f"DEBUG: Receipt link refresh error: {str(e)}")
+
+    @staticmethod
+    def _card_budget(user_id: str, card_budget_id: str):
+        """The account's card_budget from the entity graph, or None"""
+        return AnalyticsService._load_entity_graph(user_id)["card_budgets_by_id"].get(card_budget_id)
+
     @staticmethod
     async def create_transaction(user_id: str, transaction_data: TransactionCreate):
         """Create a new transaction"""
@@ -15,47 +59,54 @@ class TransactionService:
             raise HTTPException(status_code=500, detail="Supabase not configured.")
         
         try:
-            # Extract card_budget_id from the transaction_data
             card_budget_id = transaction_data.card_budget_id
-            
-            # Verify the card_budget_id belongs to the user
-            card_budget_response = supabase.table("card_budgets").select("card_id, budget_id").eq("id", card_budget_id).execute()
-            
-            if not card_budget_response.data:
-                raise HTTPException(status_code=403, detail="Card-Budget combination not found")
-            
-            # Get card and budget IDs from the verified card_budget_id
-            card_id = card_budget_response.data[0]["card_id"]
-            budget_id = card_budget_response.data[0]["budget_id"]
-            
-            # Verify the card belongs to the user
-            card_response = supabase.table("cards").select("account_id").eq("id", card_id).execute()
-            if not card_response.data or card_response.data[0]["account_id"] != user_id:
-                raise HTTPException(status_code=403, detail="Card not found or access denied")
-            
+
+            # The card's status and the budget's remaining spend are checked in the
+            # database, with the card_budget locked, as the transaction is inserted
             transaction_insert_data = {
-                "card_budget_id": card_budget_id,
-                "amount": transaction_data.amount,
-                "name": transaction_data.name,
-                "date": transaction_data.date if transaction_data.date else datetime.utcnow().isoformat(),
-                "description": transaction_data.description,
-                "category": transaction_data.category,
-                "receipt_id": transaction_data.receipt_id
+                "p_account_id": user_id,
+                "p_card_budget_id": card_budget_id,
+                "p_amount": transaction_data.amount,
+                "p_name": transaction_data.name,
+                "p_date": transaction_data.date if transaction_data.date else datetime.utcnow().isoformat(),
+                "p_description": transaction_data.description,
+                "p_category": transaction_data.category,
+                "p_receipt_id": transaction_data.receipt_id
             }
             
             print(f"DEBUG: Inserting transaction data: {transaction_insert_data}")
-            response = supabase.table("transactions").insert(transaction_insert_data).execute()
+            try:
+                response = supabase.rpc("create_transaction", transaction_insert_data).execute()
+            except Exception as e:
+                code = getattr(e, "code", None)
+                if code == "P0002":
+                    raise HTTPException(status_code=403, detail="Card-Budget combination not found")
+                # check_violation: the card is frozen or cancelled, or the budget is spent
+                if code == "23514":
+                    raise HTTPException(status_code=403, detail=f"Transaction declined: {getattr(e, 'message', None) or str(e)}")
+                raise
+            invalidate_account(user_id, transactions_only=True)
             
             print(f"DEBUG: Insert response: {response}")
             
             if response.data:
                 # Enrich response with card and budget IDs
                 transaction_data = response.data[0]
-                return TransactionResponse(**transaction_data, card_id=card_id, budget_id=budget_id)
+                card_budget = TransactionService._card_budget(user_id, card_budget_id) or {}
+                card_id = card_budget.get("card_id")
+                budget_id = card_budget.get("budget_id")
+                AuthorizationService.record_spend(user_id, card_budget_id, transaction_data["amount"], transaction_data.get("date"))
+                SearchService.index_transaction(user_id, transaction_data)
+                policy_violations = PolicyService.evaluate_transaction(user_id, transaction_data)
+                result = TransactionResponse(**transaction_data, card_id=card_id, budget_id=budget_id, policy_violations=policy_violations)
+                TransactionService._publish(user_id, "transaction.created", result.id, card_budget_id, result)
+                return result
             else:
                 print(f"DEBUG: No data returned from insert")
                 raise HTTPException(status_code=400, detail="Failed to create transaction")
                 
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"DEBUG: Transaction creation error: {str(e)}")
             raise HTTPException(status_code=400, detail=str(e))
@@ -68,14 +119,9 @@ class TransactionService:
             raise HTTPException(status_code=500, detail="Supabase not configured.")
         try:
             # Validate card_budget_id ownership
-            card_budget_response = supabase.table("card_budgets").select("card_id, budget_id").eq("id", transaction_data.card_budget_id).execute()
-            if not card_budget_response.data:
+            card_budget = TransactionService._card_budget(user_id, transaction_data.card_budget_id)
+            if not card_budget:
                 raise HTTPException(status_code=403, detail="Card or Budget not found or access denied")
-            card_id = card_budget_response.data[0]["card_id"]
-            # Check card ownership
-            card_response = supabase.table("cards").select("account_id").eq("id", card_id).execute()
-            if not card_response.data or card_response.data[0]["account_id"] != user_id:
-                raise HTTPException(status_code=403, detail="Card not found or access denied")
             update_data = {
                 "card_budget_id": transaction_data.card_budget_id,
                 "amount": transaction_data.amount,
@@ -85,19 +131,37 @@ class TransactionService:
                 "category": transaction_data.category,
                 "receipt_id": transaction_data.receipt_id
             }
-            response = supabase.table("transactions").update(update_data).eq("id", transaction_id).execute()
+            response = supabase.table(HOT_TABLE).update(update_data).eq("id", transaction_id).eq("account_id", user_id).execute()
+            if not response.data and ArchiveService.enabled():
+                response = TransactionService._update_archived(user_id, transaction_id, update_data)
+            invalidate_account(user_id, transactions_only=True)
+            AuthorizationService.forget_spend(user_id)
             if response.data:
-                # Enrich response
-                card_budget_response = supabase.table("card_budgets").select("card_id, budget_id").eq("id", response.data[0]["card_budget_id"]).execute()
-                card_id = card_budget_response.data[0]["card_id"] if card_budget_response.data else None
-                budget_id = card_budget_response.data[0]["budget_id"] if card_budget_response.data else None
-                return TransactionResponse(**response.data[0], card_id=card_id, budget_id=budget_id)
+                SearchService.index_transaction(user_id, response.data[0])
+                policy_violations = PolicyService.evaluate_transaction(user_id, response.data[0])
+                result = TransactionResponse(**response.data[0], card_id=card_budget["card_id"], budget_id=card_budget["budget_id"], policy_violations=policy_violations)
+                TransactionService._publish(user_id, "transaction.updated", result.id, result.card_budget_id, result)
+                return result
             else:
                 raise HTTPException(status_code=400, detail="Failed to update transaction")
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"DEBUG: Update transaction error: {str(e)}")
             raise HTTPException(status_code=400, detail=str(e))
 
+    @staticmethod
+    def _update_archived(user_id: str, transaction_id: str, update_data: dict):
+        """Update an archived transaction, moving it back to the hot table if its
+        new date falls inside the archive horizon (one database function call)"""
+        params = {f"p_{column}": value for column, value in update_data.items()}
+        return supabase.rpc("update_archived_transaction", {
+            "p_account_id": user_id,
+            "p_transaction_id": transaction_id,
+            "p_horizon_days": settings.TRANSACTION_ARCHIVE_DAYS,
+            **params
+        }).execute()
+
     @staticmethod
     async def delete_transaction(user_id: str, transaction_id: str):
         """Delete a transaction"""
@@ -106,20 +170,18 @@ class TransactionService:
             raise HTTPException(status_code=500, detail="Supabase not configured.")
         try:
             # Fetch transaction to validate ownership
-            transaction_response = supabase.table("transactions").select("card_budget_id").eq("id", transaction_id).execute()
-            if not transaction_response.data:
+            table, transaction = ArchiveService.find_table(user_id, transaction_id, "id, card_budget_id")
+            if not transaction:
                 raise HTTPException(status_code=404, detail="Transaction not found")
-            card_budget_id = transaction_response.data[0]["card_budget_id"]
-            card_budget_response = supabase.table("card_budgets").select("card_id").eq("id", card_budget_id).execute()
-            if not card_budget_response.data:
-                raise HTTPException(status_code=403, detail="Card or Budget not found or access denied")
-            card_id = card_budget_response.data[0]["card_id"]
-            card_response = supabase.table("cards").select("account_id").eq("id", card_id).execute()
-            if not card_response.data or card_response.data[0]["account_id"] != user_id:
-                raise HTTPException(status_code=403, detail="Card not found or access denied")
             # Delete transaction
-            supabase.table("transactions").delete().eq("id", transaction_id).execute()
+            supabase.table(table).delete().eq("id", transaction_id).eq("account_id", user_id).execute()
+            invalidate_account(user_id, transactions_only=True)
+            AuthorizationService.forget_spend(user_id)
+            SearchService.unindex_transaction(user_id, transaction_id)
+            TransactionService._publish(user_id, "transaction.deleted", transaction_id, transaction["card_budget_id"])
             return {"detail": "Transaction deleted successfully"}
+        except HTTPException:
+            raise
         except Exception as e:
             print(f"DEBUG: Delete transaction error: {str(e)}")
             raise HTTPException(status_code=400, detail=str(e))
@@ -131,27 +193,22 @@ class TransactionService:
         if not supabase:
             raise HTTPException(status_code=500, detail="Supabase not configured.")
         try:
-            # Get all card_budgets for the user
-            card_budgets_query = supabase.table("card_budgets").select("id, card_id, budget_id")
-            card_budgets_response = card_budgets_query.execute()
-            card_budget_map = {cb["id"]: cb for cb in card_budgets_response.data}
-            # Filter card_budgets by user ownership
-            user_card_ids = [c["id"] for c in supabase.table("cards").select("id, account_id").eq("account_id", user_id).execute().data]
-            user_card_budget_ids = [cbid for cbid, cb in card_budget_map.items() if cb["card_id"] in user_card_ids]
-            # Apply filters
-            filtered_card_budget_ids = user_card_budget_ids
-            if card_id:
-                filtered_card_budget_ids = [cbid for cbid in filtered_card_budget_ids if card_budget_map[cbid]["card_id"] == card_id]
-            if budget_id:
-                filtered_card_budget_ids = [cbid for cbid in filtered_card_budget_ids if card_budget_map[cbid]["budget_id"] == budget_id]
-            if card_budget_id:
-                filtered_card_budget_ids = [cbid for cbid in filtered_card_budget_ids if cbid == card_budget_id]
-            if not filtered_card_budget_ids:
-                return []
-            # Get transactions for filtered card_budget_ids
-            response = supabase.table("transactions").select("*").in_("card_budget_id", filtered_card_budget_ids).execute()
+            # The account's card_budgets, to resolve filters and card/budget IDs
+            card_budget_map = AnalyticsService._load_entity_graph(user_id)["card_budgets_by_id"]
+            # Apply filters; without any, the account filter alone selects the rows
+            filtered_card_budget_ids = None
+            if card_id or budget_id or card_budget_id:
+                filtered_card_budget_ids = [
+                    cbid for cbid, cb in card_budget_map.items()
+                    if (not card_id or cb["card_id"] == card_id)
+                    and (not budget_id or cb["budget_id"] == budget_id)
+                    and (not card_budget_id or cbid == card_budget_id)
+                ]
+                if not filtered_card_budget_ids:
+                    return []
+            transactions = ArchiveService.select_transactions("*", user_id, filtered_card_budget_ids)
             transactions_with_details = []
-            for transaction in response.data:
+            for transaction in transactions:
                 cb = card_budget_map.get(transaction["card_budget_id"])
                 card_id = cb["card_id"] if cb else None
                 budget_id = cb["budget_id"] if cb else None
@@ -0,0 +1,290 @@
+from fastapi import HTTPException
+from datetime import timedelta
+from typing import AsyncIterator, Optional
+import base64
+import time
+from ..config.database import supabase
+from ..config.settings import settings
+from ..config.storage import StorageError, get_storage_client
+from ..models.receipt import ReceiptCreate, ReceiptCompleteRequest, ReceiptPresignRequest, ReceiptPresignResponse, ReceiptResponse, ReceiptUploadResponse
+from ..services.receipt_service import ReceiptService, RECEIPTS_BUCKET
+from ..utils.jwt import create_signed_token, verify_signed_token
+
+UPLOAD_TOKEN_PURPOSE = "receipt-upload"
+PRESIGN_TOKEN_PURPOSE = "receipt-presign"
+
+def _validate_declared_file(filename: Optional[str], size: Optional[int]):
+    """Reject a file by its name and declared size before any bytes arrive"""
+    if not filename or not ReceiptService._is_valid_file_type(filename):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type. Allowed types: {', '.join(ReceiptService.ALLOWED_EXTENSIONS)}"
+        )
+    if size is not None and size > ReceiptService.MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large. Maximum size: {ReceiptService.MAX_FILE_SIZE // (1024*1024)}MB"
+        )
+
+def _storage():
+    storage = get_storage_client()
+    if storage is None:
+        raise HTTPException(status_code=500, detail="Supabase not configured.")
+    return storage
+
+class ResumableUploadService:
+    """TUS 1.0 (core + creation + termination) endpoint for receipt files.
+
+    The backend relays each upload to a resumable upload in the bucket. The
+    session (owner, object path, length, upstream URL) travels in a signed
+    upload ID, and the bucket is the source of truth for progress, so any
+    worker can continue any upload and nothing is kept in memory between
+    requests. Each PATCH is forwarded in STORAGE_CHUNK_SIZE chunks, holding at
+    most one chunk per request. The bucket only takes whole chunks before the
+    last one, so bytes left over at the end of a PATCH body are stored as a
+    small object next to the file, named after the upstream offset they
+    follow, and sent ahead of the next PATCH's bytes. The offset reported to
+    the client counts them.
+    """
+
+    @staticmethod
+    def _tail_path(session: dict, upstream_offset: int) -> str:
+        # In the owner's folder, so the receipt file sweep removes tails of abandoned uploads
+        return f"{session['path']}.part-{upstream_offset}"
+
+    @staticmethod
+    def _storage_error(e: StorageError) -> HTTPException:
+        if e.status == 409:
+            return HTTPException(status_code=409, detail="Upload-Offset does not match the upload")
+        if e.status in (404, 410):
+            return HTTPException(status_code=404, detail="Upload not found")
+        return HTTPException(status_code=502, detail=f"Storage upload failed: {str(e)}")
+
+    @staticmethod
+    def parse_metadata(header: Optional[str]) -> dict:
+        """Decode an Upload-Metadata header: comma-separated 'key base64value' pairs"""
+        metadata = {}
+        for pair in (header or "").split(","):
+            parts = pair.strip().split(" ", 1)
+            if not parts[0]:
+                continue
+            try:
+                metadata[parts[0]] = base64.b64decode(parts[1]).decode() if len(parts) > 1 else ""
+            except Exception:
+                raise HTTPException(status_code=400, detail=f"Invalid Upload-Metadata value for {parts[0]}")
+        return metadata
+
+    @staticmethod
+    def _session(user_id: str, upload_id: str) -> dict:
+        session = verify_signed_token(upload_id, UPLOAD_TOKEN_PURPOSE)
+        if not session or session.get("sub") != user_id:
+            raise HTTPException(status_code=404, detail="Upload not found")
+        return session
+
+    @staticmethod
+    async def create_upload(user_id: str, length: int, metadata: dict) -> str:
+        """Open an upload for a receipt file; returns its upload ID"""
+        print(f"=== CREATE RESUMABLE UPLOAD ===")
+        filename = metadata.get("filename") or metadata.get("name")
+        content_type = metadata.get("filetype") or metadata.get("type") or "application/octet-stream"
+        print(f"DEBUG: File name: {filename}, length: {length}, type: {content_type}")
+
+        _validate_declared_file(filename, length)
+        if length <= 0:
+            raise HTTPException(status_code=400, detail="Upload-Length must be positive")
+
+        file_path = ReceiptService._object_path(user_id, filename)
+        try:
+            upstream_url = await _storage().create_resumable(RECEIPTS_BUCKET, file_path, length, content_type)
+        except StorageError as e:
+            print(f"DEBUG: Create resumable upload error: {e}")
+            raise HTTPException(status_code=502, detail=f"Storage upload failed: {str(e)}")
+
+        print(f"DEBUG: Resumable upload opened for {file_path}")
+        return create_signed_token(
+            {"sub": user_id, "path": file_path, "length": length, "upstream": upstream_url},
+            UPLOAD_TOKEN_PURPOSE,
+            timedelta(seconds=settings.RECEIPT_UPLOAD_TTL)
+        )
+
+    @staticmethod
+    async def get_offset(user_id: str, upload_id: str):
+        """Return (offset, length) for an upload, from the bucket"""
+        session = ResumableUploadService._session(user_id, upload_id)
+        storage = _storage()
+        try:
+            upstream_offset = await storage.get_offset(session["upstream"])
+            tail = await storage.info(RECEIPTS_BUCKET, ResumableUploadService._tail_path(session, upstream_offset))
+        except StorageError as e:
+            print(f"DEBUG: Get upload offset error: {e}")
+            raise ResumableUploadService._storage_error(e)
+        return upstream_offset + (tail["size"] if tail else 0), session["length"]
+
+    @staticmethod
+    async def append(user_id: str, upload_id: str, offset: int, body: AsyncIterator[bytes]):
+        """Forward a PATCH body starting at offset; returns (new offset, length, url when complete)"""
+        session = ResumableUploadService._session(user_id, upload_id)
+        length = session["length"]
+        if offset > length:
+            raise HTTPException(status_code=409, detail="Upload-Offset is past Upload-Length")
+        storage = _storage()
+        try:
+            upstream_offset = await storage.get_offset(session["upstream"])
+            tail_path = ResumableUploadService._tail_path(session, upstream_offset)
+            tail = await storage.download(RECEIPTS_BUCKET, tail_path) or b""
+            if offset != upstream_offset + len(tail):
+                raise HTTPException(status_code=409, detail="Upload-Offset does not match the upload")
+
+            new_upstream_offset, leftover = await storage.upload_stream(
+                session["upstream"], upstream_offset, length, body, pending=tail
+            )
+            if leftover and (new_upstream_offset, leftover) != (upstream_offset, tail):
+                await storage.upload(
+                    RECEIPTS_BUCKET, ResumableUploadService._tail_path(session, new_upstream_offset),
+                    leftover, "application/octet-stream", upsert=True
+                )
+        except StorageError as e:
+            print(f"DEBUG: Upload chunk error: {e}")
+            raise ResumableUploadService._storage_error(e)
+
+        if tail and new_upstream_offset != upstream_offset:
+            # Sent with the first chunk; a tail left behind is never read again
+            try:
+                await storage.remove(RECEIPTS_BUCKET, [tail_path])
+            except StorageError as e:
+                print(f"DEBUG: Remove upload tail error: {e}")
+
+        new_offset = new_upstream_offset + len(leftover)
+        print(f"DEBUG: Upload at {new_offset}/{length} bytes ({len(leftover)} held until the next chunk)")
+        url = None
+        if new_offset == length:
+            url = storage.public_url(RECEIPTS_BUCKET, session["path"])
+            print(f"DEBUG: Upload complete: {url}")
+        return new_offset, length, url
+
+    @staticmethod
+    async def cancel(user_id: str, upload_id: str):
+        """Abandon an upload and discard the bytes received so far"""
+        session = ResumableUploadService._session(user_id, upload_id)
+        try:
+            await _storage().cancel_resumable(session["upstream"])
+        except StorageError as e:
+            print(f"DEBUG: Cancel upload error: {e}")
+            raise HTTPException(status_code=502, detail=f"Storage upload failed: {str(e)}")
+        # A held tail, if any, is left to the receipt file sweep
+
+class PresignedUploadService:
+    """Receipt files uploaded by the client straight to the bucket.
+
+    presign() hands out a signed upload URL for a new object under the
+    user's receipts/{user_id}/ folder, together with an upload ID that
+    records the path and when it was issued. The file's bytes never pass
+    through the API. complete() checks the object landed and creates its
+    receipt. Supabase keeps the signed URL itself valid for two hours and
+    cannot be told otherwise, so RECEIPT_PRESIGN_TTL is enforced here:
+    complete() refuses upload IDs older than that with 410. Files that are
+    never completed, or completed too late, are left for the storage sweep.
+    """
+
+    @staticmethod
+    async def presign(user_id: str, request: ReceiptPresignRequest) -> ReceiptPresignResponse:
+        """Issue a signed URL to upload one receipt file to"""
+        print(f"=== PRESIGN RECEIPT UPLOAD ===")
+        print(f"DEBUG: File name: {request.filename}, declared size: {request.size}")
+        _validate_declared_file(request.filename, request.size)
+
+        file_path = ReceiptService._object_path(user_id, request.filename)
+        try:
+            upload_url = await _storage().create_signed_upload_url(RECEIPTS_BUCKET, file_path)
+        except StorageError as e:
+            print(f"DEBUG: Create signed upload URL error: {e}")
+            raise HTTPException(status_code=502, detail=f"Storage upload failed: {str(e)}")
+
+        print(f"DEBUG: Signed upload URL issued for {file_path}")
+        upload_id = create_signed_token(
+            {"sub": user_id, "path": file_path, "filename": request.filename, "iat": int(time.time())},
+            PRESIGN_TOKEN_PURPOSE,
+            timedelta(seconds=settings.RECEIPT_PRESIGN_TTL)
+        )
+        return ReceiptPresignResponse(
+            upload_id=upload_id,
+            upload_url=upload_url,
+            path=file_path,
+            expires_in=settings.RECEIPT_PRESIGN_TTL
+        )
+
+    @staticmethod
+    async def complete(user_id: str, request: ReceiptCompleteRequest) -> ReceiptUploadResponse:
+        """Create the receipt for a presigned upload once its object exists"""
+        print(f"=== COMPLETE PRESIGNED UPLOAD ===")
+        if not supabase:
+            raise HTTPException(status_code=500, detail="Supabase not configured.")
+
+        # Expiry is checked below, so a late completion gets 410 rather than 404
+        session = verify_signed_token(request.upload_id, PRESIGN_TOKEN_PURPOSE, verify_exp=False)
+        if not session or session.get("sub") != user_id or not session.get("path", "").startswith(f"receipts/{user_id}/"):
+            raise HTTPException(status_code=404, detail="Upload not found")
+        file_path = session["path"]
+        age = time.time() - session.get("iat", 0)
+        print(f"DEBUG: Completing upload of {file_path}")
+
+        storage = _storage()
+        file_url = storage.public_url(RECEIPTS_BUCKET, file_path)
+        try:
+            # A retried completion returns the receipt the first one created
+            existing = supabase.table("receipts").select("*").eq("account_id", user_id).eq("url", file_url).execute()
+            if existing.data:
+                print("DEBUG: Upload already completed")
+                receipt = ReceiptResponse(**existing.data[0])
+                return ReceiptUploadResponse(
+                    success=True,
+                    message="Receipt created successfully",
+                    receipt_id=receipt.id,
+                    url=file_url,
+                    receipt=receipt,
+                    transaction_id=request.transaction_id
+                )
+
+            if age > settings.RECEIPT_PRESIGN_TTL:
+                print(f"DEBUG: Upload ID issued {int(age)}s ago, past RECEIPT_PRESIGN_TTL")
+                raise HTTPException(status_code=410, detail="Upload expired; request a new upload URL")
+
+            transaction = ReceiptService._find_transaction(user_id, request.transaction_id)
+
+            info = await storage.info(RECEIPTS_BUCKET, file_path)
+            print(f"DEBUG: Stored object: {info}")
+            if info is None:
+                raise HTTPException(status_code=409, detail="File has not been uploaded yet")
+            if info["size"] > ReceiptService.MAX_FILE_SIZE:
+                await ReceiptService._remove_stored_file(file_path)
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"File too large. Maximum size: {ReceiptService.MAX_FILE_SIZE // (1024*1024)}MB"
+                )
+
+            content_type = info["content_type"] or ""
+            receipt_data = ReceiptCreate(
+                name=request.name or session["filename"],
+                type="image" if content_type.startswith("image/") else "document",
+                description=request.description,
+                amount=request.amount,
+                date_of_purchase=request.date_of_purchase
+            )
+            receipt = ReceiptService._insert_receipt(user_id, receipt_data, file_url, transaction)
+            return ReceiptUploadResponse(
+                success=True,
+                message="Receipt created successfully",
+                receipt_id=receipt.id,
+                url=file_url,
+                receipt=receipt,
+                transaction_id=request.transaction_id
+            )
+
+        except HTTPException:
+            raise
+        except StorageError as e:
+            print(f"DEBUG: Stored object check error: {e}")
+            raise HTTPException(status_code=502, detail=f"Storage check failed: {str(e)}")
+        except Exception as e:
+            print(f"DEBUG: Complete upload error: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Failed to create receipt: {str(e)}")
@@ -0,0 +1,21 @@
+import uuid
+from collections import Counter
+
+# Order of operations in bulk requests and their results
+BULK_OPERATIONS = ["create", "update", "delete"]
+
+def is_uuid(value: str) -> bool:
+    """Whether value parses as a UUID (Postgres rejects the whole statement otherwise)"""
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+def duplicate_ids(ids: list) -> set:
+    """IDs listed more than once in one operation"""
+    return {item_id for item_id, count in Counter(ids).items() if count > 1}
+
+def sort_results(results: list):
+    """Order results by operation, then by position within the request"""
+    results.sort(key=lambda result: (BULK_OPERATIONS.index(result.operation), result.index))
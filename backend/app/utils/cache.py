@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+_MISSING = object()
+
+class TTLCache:
+    """Bounded in-process cache whose entries expire after a TTL.
+
+    Least recently used entries are evicted once max_entries is reached.
+    Keys for per-account data are tuples whose first element is the account
+    ID, which lets invalidate_account() drop everything for one user.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def update(self, key: Hashable, value: Any) -> bool:
+        """Replace a live entry's value without extending its expiry"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] <= time.monotonic():
+                return False
+            self._data[key] = (entry[0], value)
+            return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches predicate; returns the count"""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def invalidate_account(self, account_id: str) -> int:
+        return self.invalidate(lambda key: isinstance(key, tuple) and key and key[0] == account_id)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+# Caches holding per-account derived data, invalidated together on writes.
+# Each entry is (cache, depends_on_transactions).
+_account_caches = []
+
+def register_account_cache(cache, depends_on_transactions: bool = True):
+    """Register a cache (anything with invalidate_account) for write invalidation.
+
+    Caches that only hold cards/budgets/card_budgets pass
+    depends_on_transactions=False so transaction writes leave them warm.
+    """
+    _account_caches.append((cache, depends_on_transactions))
+    return cache
+
+def invalidate_account(account_id: str, transactions_only: bool = False):
+    """Drop cached derived data for an account after one of its writes.
+
+    Pass transactions_only=True when only transactions changed.
+    """
+    for cache, depends_on_transactions in _account_caches:
+        if transactions_only and not depends_on_transactions:
+            continue
+        cache.invalidate_account(account_id)
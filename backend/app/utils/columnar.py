@@ -0,0 +1,134 @@
+import json
+from typing import Iterable, List, Optional
+from fastapi import HTTPException, Response
+
+_msgpack = None
+
+def _load_msgpack():
+    """Import msgpack on first use; it is optional and kept off the cold-start path"""
+    global _msgpack
+    if _msgpack is None:
+        try:
+            import msgpack
+            _msgpack = msgpack
+        except ImportError:
+            # Clients asking for MessagePack get columnar JSON instead
+            _msgpack = False
+    return _msgpack or None
+
+COLUMNAR_JSON_MEDIA_TYPE = "application/vnd.takeback.columnar+json"
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+JSON_MEDIA_TYPE = "application/json"
+
+# Short names accepted through the ?format= query parameter
+FORMAT_ALIASES = {
+    "json": JSON_MEDIA_TYPE,
+    "columnar": COLUMNAR_JSON_MEDIA_TYPE,
+    "msgpack": MSGPACK_MEDIA_TYPE,
+}
+
+def negotiate_format(accept: Optional[str], format_param: Optional[str] = None) -> str:
+    """Pick the response media type from ?format= or the Accept header"""
+    if format_param:
+        media_type = FORMAT_ALIASES.get(format_param.lower())
+        if media_type is None:
+            raise HTTPException(status_code=400, detail=f"Unknown format: {format_param}. Use one of: {', '.join(FORMAT_ALIASES)}")
+        if media_type == MSGPACK_MEDIA_TYPE and _load_msgpack() is None:
+            return COLUMNAR_JSON_MEDIA_TYPE
+        return media_type
+
+    if not accept:
+        return JSON_MEDIA_TYPE
+
+    # Offered types in the server's order of preference, for ties the client leaves open
+    offered = [JSON_MEDIA_TYPE, COLUMNAR_JSON_MEDIA_TYPE]
+    if _load_msgpack() is not None:
+        offered.append(MSGPACK_MEDIA_TYPE)
+    ranges = parse_accept(accept)
+
+    best, best_rank = JSON_MEDIA_TYPE, None
+    for preference, media_type in enumerate(offered):
+        # The most specific range that matches decides the type's q-value
+        matches = [
+            (specificity, q, position)
+            for position, (media_range, q, specificity) in enumerate(ranges)
+            if media_range in (media_type, media_type.split("/")[0] + "/*", "*/*")
+        ]
+        if not matches:
+            continue
+        specificity, q, position = max(matches, key=lambda match: match[0])
+        if q <= 0:
+            continue
+        # Highest q wins, then the client's order, then ours
+        rank = (-q, position, preference)
+        if best_rank is None or rank < best_rank:
+            best, best_rank = media_type, rank
+    return best
+
+def parse_accept(accept: str) -> List[tuple]:
+    """Parse an Accept header into (media range, q, specificity) entries.
+
+    Specificity is 2 for a full type, 1 for type/* and 0 for */*. Entries
+    with an unparseable q-value are dropped.
+    """
+    ranges = []
+    for part in accept.split(","):
+        pieces = [p.strip() for p in part.split(";")]
+        media_range = pieces[0].lower()
+        if "/" not in media_range:
+            continue
+        q = 1.0
+        for param in pieces[1:]:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = min(max(float(value.strip()), 0.0), 1.0)
+                except ValueError:
+                    q = None
+        if q is None:
+            continue
+        specificity = 0 if media_range == "*/*" else 1 if media_range.endswith("/*") else 2
+        ranges.append((media_range, q, specificity))
+    return ranges
+
+def to_columnar(rows: List[dict], columns: Iterable[str], dictionary_columns: Iterable[str] = ()) -> dict:
+    """Convert a list of row dicts into parallel column arrays.
+
+    Columns listed in dictionary_columns are dictionary-encoded: the column
+    holds integer codes into dictionaries[column], and None stays None.
+    """
+    columns = list(columns)
+    dictionary_columns = set(dictionary_columns)
+    data = {column: [] for column in columns}
+    dictionaries = {column: [] for column in columns if column in dictionary_columns}
+    codes = {column: {} for column in dictionaries}
+
+    for row in rows:
+        for column in columns:
+            value = row.get(column)
+            if column in codes and value is not None:
+                code = codes[column].get(value)
+                if code is None:
+                    code = len(dictionaries[column])
+                    codes[column][value] = code
+                    dictionaries[column].append(value)
+                value = code
+            data[column].append(value)
+
+    return {
+        "format": "columnar",
+        "count": len(rows),
+        "columns": data,
+        "dictionaries": dictionaries,
+    }
+
+def columnar_response(rows: List[dict], columns: Iterable[str], dictionary_columns: Iterable[str], media_type: str) -> Response:
+    """Serialize rows as a columnar payload in the negotiated media type"""
+    payload = to_columnar(rows, columns, dictionary_columns)
+    msgpack = _load_msgpack()
+    if media_type == MSGPACK_MEDIA_TYPE and msgpack is not None:
+        body = msgpack.packb(payload, use_bin_type=True)
+    else:
+        media_type = COLUMNAR_JSON_MEDIA_TYPE
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
@@ -0,0 +1,184 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Optional
+from ..config.settings import settings
+
+# Signs the short-lived tokens EventSource clients open streams with
+STREAM_TOKEN_PURPOSE = "event-stream"
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+class LocalTransport:
+    """Delivers events to subscribers in this process only.
+
+    Enough for a single worker (development, or APP_ENV=production with
+    WEB_CONCURRENCY=1). With several workers, a write handled by one worker
+    would not reach streams held open by another; use RedisTransport there.
+    """
+
+    cross_process = False
+
+    def __init__(self):
+        self._deliver = None
+
+    async def start(self, deliver: Callable[[str, str], None]):
+        self._deliver = deliver
+
+    def publish(self, account_id: str, message: str):
+        if self._deliver is not None:
+            self._deliver(account_id, message)
+
+    async def close(self):
+        self._deliver = None
+
+class RedisTransport:
+    """Fans events out to every worker through one Redis pub/sub channel.
+
+    Each worker publishes to the channel and delivers what it reads back,
+    including its own events, so every stream sees one ordered feed. Requires
+    the redis package (pip install redis), which the app otherwise does not need.
+    """
+
+    cross_process = True
+    CHANNEL = "takeback:events"
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("redis is required for EVENTS_TRANSPORT=redis: pip install redis")
+        self._redis = redis.from_url(url)
+        self._pubsub = None
+        self._listener = None
+        self._pending = set()
+
+    async def start(self, deliver: Callable[[str, str], None]):
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.CHANNEL)
+        self._listener = asyncio.create_task(self._listen(deliver))
+
+    async def _listen(self, deliver: Callable[[str, str], None]):
+        while True:
+            try:
+                async for item in self._pubsub.listen():
+                    envelope = json.loads(item["data"])
+                    deliver(envelope["account_id"], envelope["message"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"DEBUG: Event transport listener error, resubscribing: {str(e)}")
+                await asyncio.sleep(1)
+
+    def publish(self, account_id: str, message: str):
+        envelope = json.dumps({"account_id": account_id, "message": message})
+        task = asyncio.get_running_loop().create_task(self._redis.publish(self.CHANNEL, envelope))
+        # Keep a reference until the publish finishes, and surface failures in the log
+        self._pending.add(task)
+        task.add_done_callback(self._published)
+
+    def _published(self, task: asyncio.Task):
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"DEBUG: Event publish failed: {task.exception()}")
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+        if self._pubsub is not None:
+            await self._pubsub.close()
+        await self._redis.close()
+
+def create_transport(name: str, url: Optional[str] = None):
+    """Build the transport named by EVENTS_TRANSPORT"""
+    if name == "local":
+        return LocalTransport()
+    if name == "redis":
+        if not url:
+            raise RuntimeError("EVENTS_REDIS_URL is required for EVENTS_TRANSPORT=redis")
+        return RedisTransport(url)
+    raise RuntimeError(f"Unknown EVENTS_TRANSPORT: {name}")
+
+class EventBus:
+    """Per-account publish/subscribe for live updates.
+
+    Each open stream owns a bounded queue. Publishing hands the encoded event
+    to the transport, which delivers it to the queues of that account's
+    streams in every process it reaches. A stream that falls more than
+    queue_size events behind loses its oldest events rather than holding
+    memory for a stalled client.
+    """
+
+    def __init__(self, transport=None, queue_size: int = 100):
+        self.transport = transport or LocalTransport()
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._started = False
+
+    async def start(self):
+        if not self._started:
+            await self.transport.start(self._deliver)
+            self._started = True
+
+    async def close(self):
+        if self._started:
+            await self.transport.close()
+            self._started = False
+
+    def _deliver(self, account_id: str, message: str):
+        for queue in self._subscribers.get(account_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    def has_subscribers(self, account_id: str) -> bool:
+        """Whether an event for the account could reach any stream.
+
+        Cross-process transports cannot see other workers' streams, so they
+        always report True.
+        """
+        return self.transport.cross_process or bool(self._subscribers.get(account_id))
+
+    def publish(self, account_id: str, event: str, data: Any):
+        """Send an event to the account's streams (must be called on the event loop)"""
+        if not self._started:
+            return
+        self.transport.publish(account_id, format_sse(event, data))
+
+    @asynccontextmanager
+    async def subscribe(self, account_id: str):
+        """Register a stream for the account; yields its queue of encoded events"""
+        await self.start()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(account_id, set()).add(queue)
+        print(f"DEBUG: Event stream opened ({len(self._subscribers[account_id])} for account)")
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(account_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[account_id]
+            print(f"DEBUG: Event stream closed")
+
+    async def stream(self, account_id: str, keepalive: float = 15):
+        """Server-Sent Events body for one client: a ready event, then the
+        account's events as they are published, with keep-alive comments while idle"""
+        async with self.subscribe(account_id) as queue:
+            yield "retry: 3000\n\n"
+            # Clients refetch once on ready, then apply events instead of polling
+            yield format_sse("ready", {"account_id": account_id})
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+
+# Shared by every writer and stream in this process
+event_bus = EventBus(
+    create_transport(settings.EVENTS_TRANSPORT, settings.EVENTS_REDIS_URL),
+    queue_size=settings.EVENTS_QUEUE_SIZE
+)
@@ -0,0 +1,245 @@
+import anyio
+import asyncio
+import hashlib
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, BinaryIO, Callable, Optional, Tuple
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from ..config.database import supabase
+from ..config.settings import settings
+from .cache import TTLCache
+
+MAX_KEY_LENGTH = 255
+
+_FRACTION = re.compile(r"\.(\d+)")
+
+def fingerprint(*parts: Any) -> str:
+    """Stable digest of the request payload a key was first used with"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(repr(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def file_digest(file: BinaryIO, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of an uploaded file's contents, leaving it rewound (blocking)"""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse a timestamptz as PostgREST returns it.
+
+    Before Python 3.11, fromisoformat() accepts neither a "Z" suffix nor
+    fractions of other than 3 or 6 digits, and Postgres drops trailing zeros.
+    """
+    value = value.strip().replace(" ", "T", 1)
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    value = _FRACTION.sub(lambda m: "." + m.group(1)[:6].ljust(6, "0"), value, count=1)
+    if "T" in value and re.search(r"[+-]\d{2}$", value):
+        value += ":00"
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+class LocalIdempotencyBackend:
+    """Claims and responses held in this process.
+
+    Enough for a single worker and for tests; with several workers a retry
+    routed to another worker repeats the write, so use
+    DatabaseIdempotencyBackend there.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 86400):
+        self._entries = TTLCache(max_entries=max_entries, ttl=ttl)
+
+    def claim(self, store_key: tuple, request_fingerprint: str) -> Optional[tuple]:
+        existing = self._entries.get(store_key)
+        if existing is None:
+            self._entries.set(store_key, (request_fingerprint, None))
+        return existing
+
+    def complete(self, store_key: tuple, response: Any):
+        entry = self._entries.get(store_key)
+        if entry is not None:
+            self._entries.set(store_key, (entry[0], response))
+
+    def release(self, store_key: tuple):
+        self._entries.pop(store_key)
+
+class DatabaseIdempotencyBackend:
+    """Claims and responses shared by every worker through the idempotency_keys
+    table (migrations/0008_idempotency_keys.sql).
+
+    A claim whose request has not finished after lease seconds is taken to be
+    abandoned (its worker died) and may be taken over by a retry. Calls block
+    on the database; IdempotencyStore runs them in the thread pool.
+    Expired rows are pruned by the first claim every prune_interval seconds.
+    """
+
+    TABLE = "idempotency_keys"
+
+    def __init__(self, ttl: float = 86400, lease: float = 60, prune_interval: float = 3600):
+        self.ttl = ttl
+        self.lease = lease
+        self.prune_interval = prune_interval
+        self._next_prune = 0.0
+
+    @staticmethod
+    def _match(query, store_key: tuple):
+        account_id, endpoint, key = store_key
+        return query.eq("account_id", account_id).eq("endpoint", endpoint).eq("key", key)
+
+    def _prune_due(self):
+        now = time.monotonic()
+        if self.prune_interval <= 0 or now < self._next_prune:
+            return
+        self._next_prune = now + self.prune_interval
+        try:
+            removed = self.prune()
+            print(f"DEBUG: Pruned {removed} expired Idempotency-Keys")
+        except Exception as e:
+            print(f"DEBUG: Idempotency key prune error: {str(e)}")
+
+    def claim(self, store_key: tuple, request_fingerprint: str) -> Optional[tuple]:
+        account_id, endpoint, key = store_key
+        self._prune_due()
+        while True:
+            try:
+                supabase.table(self.TABLE).insert({
+                    "account_id": account_id,
+                    "endpoint": endpoint,
+                    "key": key,
+                    "fingerprint": request_fingerprint
+                }).execute()
+                return None
+            except Exception as e:
+                # unique_violation: the key is already claimed
+                if getattr(e, "code", None) != "23505":
+                    raise
+            rows = self._match(supabase.table(self.TABLE).select("fingerprint, response, created_at"), store_key).execute().data
+            if not rows:
+                # Released between the insert and the read
+                continue
+            row = rows[0]
+            age = datetime.now(timezone.utc) - parse_timestamp(row["created_at"])
+            limit = self.lease if row["response"] is None else self.ttl
+            if age <= timedelta(seconds=limit):
+                return row["fingerprint"], row["response"]
+            # Expired, or abandoned mid-request: drop that claim (unless a
+            # concurrent retry already replaced it) and claim again
+            print(f"DEBUG: Dropping {'abandoned' if row['response'] is None else 'expired'} claim for Idempotency-Key {key}")
+            self._match(supabase.table(self.TABLE).delete(), store_key).eq("created_at", row["created_at"]).execute()
+
+    def complete(self, store_key: tuple, response: Any):
+        self._match(supabase.table(self.TABLE).update({"response": response}), store_key).execute()
+
+    def release(self, store_key: tuple):
+        self._match(supabase.table(self.TABLE).delete(), store_key).execute()
+
+    def prune(self) -> int:
+        """Delete stored responses past the TTL; returns the count"""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=max(self.ttl, self.lease))
+        return len(supabase.table(self.TABLE).delete().lt("created_at", cutoff.isoformat()).execute().data)
+
+def create_backend(name: str, ttl: float = 86400, lease: float = 60, max_entries: int = 10000,
+                   prune_interval: float = 3600):
+    """Build the backend named by IDEMPOTENCY_BACKEND"""
+    if name == "local":
+        return LocalIdempotencyBackend(max_entries, ttl)
+    if name == "database":
+        return DatabaseIdempotencyBackend(ttl, lease, prune_interval)
+    raise RuntimeError(f"Unknown IDEMPOTENCY_BACKEND: {name}")
+
+class IdempotencyStore:
+    """Replays completed write responses to retries.
+
+    Entries are keyed by (account_id, endpoint, Idempotency-Key) and hold the
+    payload fingerprint with the JSON response. The first request with a key
+    claims it and runs; a retry is answered from the store, and one that
+    arrives while the original is still running polls until it finishes
+    instead of repeating the write. Failed or cancelled requests release
+    their claim, so a waiting retry then makes a fresh attempt of its own.
+    Reusing a key with a different payload is rejected with 422.
+
+    The store is deliberately not registered for account invalidation: a
+    stored response must stay replayable after the write it describes.
+    """
+
+    def __init__(self, backend=None, poll_interval: float = 0.25):
+        self.backend = backend or LocalIdempotencyBackend()
+        self.poll_interval = poll_interval
+
+    async def run(
+        self,
+        account_id: str,
+        endpoint: str,
+        key: Optional[str],
+        request_fingerprint: str,
+        fn: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """Run fn once per key; returns (response, replayed)"""
+        if key is None:
+            return await fn(), False
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+        store_key = (account_id, endpoint, key)
+        waiting = False
+        while True:
+            try:
+                existing = await run_in_threadpool(self.backend.claim, store_key, request_fingerprint)
+            except Exception as e:
+                print(f"DEBUG: Idempotency store error: {str(e)}")
+                raise HTTPException(status_code=500, detail="Idempotency store unavailable")
+            if existing is None:
+                break
+            stored_fingerprint, response = existing
+            if stored_fingerprint != request_fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+            if response is not None:
+                print(f"DEBUG: Replaying stored response for Idempotency-Key {key}")
+                return response, True
+            if not waiting:
+                print(f"DEBUG: Waiting for in-flight request with Idempotency-Key {key}")
+                waiting = True
+            await asyncio.sleep(self.poll_interval)
+
+        try:
+            response = await fn()
+        except BaseException:
+            # Includes cancellation: free the key for the next attempt
+            await self._release(store_key)
+            raise
+        try:
+            await run_in_threadpool(self.backend.complete, store_key, jsonable_encoder(response))
+        except Exception as e:
+            # The write happened; only the replay is lost
+            print(f"DEBUG: Idempotency store error on complete: {str(e)}")
+        return response, False
+
+    async def _release(self, store_key: tuple):
+        try:
+            # Shielded, so a cancelled request still gets to free its key
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(self.backend.release, store_key)
+        except Exception as e:
+            print(f"DEBUG: Idempotency store error on release: {str(e)}")
+
+# Shared by every endpoint that honours the Idempotency-Key header
+idempotency_store = IdempotencyStore(create_backend(
+    settings.IDEMPOTENCY_BACKEND,
+    ttl=settings.IDEMPOTENCY_TTL,
+    lease=settings.IDEMPOTENCY_LEASE,
+    max_entries=settings.IDEMPOTENCY_MAX_ENTRIES,
+    prune_interval=settings.IDEMPOTENCY_PRUNE_INTERVAL
+))
+
+# Set on responses answered from the store
+REPLAYED_HEADER = "Idempotent-Replayed"
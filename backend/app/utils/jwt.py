@@ -27,4 +27,42 @@ def verify_token(token: str):
         raise HTTPException(status_code=401, detail="Token expired")
     except Exception as e:
         print(f"DEBUG: JWT token verification failed: {e}")
-        raise HTTPException(status_code=401, detail="Invalid token") 
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Invalid token") 
+
+def token_subject(token: str):
+    """The user ID of a valid access token, or None (quietly, for per-request bookkeeping)"""
+    try:
+        return jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]).get("sub")
+    except Exception:
+        return None
+
+def _purpose_secret(purpose: str) -> str:
+    # Derived per purpose so these tokens never verify as access tokens (or as each other)
+    return f"{settings.JWT_SECRET}:{purpose}"
+
+def create_signed_token(data: dict, purpose: str, expires_in: timedelta) -> str:
+    """Sign short-lived state handed to a client, such as an upload session"""
+    to_encode = {**data, "exp": datetime.utcnow() + expires_in}
+    return jwt.encode(to_encode, _purpose_secret(purpose), algorithm=settings.JWT_ALGORITHM)
+
+def signed_token_subject(token: str, purpose: str):
+    """The user ID of a valid create_signed_token token, or None (quietly)"""
+    try:
+        return jwt.decode(token, _purpose_secret(purpose), algorithms=[settings.JWT_ALGORITHM]).get("sub")
+    except Exception:
+        return None
+
+def verify_signed_token(token: str, purpose: str, verify_exp: bool = True):
+    """Verify a token from create_signed_token; returns its payload or None.
+
+    With verify_exp=False an expired token is still returned, for callers that
+    answer expiry differently from forgery.
+    """
+    try:
+        return jwt.decode(
+            token, _purpose_secret(purpose), algorithms=[settings.JWT_ALGORITHM],
+            options={"verify_exp": verify_exp}
+        )
+    except Exception as e:
+        print(f"DEBUG: Signed {purpose} token rejected: {e}")
+        return None
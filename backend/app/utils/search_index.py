@@ -0,0 +1,142 @@
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase word tokens of text (empty for None)"""
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+def trigrams(token: str) -> set:
+    """Padded character trigrams, as pg_trgm builds them"""
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class InvertedIndex:
+    """Incrementally maintained inverted index over a set of documents.
+
+    Each document is a dict; fields maps the indexed field names to their
+    weight, and a token's weight in a document is the highest weight of the
+    fields it appears in. Terms match exactly, by prefix (search-as-you-type)
+    or fuzzily by trigram similarity, with weaker matches scoring lower.
+    Rarer terms score higher (IDF), and every query term has to match.
+    """
+
+    EXACT, PREFIX, FUZZY = 1.0, 0.7, 0.4
+
+    def __init__(self, fields: Dict[str, float], fuzzy_threshold: float = 0.3, max_expansions: int = 50):
+        self.fields = fields
+        self.fuzzy_threshold = fuzzy_threshold
+        self.max_expansions = max_expansions
+        self._docs = {}
+        self._doc_tokens = {}
+        self._postings = {}
+        self._vocabulary = []
+        self._trigrams = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _document_tokens(self, doc: dict) -> Dict[str, float]:
+        weights = {}
+        for field, weight in self.fields.items():
+            for token in tokenize(doc.get(field)):
+                if weights.get(token, 0) < weight:
+                    weights[token] = weight
+        return weights
+
+    def add(self, doc_id: str, doc: dict):
+        """Index a document, replacing any previous version with the same ID"""
+        with self._lock:
+            self.remove(doc_id)
+            weights = self._document_tokens(doc)
+            self._docs[doc_id] = doc
+            self._doc_tokens[doc_id] = weights
+            for token, weight in weights.items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    insort(self._vocabulary, token)
+                    for gram in trigrams(token):
+                        self._trigrams.setdefault(gram, set()).add(token)
+                postings[doc_id] = weight
+
+    def add_many(self, docs: Iterable[Tuple[str, dict]]):
+        with self._lock:
+            for doc_id, doc in docs:
+                self.add(doc_id, doc)
+
+    def remove(self, doc_id: str) -> bool:
+        with self._lock:
+            weights = self._doc_tokens.pop(doc_id, None)
+            if weights is None:
+                return False
+            del self._docs[doc_id]
+            for token in weights:
+                postings = self._postings[token]
+                del postings[doc_id]
+                if not postings:
+                    # Drop tokens no document uses any more
+                    del self._postings[token]
+                    del self._vocabulary[bisect_left(self._vocabulary, token)]
+                    for gram in trigrams(token):
+                        tokens = self._trigrams[gram]
+                        tokens.discard(token)
+                        if not tokens:
+                            del self._trigrams[gram]
+            return True
+
+    def _expand(self, term: str, fuzzy: bool) -> Dict[str, float]:
+        """Map a query term to the indexed tokens it matches and their quality"""
+        matches = {}
+        if term in self._postings:
+            matches[term] = self.EXACT
+
+        start = bisect_left(self._vocabulary, term)
+        for token in self._vocabulary[start:start + self.max_expansions]:
+            if not token.startswith(term):
+                break
+            matches.setdefault(token, self.PREFIX)
+
+        if fuzzy and len(term) >= 3:
+            term_grams = trigrams(term)
+            shared = Counter()
+            for gram in term_grams:
+                shared.update(self._trigrams.get(gram, ()))
+            for token, count in shared.most_common(self.max_expansions * 4):
+                similarity = count / (len(term_grams) + len(trigrams(token)) - count)
+                if similarity >= self.fuzzy_threshold and token not in matches:
+                    matches[token] = self.FUZZY * similarity
+        return matches
+
+    def search(self, query: str, fuzzy: bool = True) -> List[Tuple[str, float, dict]]:
+        """Return unordered (doc_id, score, doc) for documents matching every query term"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            total = len(self._docs)
+            scores = None
+            for term in terms:
+                term_scores = {}
+                for token, quality in self._expand(term, fuzzy).items():
+                    postings = self._postings[token]
+                    idf = math.log(1 + total / len(postings))
+                    for doc_id, weight in postings.items():
+                        score = quality * weight * idf
+                        if term_scores.get(doc_id, 0) < score:
+                            term_scores[doc_id] = score
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {doc_id: score + term_scores[doc_id] for doc_id, score in scores.items() if doc_id in term_scores}
+                if not scores:
+                    return []
+
+            return [(doc_id, score, self._docs[doc_id]) for doc_id, score in scores.items()]
@@ -0,0 +1,59 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, Optional
+from .cache import TTLCache
+
+_MISS = object()
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one computation.
+
+    Keys are tuples of (account_id, endpoint, *parameters). While a call for a
+    key is running, duplicates await the same computation instead of repeating
+    the work. The computation runs in its own task, shielded from its callers:
+    a caller that is cancelled (a client disconnecting) leaves it running for
+    the others. With ttl > 0 (or a per-call ttl) the result is also kept for
+    ttl seconds. Invalidating an account drops its cached results and detaches
+    its in-flight computations, so later calls start afresh and results that
+    began before the write are never cached.
+    """
+
+    def __init__(self, ttl: float = 0, max_entries: int = 1024):
+        self.ttl = ttl
+        self._inflight = {}
+        self._results = TTLCache(max_entries=max_entries, ttl=ttl)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> Any:
+        cached = self._results.get(key, _MISS)
+        if cached is not _MISS:
+            print(f"DEBUG: Single-flight cache hit for {key[1]}")
+            return cached
+
+        task = self._inflight.get(key)
+        if task is not None:
+            print(f"DEBUG: Joining in-flight computation for {key[1]}")
+        else:
+            task = asyncio.ensure_future(self._run(key, fn, self.ttl if ttl is None else ttl))
+            # Mark any exception as retrieved in case every caller has gone
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _run(self, key: Hashable, fn: Callable[[], Awaitable[Any]], ttl: float) -> Any:
+        task = asyncio.current_task()
+        try:
+            result = await fn()
+        except BaseException:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+            raise
+        # A computation detached by invalidate_account read pre-write state
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            if ttl > 0:
+                self._results.set(key, result, ttl)
+        return result
+
+    def invalidate_account(self, account_id: str):
+        for key in [key for key in list(self._inflight) if key[0] == account_id]:
+            self._inflight.pop(key, None)
+        self._results.invalidate_account(account_id)
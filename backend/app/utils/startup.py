@@ -0,0 +1,70 @@
+import time
+from contextlib import contextmanager
+
+# Reference point for the startup report; this module is imported first by app.main
+_process_start = time.perf_counter()
+
+class StartupReport:
+    """Records how long each module import and initialization step takes.
+
+    Steps are recorded once per process, so on serverless platforms the
+    report describes the cold start that created the current container.
+    """
+
+    def __init__(self):
+        self.steps = []
+        self.ready_at = None
+        self.first_request_at = None
+
+    @contextmanager
+    def measure(self, name: str, kind: str = "import"):
+        """Time the enclosed block and record it under name"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append({
+                "name": name,
+                "kind": kind,
+                "ms": round((time.perf_counter() - started) * 1000, 2),
+            })
+
+    def mark_ready(self):
+        """Record the moment the app finished building"""
+        self.ready_at = time.perf_counter()
+
+    def mark_first_request(self):
+        """Record the first request served by this process"""
+        if self.first_request_at is None:
+            self.first_request_at = time.perf_counter()
+
+    def as_dict(self) -> dict:
+        def since_start(moment):
+            return round((moment - _process_start) * 1000, 2) if moment is not None else None
+
+        return {
+            "app_ready_ms": since_start(self.ready_at),
+            "first_request_ms": since_start(self.first_request_at),
+            "steps": sorted(self.steps, key=lambda step: step["ms"], reverse=True),
+        }
+
+    def print_report(self):
+        print("=== STARTUP REPORT ===")
+        report = self.as_dict()
+        print(f"DEBUG: App ready after {report['app_ready_ms']}ms")
+        for step in report["steps"]:
+            print(f"DEBUG: {step['kind']:<6} {step['name']:<28} {step['ms']:>8.2f}ms")
+
+startup_report = StartupReport()
+
+class FirstRequestMiddleware:
+    """ASGI middleware that marks the first HTTP request on the startup report"""
+
+    def __init__(self, app, report: StartupReport):
+        self.app = app
+        self.report = report
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and self.report.first_request_at is None:
+            self.report.mark_first_request()
+        await self.app(scope, receive, send)
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Move transactions older than TRANSACTION_ARCHIVE_DAYS into transactions_archive.
+
+Requires migrations/0001_transactions_archive.sql. Safe to run repeatedly and
+concurrently (batches skip rows another run has locked); schedule it daily.
+
+Usage:
+    python -m jobs.archive_transactions
+"""
+
+import sys
+import traceback
+
+from app.config.database import init_supabase_client, close_supabase_client
+from app.services.archive_service import ArchiveService
+
+def main() -> int:
+    print("=== ARCHIVE TRANSACTIONS ===")
+    if not init_supabase_client():
+        print("DEBUG: Supabase not configured.")
+        return 1
+    try:
+        moved = ArchiveService.archive_old_transactions()
+        print(f"DEBUG: Archive complete, {moved} transactions moved")
+        return 0
+    except Exception as e:
+        print(f"DEBUG: Archive failed: {e}")
+        traceback.print_exc()
+        return 1
+    finally:
+        close_supabase_client()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Delete Idempotency-Key claims older than IDEMPOTENCY_TTL.
+
+Requires migrations/0008_idempotency_keys.sql and IDEMPOTENCY_BACKEND=database.
+The backend already prunes every IDEMPOTENCY_PRUNE_INTERVAL seconds; schedule
+this daily when that is set to 0. Safe to run repeatedly.
+
+Usage:
+    python -m jobs.prune_idempotency_keys
+"""
+
+import sys
+import traceback
+
+from app.config.database import init_supabase_client, close_supabase_client
+from app.config.settings import settings
+from app.utils.idempotency import DatabaseIdempotencyBackend
+
+def main() -> int:
+    print("=== PRUNE IDEMPOTENCY KEYS ===")
+    if not init_supabase_client():
+        print("DEBUG: Supabase not configured.")
+        return 1
+    try:
+        removed = DatabaseIdempotencyBackend(settings.IDEMPOTENCY_TTL, settings.IDEMPOTENCY_LEASE).prune()
+        print(f"DEBUG: Prune complete, {removed} keys removed")
+        return 0
+    except Exception as e:
+        print(f"DEBUG: Prune failed: {e}")
+        traceback.print_exc()
+        return 1
+    finally:
+        close_supabase_client()
+
+if __name__ == "__main__":
+    sys.exit(main())
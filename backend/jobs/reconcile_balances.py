@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Recompute card balances and per-card_budget daily spend from transactions,
+repairing any drift from the running totals.
+
+Requires migrations/0004_card_balances.sql. Walks the cards in chunks, each
+repaired in its own short database transaction, and reports as it goes. The
+totals are normally exact; run this after restoring data or editing
+transactions outside the app, or weekly as a check.
+
+Usage:
+    python -m jobs.reconcile_balances [--batch-size 500]
+"""
+
+import argparse
+import sys
+import traceback
+
+from app.config.database import init_supabase_client, close_supabase_client
+from app.services.balance_service import BalanceService
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Repair drift in card balances and daily spend")
+    parser.add_argument("--batch-size", type=int, default=500, help="Cards recomputed per database call")
+    args = parser.parse_args(argv)
+
+    print("=== RECONCILE BALANCES ===")
+    if not init_supabase_client():
+        print("DEBUG: Supabase not configured.")
+        return 1
+    try:
+        checked = repaired_balances = repaired_days = 0
+        for chunk in BalanceService.reconcile(args.batch_size):
+            checked += chunk["checked"]
+            repaired_balances += chunk["repaired_balances"]
+            repaired_days += chunk["repaired_days"]
+            print(f"DEBUG: Checked {checked} cards, repaired {repaired_balances} balances and {repaired_days} daily totals")
+        print(f"DEBUG: Reconcile complete, {checked} cards checked")
+        return 0
+    except Exception as e:
+        print(f"DEBUG: Reconcile failed: {e}")
+        traceback.print_exc()
+        return 1
+    finally:
+        close_supabase_client()
+
+if __name__ == "__main__":
+    sys.exit(main())
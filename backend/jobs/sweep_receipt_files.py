@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Delete receipt files in storage that no receipts row points to.
+
+Receipt files are stored before their row is created, so uploads that are
+abandoned halfway (or presigned and never completed) leave objects behind in
+the receipts bucket. This walks every receipts/{user_id}/ folder page by page,
+checks each page against the account's receipt URLs, and removes unreferenced
+files older than the grace period in one storage call per page. The grace
+period must outlast RECEIPT_UPLOAD_TTL and RECEIPT_PRESIGN_TTL, so uploads
+that may still be turned into receipts are kept. Folders not named after an
+account ID are skipped. Run it with --dry-run first, then daily.
+
+Usage:
+    python -m jobs.sweep_receipt_files [--grace-hours 48] [--batch-size 100] [--rate 0] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import sys
+import traceback
+from datetime import timedelta
+
+from app.config.database import init_supabase_client, close_supabase_client
+from app.config.settings import settings
+from app.config.storage import close_storage_client
+from app.services.receipt_cleanup_service import ReceiptCleanupService
+
+async def sweep(args) -> int:
+    checked = orphaned = removed = 0
+    try:
+        async for page in ReceiptCleanupService.sweep(
+            timedelta(hours=args.grace_hours), args.batch_size, dry_run=args.dry_run, rate=args.rate
+        ):
+            checked += page["checked"]
+            orphaned += len(page["orphaned"])
+            removed += page["removed"]
+            for path in page["orphaned"]:
+                print(f"DEBUG: {'Would remove' if args.dry_run else 'Removed'} {path}")
+            print(f"DEBUG: Checked {checked} files, {orphaned} unreferenced, {removed} removed")
+    finally:
+        await close_storage_client()
+    print(f"DEBUG: Sweep complete, {checked} files checked, {removed} removed{' (dry run)' if args.dry_run else ''}")
+    return 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Delete receipt files no receipt refers to")
+    parser.add_argument("--grace-hours", type=float, default=48, help="Keep unreferenced files younger than this")
+    parser.add_argument("--batch-size", type=int, default=100, help="Files listed (and removed) per storage call")
+    parser.add_argument("--rate", type=float, default=0, help="Storage requests per second (0 for no limit)")
+    parser.add_argument("--dry-run", action="store_true", help="Report unreferenced files without removing them")
+    args = parser.parse_args(argv)
+
+    print("=== SWEEP RECEIPT FILES ===")
+    if args.grace_hours * 3600 < max(settings.RECEIPT_UPLOAD_TTL, settings.RECEIPT_PRESIGN_TTL):
+        print(
+            f"DEBUG: --grace-hours must cover RECEIPT_UPLOAD_TTL ({settings.RECEIPT_UPLOAD_TTL}s) and "
+            f"RECEIPT_PRESIGN_TTL ({settings.RECEIPT_PRESIGN_TTL}s), or uploads still in progress could be removed"
+        )
+        return 1
+    if not init_supabase_client():
+        print("DEBUG: Supabase not configured.")
+        return 1
+    try:
+        return asyncio.run(sweep(args))
+    except Exception as e:
+        print(f"DEBUG: Sweep failed: {e}")
+        traceback.print_exc()
+        return 1
+    finally:
+        close_supabase_client()
+
+if __name__ == "__main__":
+    sys.exit(main())
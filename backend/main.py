@@ -25,16 +25,6 @@ except ImportError as e:
 # The 'app' variable is now available for Vercel to use
 
 if __name__ == "__main__":
-    print("=== TakeBack Backend - Development Mode ===")
-    print("DEBUG: Starting development server...")
-    print("DEBUG: Server will run on http://0.0.0.0:8000")
-    print("DEBUG: API documentation will be available at http://localhost:8000/docs")
-    
-    try:
-        import uvicorn
-        uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
-        
-    except Exception as e:
-        print(f"ERROR: Failed to start server: {e}")
-        print("DEBUG: Check your environment variables and dependencies")
-        sys.exit(1) 
\ No newline at end of file
+    # Same launch modes as run.py (development reload, or production workers)
+    from run import main as run_server
+    run_server()
@@ -0,0 +1,55 @@
+-- 0001: Cold storage for old transactions
+-- Applied by python -m migrations.runner (or run it in the Supabase SQL Editor)
+--
+-- Transactions dated before TRANSACTION_ARCHIVE_DAYS are moved into
+-- transactions_archive by jobs/archive_transactions.py, keeping the hot
+-- transactions table (and its indexes) sized to recent activity. The backend
+-- reads the archive only for ranges that reach past the horizon.
+
+-- 1. Archive table with the same columns, defaults and references
+CREATE TABLE IF NOT EXISTS transactions_archive (
+    LIKE transactions INCLUDING DEFAULTS,
+    PRIMARY KEY (id),
+    FOREIGN KEY (card_budget_id) REFERENCES card_budgets(id) ON DELETE CASCADE,
+    FOREIGN KEY (receipt_id) REFERENCES receipts(id) ON DELETE SET NULL
+);
+
+-- 2. Same access paths as the hot table
+CREATE INDEX IF NOT EXISTS idx_transactions_archive_card_budget_id_date
+    ON transactions_archive(card_budget_id, date);
+
+-- 3. Full history in one relation, for ad-hoc reporting
+CREATE OR REPLACE VIEW transactions_all AS
+    SELECT * FROM transactions
+    UNION ALL
+    SELECT * FROM transactions_archive;
+
+-- 4. Move one batch of old transactions; returns the number moved.
+--    Delete and insert run in the same statement, so a row is never in both
+--    tables or in neither.
+CREATE OR REPLACE FUNCTION archive_transactions(horizon_days INTEGER, batch_size INTEGER DEFAULT 5000)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    moved INTEGER;
+BEGIN
+    WITH batch AS (
+        SELECT id FROM transactions
+        WHERE date < NOW() - make_interval(days => horizon_days)
+        ORDER BY date
+        LIMIT batch_size
+        FOR UPDATE SKIP LOCKED
+    ), removed AS (
+        DELETE FROM transactions t
+        USING batch
+        WHERE t.id = batch.id
+        RETURNING t.*
+    )
+    INSERT INTO transactions_archive
+    SELECT * FROM removed;
+
+    GET DIAGNOSTICS moved = ROW_COUNT;
+    RETURN moved;
+END;
+$$;
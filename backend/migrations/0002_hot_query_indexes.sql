@@ -0,0 +1,24 @@
+-- 0002: Indexes for the queries every service runs
+-- Verified by: python -m migrations.check_indexes
+
+-- Cards and budgets are always listed per account (entity graph, ownership checks)
+CREATE INDEX IF NOT EXISTS idx_cards_account_id ON cards(account_id);
+CREATE INDEX IF NOT EXISTS idx_budgets_account_id ON budgets(account_id);
+CREATE INDEX IF NOT EXISTS idx_policies_account_id ON policies(account_id);
+
+-- Receipts are listed per account, newest first
+CREATE INDEX IF NOT EXISTS idx_receipts_account_id_date_added
+    ON receipts(account_id, date_added DESC);
+
+-- Transactions are read per card_budget, either for a date range (analytics,
+-- authorization) or newest first (recent transactions). The composite index
+-- serves both, and also every lookup by card_budget_id alone, so the
+-- single-column index it supersedes is dropped.
+CREATE INDEX IF NOT EXISTS idx_transactions_card_budget_id_date
+    ON transactions(card_budget_id, date DESC);
+DROP INDEX IF EXISTS idx_transactions_card_budget_id;
+
+-- transactions_archive already has (card_budget_id, date) from 0001
+
+-- Deleting a receipt nulls transactions.receipt_id (ON DELETE SET NULL)
+CREATE INDEX IF NOT EXISTS idx_transactions_receipt_id ON transactions(receipt_id);
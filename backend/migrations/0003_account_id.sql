@@ -0,0 +1,86 @@
+-- 0003: Denormalized account_id on card_budgets and transactions
+-- Verified by: python -m migrations.check_indexes
+--
+-- Every read is scoped to one account. Without the column, finding an
+-- account's transactions means resolving cards -> card_budgets first and then
+-- filtering transactions by a list of card_budget IDs. Carrying account_id on
+-- both tables lets each query filter on it directly, with one index per table.
+--
+-- The backend sends account_id on every insert; the triggers below derive it
+-- from the parent row regardless, so it cannot disagree with card ownership.
+
+-- 1. Columns, backfilled from the parent rows
+ALTER TABLE card_budgets
+    ADD COLUMN IF NOT EXISTS account_id UUID REFERENCES accounts(id) ON DELETE CASCADE;
+UPDATE card_budgets cb
+    SET account_id = c.account_id
+    FROM cards c
+    WHERE cb.card_id = c.id AND cb.account_id IS DISTINCT FROM c.account_id;
+ALTER TABLE card_budgets ALTER COLUMN account_id SET NOT NULL;
+
+-- Appended last on both tables, so archive_transactions()' SELECT * keeps
+-- matching column for column
+ALTER TABLE transactions
+    ADD COLUMN IF NOT EXISTS account_id UUID REFERENCES accounts(id) ON DELETE CASCADE;
+ALTER TABLE transactions_archive
+    ADD COLUMN IF NOT EXISTS account_id UUID REFERENCES accounts(id) ON DELETE CASCADE;
+UPDATE transactions t
+    SET account_id = cb.account_id
+    FROM card_budgets cb
+    WHERE t.card_budget_id = cb.id AND t.account_id IS DISTINCT FROM cb.account_id;
+UPDATE transactions_archive t
+    SET account_id = cb.account_id
+    FROM card_budgets cb
+    WHERE t.card_budget_id = cb.id AND t.account_id IS DISTINCT FROM cb.account_id;
+ALTER TABLE transactions ALTER COLUMN account_id SET NOT NULL;
+ALTER TABLE transactions_archive ALTER COLUMN account_id SET NOT NULL;
+
+-- 2. Keep account_id in step with the parent row on every write
+CREATE OR REPLACE FUNCTION set_card_budget_account_id()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    SELECT account_id INTO NEW.account_id FROM cards WHERE id = NEW.card_id;
+    RETURN NEW;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION set_transaction_account_id()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    SELECT account_id INTO NEW.account_id FROM card_budgets WHERE id = NEW.card_budget_id;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS card_budgets_account_id ON card_budgets;
+CREATE TRIGGER card_budgets_account_id
+    BEFORE INSERT OR UPDATE OF card_id, account_id ON card_budgets
+    FOR EACH ROW EXECUTE FUNCTION set_card_budget_account_id();
+
+DROP TRIGGER IF EXISTS transactions_account_id ON transactions;
+CREATE TRIGGER transactions_account_id
+    BEFORE INSERT OR UPDATE OF card_budget_id, account_id ON transactions
+    FOR EACH ROW EXECUTE FUNCTION set_transaction_account_id();
+
+DROP TRIGGER IF EXISTS transactions_archive_account_id ON transactions_archive;
+CREATE TRIGGER transactions_archive_account_id
+    BEFORE INSERT OR UPDATE OF card_budget_id, account_id ON transactions_archive
+    FOR EACH ROW EXECUTE FUNCTION set_transaction_account_id();
+
+-- 3. Account-scoped access paths. Transactions are read per account for a
+--    date range or newest first; per-card_budget reads keep 0002's index.
+CREATE INDEX IF NOT EXISTS idx_card_budgets_account_id ON card_budgets(account_id);
+CREATE INDEX IF NOT EXISTS idx_transactions_account_id_date
+    ON transactions(account_id, date DESC);
+CREATE INDEX IF NOT EXISTS idx_transactions_archive_account_id_date
+    ON transactions_archive(account_id, date);
+
+-- 4. The view's column list was fixed when it was created; pick up account_id
+CREATE OR REPLACE VIEW transactions_all AS
+    SELECT * FROM transactions
+    UNION ALL
+    SELECT * FROM transactions_archive;
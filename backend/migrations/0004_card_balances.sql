@@ -0,0 +1,218 @@
+-- 0004: Running card balances and per-card_budget daily spend
+-- Repair drift with: python -m jobs.reconcile_balances
+--
+-- cards.balance holds the sum of every transaction on the card (hot and
+-- archived), and card_budget_daily_spend holds each card_budget's spend per
+-- day. Triggers keep both in step with every transaction insert, update and
+-- delete inside the writing transaction. Balance reads become a single row
+-- lookup, and period spend becomes a sum over at most one row per day of the
+-- period.
+
+-- 1. Daily spend per card_budget
+CREATE TABLE IF NOT EXISTS card_budget_daily_spend (
+    card_budget_id UUID NOT NULL REFERENCES card_budgets(id) ON DELETE CASCADE,
+    account_id UUID NOT NULL REFERENCES accounts(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    amount NUMERIC(12,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (card_budget_id, day)
+);
+CREATE INDEX IF NOT EXISTS idx_card_budget_daily_spend_account_id_day
+    ON card_budget_daily_spend(account_id, day);
+
+-- 2. Apply one transaction's amount to its card and day
+CREATE OR REPLACE FUNCTION apply_transaction_spend(p_card_budget_id UUID, p_date TIMESTAMP, p_amount NUMERIC)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    cb RECORD;
+BEGIN
+    IF p_amount IS NULL OR p_amount = 0 THEN
+        RETURN;
+    END IF;
+    SELECT card_id, account_id INTO cb FROM card_budgets WHERE id = p_card_budget_id;
+    -- Gone when the card_budget itself is being deleted; see step 4
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+    UPDATE cards SET balance = COALESCE(balance, 0) + p_amount WHERE id = cb.card_id;
+    INSERT INTO card_budget_daily_spend (card_budget_id, account_id, day, amount)
+    VALUES (p_card_budget_id, cb.account_id, COALESCE(p_date, NOW())::date, p_amount)
+    ON CONFLICT (card_budget_id, day)
+    DO UPDATE SET amount = card_budget_daily_spend.amount + EXCLUDED.amount;
+END;
+$$;
+
+-- 3. Track every transaction write. Moves between transactions and
+--    transactions_archive leave the totals unchanged, so archive_transactions()
+--    switches tracking off for its own transaction.
+CREATE OR REPLACE FUNCTION track_transaction_spend()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF current_setting('takeback.archiving', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_transaction_spend(OLD.card_budget_id, OLD.date, -OLD.amount);
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT') THEN
+        PERFORM apply_transaction_spend(NEW.card_budget_id, NEW.date, NEW.amount);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS transactions_track_spend ON transactions;
+CREATE TRIGGER transactions_track_spend
+    AFTER INSERT OR DELETE OR UPDATE OF card_budget_id, amount, date ON transactions
+    FOR EACH ROW EXECUTE FUNCTION track_transaction_spend();
+
+DROP TRIGGER IF EXISTS transactions_archive_track_spend ON transactions_archive;
+CREATE TRIGGER transactions_archive_track_spend
+    AFTER INSERT OR DELETE OR UPDATE OF card_budget_id, amount, date ON transactions_archive
+    FOR EACH ROW EXECUTE FUNCTION track_transaction_spend();
+
+-- 4. Removing a budget from a card (or deleting the budget) cascades to the
+--    card_budget's transactions after the card_budget row is gone, so take its
+--    whole total off the card here. Its daily spend rows cascade with it.
+CREATE OR REPLACE FUNCTION release_card_budget_spend()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE cards
+    SET balance = COALESCE(balance, 0) - (
+        SELECT COALESCE(SUM(amount), 0) FROM card_budget_daily_spend WHERE card_budget_id = OLD.id
+    )
+    WHERE id = OLD.card_id;
+    RETURN OLD;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS card_budgets_release_spend ON card_budgets;
+CREATE TRIGGER card_budgets_release_spend
+    BEFORE DELETE ON card_budgets
+    FOR EACH ROW EXECUTE FUNCTION release_card_budget_spend();
+
+-- 5. archive_transactions() from 0001, with tracking off while it moves rows
+CREATE OR REPLACE FUNCTION archive_transactions(horizon_days INTEGER, batch_size INTEGER DEFAULT 5000)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    moved INTEGER;
+BEGIN
+    PERFORM set_config('takeback.archiving', 'on', true);
+
+    WITH batch AS (
+        SELECT id FROM transactions
+        WHERE date < NOW() - make_interval(days => horizon_days)
+        ORDER BY date
+        LIMIT batch_size
+        FOR UPDATE SKIP LOCKED
+    ), removed AS (
+        DELETE FROM transactions t
+        USING batch
+        WHERE t.id = batch.id
+        RETURNING t.*
+    )
+    INSERT INTO transactions_archive
+    SELECT * FROM removed;
+
+    GET DIAGNOSTICS moved = ROW_COUNT;
+    PERFORM set_config('takeback.archiving', 'off', true);
+    RETURN moved;
+END;
+$$;
+
+-- 6. Recompute one chunk of cards (in id order, after after_id) from their
+--    transactions and repair any drift. Locks the chunk's cards first, so
+--    concurrent transaction writes to them wait until it is repaired.
+CREATE OR REPLACE FUNCTION reconcile_card_balances(after_id UUID DEFAULT NULL, batch_size INTEGER DEFAULT 500)
+RETURNS TABLE (last_id UUID, checked INTEGER, repaired_balances INTEGER, repaired_days INTEGER)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    ids UUID[];
+BEGIN
+    SELECT array_agg(id ORDER BY id) INTO ids
+    FROM (
+        SELECT id FROM cards
+        WHERE after_id IS NULL OR id > after_id
+        ORDER BY id
+        LIMIT batch_size
+        FOR UPDATE
+    ) chunk;
+
+    IF ids IS NULL THEN
+        RETURN QUERY SELECT NULL::UUID, 0, 0, 0;
+        RETURN;
+    END IF;
+
+    last_id := ids[array_length(ids, 1)];
+    checked := array_length(ids, 1);
+
+    WITH actual AS (
+        SELECT c.id, COALESCE(SUM(t.amount), 0) AS balance
+        FROM cards c
+        LEFT JOIN card_budgets cb ON cb.card_id = c.id
+        LEFT JOIN transactions_all t ON t.card_budget_id = cb.id
+        WHERE c.id = ANY(ids)
+        GROUP BY c.id
+    ), fixed AS (
+        UPDATE cards c
+        SET balance = actual.balance
+        FROM actual
+        WHERE c.id = actual.id AND c.balance IS DISTINCT FROM actual.balance
+        RETURNING c.id
+    )
+    SELECT count(*) INTO repaired_balances FROM fixed;
+
+    WITH actual AS (
+        SELECT t.card_budget_id, cb.account_id, t.date::date AS day, SUM(t.amount) AS amount
+        FROM card_budgets cb
+        JOIN transactions_all t ON t.card_budget_id = cb.id
+        WHERE cb.card_id = ANY(ids)
+        GROUP BY t.card_budget_id, cb.account_id, t.date::date
+    ), stale AS (
+        -- Days whose transactions are all gone (zero rows left by deletes are not drift)
+        DELETE FROM card_budget_daily_spend s
+        USING card_budgets cb
+        WHERE s.card_budget_id = cb.id
+          AND cb.card_id = ANY(ids)
+          AND NOT EXISTS (SELECT 1 FROM actual WHERE actual.card_budget_id = s.card_budget_id AND actual.day = s.day)
+        RETURNING s.amount
+    ), upserted AS (
+        INSERT INTO card_budget_daily_spend (card_budget_id, account_id, day, amount)
+        SELECT card_budget_id, account_id, day, amount FROM actual
+        ON CONFLICT (card_budget_id, day)
+        DO UPDATE SET amount = EXCLUDED.amount
+        WHERE card_budget_daily_spend.amount IS DISTINCT FROM EXCLUDED.amount
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM stale WHERE amount <> 0) + (SELECT count(*) FROM upserted)
+    INTO repaired_days;
+
+    RETURN NEXT;
+END;
+$$;
+
+-- 7. Backfill from existing transactions
+UPDATE cards SET balance = 0 WHERE balance IS DISTINCT FROM 0;
+INSERT INTO card_budget_daily_spend (card_budget_id, account_id, day, amount)
+SELECT t.card_budget_id, cb.account_id, t.date::date, SUM(t.amount)
+FROM transactions_all t
+JOIN card_budgets cb ON cb.id = t.card_budget_id
+GROUP BY t.card_budget_id, cb.account_id, t.date::date
+ON CONFLICT (card_budget_id, day) DO UPDATE SET amount = EXCLUDED.amount;
+UPDATE cards c
+SET balance = totals.amount
+FROM (
+    SELECT cb.card_id, SUM(s.amount) AS amount
+    FROM card_budget_daily_spend s
+    JOIN card_budgets cb ON cb.id = s.card_budget_id
+    GROUP BY cb.card_id
+) totals
+WHERE c.id = totals.card_id;
@@ -0,0 +1,42 @@
+-- 0005: Create a receipt and link it to a transaction in one statement
+--
+-- POST /api/receipts/upload-and-create stores the file and then calls
+-- create_receipt() once. The receipt insert and the transaction link commit
+-- together: when the transaction is not the account's, neither happens and
+-- the backend removes the stored file again.
+
+CREATE OR REPLACE FUNCTION create_receipt(
+    p_account_id UUID,
+    p_name TEXT,
+    p_type TEXT,
+    p_url TEXT,
+    p_description TEXT DEFAULT NULL,
+    p_amount NUMERIC DEFAULT NULL,
+    p_date_of_purchase TIMESTAMP DEFAULT NULL,
+    p_transaction_id UUID DEFAULT NULL
+)
+RETURNS SETOF receipts
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    receipt receipts;
+BEGIN
+    INSERT INTO receipts (account_id, name, type, description, amount, url, date_of_purchase)
+    VALUES (p_account_id, p_name, p_type, p_description, p_amount, p_url, COALESCE(p_date_of_purchase, NOW()))
+    RETURNING * INTO receipt;
+
+    IF p_transaction_id IS NOT NULL THEN
+        UPDATE transactions SET receipt_id = receipt.id
+        WHERE id = p_transaction_id AND account_id = p_account_id;
+        IF NOT FOUND THEN
+            UPDATE transactions_archive SET receipt_id = receipt.id
+            WHERE id = p_transaction_id AND account_id = p_account_id;
+        END IF;
+        IF NOT FOUND THEN
+            RAISE EXCEPTION 'Transaction % not found', p_transaction_id USING ERRCODE = 'no_data_found';
+        END IF;
+    END IF;
+
+    RETURN NEXT receipt;
+END;
+$$;
@@ -0,0 +1,43 @@
+-- 0006: Per-account transaction version counter
+--
+-- Every insert, update and delete of an account's transactions (hot or
+-- archived) bumps its version inside the writing transaction. Workers that
+-- keep derived state in memory, such as the search index, read this one row
+-- to tell whether another worker has written since they built it. Moves made
+-- by archive_transactions() leave the transactions themselves unchanged, so
+-- they do not count.
+
+-- 1. One counter row per account, created on its first transaction write.
+--    No foreign key: deleting an account cascades to its transactions, whose
+--    triggers must not recreate a reference to the account being removed.
+CREATE TABLE IF NOT EXISTS transaction_versions (
+    account_id UUID PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+-- 2. Count each row written
+CREATE OR REPLACE FUNCTION bump_transaction_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF current_setting('takeback.archiving', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    INSERT INTO transaction_versions (account_id, version)
+    VALUES (COALESCE(NEW.account_id, OLD.account_id), 1)
+    ON CONFLICT (account_id)
+    DO UPDATE SET version = transaction_versions.version + 1;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS transactions_bump_version ON transactions;
+CREATE TRIGGER transactions_bump_version
+    AFTER INSERT OR DELETE OR UPDATE ON transactions
+    FOR EACH ROW EXECUTE FUNCTION bump_transaction_version();
+
+DROP TRIGGER IF EXISTS transactions_archive_bump_version ON transactions_archive;
+CREATE TRIGGER transactions_archive_bump_version
+    AFTER INSERT OR DELETE OR UPDATE ON transactions_archive
+    FOR EACH ROW EXECUTE FUNCTION bump_transaction_version();
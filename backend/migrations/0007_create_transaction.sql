@@ -0,0 +1,64 @@
+-- 0007: Check a transaction against its card and budget as it is inserted
+--
+-- POST /api/transactions calls create_transaction() instead of inserting
+-- directly. The card_budget row is locked while the card's status and the
+-- budget's spend are read and the transaction is inserted, so concurrent
+-- creates on one card_budget are checked one after another against committed
+-- totals, whichever worker handles them. Spend is read from
+-- card_budget_daily_spend (0004) over the budget period ending on the
+-- transaction's own date, so backdated transactions are checked against the
+-- period they fall in.
+
+CREATE OR REPLACE FUNCTION create_transaction(
+    p_account_id UUID,
+    p_card_budget_id UUID,
+    p_amount NUMERIC,
+    p_name TEXT,
+    p_date TIMESTAMP DEFAULT NULL,
+    p_description TEXT DEFAULT NULL,
+    p_category TEXT DEFAULT NULL,
+    p_receipt_id UUID DEFAULT NULL
+)
+RETURNS SETOF transactions
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    target RECORD;
+    spent NUMERIC;
+    window_days INTEGER;
+    v_date TIMESTAMP := COALESCE(p_date, NOW());
+    created transactions;
+BEGIN
+    SELECT c.status, b.limit_amount, b.period INTO target
+    FROM card_budgets cb
+    JOIN cards c ON c.id = cb.card_id
+    JOIN budgets b ON b.id = cb.budget_id
+    WHERE cb.id = p_card_budget_id AND cb.account_id = p_account_id
+    FOR NO KEY UPDATE OF cb;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'card_budget_not_found' USING ERRCODE = 'no_data_found';
+    END IF;
+    IF target.status IN ('frozen', 'cancelled') THEN
+        RAISE EXCEPTION 'card_%', target.status USING ERRCODE = 'check_violation';
+    END IF;
+
+    -- Refunds and zero amounts never exceed the budget
+    IF p_amount > 0 THEN
+        window_days := CASE target.period WHEN 'weekly' THEN 7 WHEN 'quarterly' THEN 90 ELSE 30 END;
+        SELECT COALESCE(SUM(amount), 0) INTO spent
+        FROM card_budget_daily_spend
+        WHERE card_budget_id = p_card_budget_id
+          AND day >= (v_date - make_interval(days => window_days))::date
+          AND day <= v_date::date;
+        IF spent + p_amount > target.limit_amount THEN
+            RAISE EXCEPTION 'insufficient_budget' USING ERRCODE = 'check_violation';
+        END IF;
+    END IF;
+
+    INSERT INTO transactions (account_id, card_budget_id, amount, name, date, description, category, receipt_id)
+    VALUES (p_account_id, p_card_budget_id, p_amount, p_name, v_date, p_description, p_category, p_receipt_id)
+    RETURNING * INTO created;
+
+    RETURN NEXT created;
+END;
+$$;
@@ -0,0 +1,21 @@
+-- 0008: Idempotency-Key claims and stored responses, shared by every worker
+-- Expired rows are removed by the backend every IDEMPOTENCY_PRUNE_INTERVAL
+-- seconds, or by: python -m jobs.prune_idempotency_keys
+--
+-- The first request with a key inserts its row and runs; the unique
+-- constraint turns every concurrent or later request with that key, on any
+-- worker, into a reader of the row. response stays NULL while the first
+-- request runs and holds its JSON body once it succeeds. Failed requests
+-- delete their row, so the key can be retried.
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    account_id UUID NOT NULL,
+    endpoint TEXT NOT NULL,
+    key TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    response JSONB,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    UNIQUE (account_id, endpoint, key)
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at
+    ON idempotency_keys(created_at);
@@ -0,0 +1,57 @@
+-- 0009: Update an archived transaction in one statement
+--
+-- PUT /api/transactions/{id} on an archived transaction calls
+-- update_archived_transaction(). A transaction whose new date is still
+-- before the archive horizon is updated in transactions_archive; one whose
+-- new date falls inside the horizon is moved back to transactions and updated
+-- there. The move and the update commit together, so the row is never in
+-- both tables or in neither. The move itself runs with tracking off, as in
+-- archive_transactions(), so running balances (0004) and the transaction
+-- version (0006) only see the update.
+
+CREATE OR REPLACE FUNCTION update_archived_transaction(
+    p_account_id UUID,
+    p_transaction_id UUID,
+    p_horizon_days INTEGER,
+    p_card_budget_id UUID,
+    p_amount NUMERIC,
+    p_name TEXT,
+    p_date TIMESTAMP DEFAULT NULL,
+    p_description TEXT DEFAULT NULL,
+    p_category TEXT DEFAULT NULL,
+    p_receipt_id UUID DEFAULT NULL
+)
+RETURNS SETOF transactions
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_date TIMESTAMP := COALESCE(p_date, NOW());
+BEGIN
+    IF v_date < NOW() - make_interval(days => p_horizon_days) THEN
+        RETURN QUERY
+        UPDATE transactions_archive
+        SET card_budget_id = p_card_budget_id, amount = p_amount, name = p_name, date = v_date,
+            description = p_description, category = p_category, receipt_id = p_receipt_id
+        WHERE id = p_transaction_id AND account_id = p_account_id
+        RETURNING *;
+        RETURN;
+    END IF;
+
+    PERFORM set_config('takeback.archiving', 'on', true);
+    WITH removed AS (
+        DELETE FROM transactions_archive
+        WHERE id = p_transaction_id AND account_id = p_account_id
+        RETURNING *
+    )
+    INSERT INTO transactions
+    SELECT * FROM removed;
+    PERFORM set_config('takeback.archiving', 'off', true);
+
+    RETURN QUERY
+    UPDATE transactions
+    SET card_budget_id = p_card_budget_id, amount = p_amount, name = p_name, date = v_date,
+        description = p_description, category = p_category, receipt_id = p_receipt_id
+    WHERE id = p_transaction_id AND account_id = p_account_id
+    RETURNING *;
+END;
+$$;
@@ -0,0 +1,30 @@
+-- 0010: Bulk card and budget updates that only ever update
+--
+-- POST /api/budgets/bulk and POST /api/cards/bulk apply every update item in
+-- one statement. Each function updates the rows in p_rows (a JSON array with
+-- an id per item) that belong to p_account_id and returns them; IDs that are
+-- missing, deleted meanwhile or owned by another account match nothing and
+-- are never inserted.
+
+CREATE OR REPLACE FUNCTION bulk_update_budgets(p_account_id UUID, p_rows JSONB)
+RETURNS SETOF budgets
+LANGUAGE sql
+AS $$
+    UPDATE budgets b
+    SET name = r.name, limit_amount = r.limit_amount, period = r.period, require_receipts = r.require_receipts
+    FROM jsonb_to_recordset(p_rows) AS r(id UUID, name TEXT, limit_amount NUMERIC, period TEXT, require_receipts BOOLEAN)
+    WHERE b.id = r.id AND b.account_id = p_account_id
+    RETURNING b.*;
+$$;
+
+CREATE OR REPLACE FUNCTION bulk_update_cards(p_account_id UUID, p_rows JSONB)
+RETURNS SETOF cards
+LANGUAGE sql
+AS $$
+    UPDATE cards c
+    SET name = r.name, status = r.status, cardholder_name = r.cardholder_name, cvv = r.cvv,
+        expiry = r.expiry, zipcode = r.zipcode, address = r.address
+    FROM jsonb_to_recordset(p_rows) AS r(id UUID, name TEXT, status TEXT, cardholder_name TEXT, cvv TEXT, expiry TEXT, zipcode TEXT, address TEXT)
+    WHERE c.id = r.id AND c.account_id = p_account_id
+    RETURNING c.*;
+$$;
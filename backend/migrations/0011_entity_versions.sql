@@ -0,0 +1,51 @@
+-- 0011: Per-account entity version counter
+--
+-- Every insert, update and delete of an account's cards, budgets or
+-- card_budgets bumps its version inside the writing transaction. Workers
+-- cache each account's entity graph in memory and read this one row to tell
+-- whether another worker has changed it since. Running balance updates made
+-- by the transaction triggers (migrations/0004) touch only cards.balance,
+-- which the graph is never trusted for, so they do not count.
+
+-- 1. One counter row per account, created on its first entity write.
+--    No foreign key, for the same reason as transaction_versions (0006).
+CREATE TABLE IF NOT EXISTS entity_versions (
+    account_id UUID PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+-- 2. Count each row written
+CREATE OR REPLACE FUNCTION bump_entity_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO entity_versions (account_id, version)
+    VALUES (COALESCE(NEW.account_id, OLD.account_id), 1)
+    ON CONFLICT (account_id)
+    DO UPDATE SET version = entity_versions.version + 1;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS budgets_bump_entity_version ON budgets;
+CREATE TRIGGER budgets_bump_entity_version
+    AFTER INSERT OR DELETE OR UPDATE ON budgets
+    FOR EACH ROW EXECUTE FUNCTION bump_entity_version();
+
+DROP TRIGGER IF EXISTS card_budgets_bump_entity_version ON card_budgets;
+CREATE TRIGGER card_budgets_bump_entity_version
+    AFTER INSERT OR DELETE OR UPDATE ON card_budgets
+    FOR EACH ROW EXECUTE FUNCTION bump_entity_version();
+
+DROP TRIGGER IF EXISTS cards_bump_entity_version ON cards;
+CREATE TRIGGER cards_bump_entity_version
+    AFTER INSERT OR DELETE ON cards
+    FOR EACH ROW EXECUTE FUNCTION bump_entity_version();
+
+DROP TRIGGER IF EXISTS cards_bump_entity_version_on_update ON cards;
+CREATE TRIGGER cards_bump_entity_version_on_update
+    AFTER UPDATE ON cards
+    FOR EACH ROW
+    WHEN ((to_jsonb(OLD) - 'balance') IS DISTINCT FROM (to_jsonb(NEW) - 'balance'))
+    EXECUTE FUNCTION bump_entity_version();
@@ -0,0 +1,15 @@
+-- 0012: Account transaction lists in date order
+--
+-- Transaction lists page through an account's rows newest first, with id
+-- breaking ties between rows on the same date so pages never overlap or
+-- skip rows. These indexes serve that order directly (the archive's by
+-- scanning backwards) as well as every query the (account_id, date)
+-- indexes of 0003 served, so those are dropped.
+
+CREATE INDEX IF NOT EXISTS idx_transactions_account_id_date_id
+    ON transactions(account_id, date DESC, id DESC);
+DROP INDEX IF EXISTS idx_transactions_account_id_date;
+
+CREATE INDEX IF NOT EXISTS idx_transactions_archive_account_id_date_id
+    ON transactions_archive(account_id, date, id);
+DROP INDEX IF EXISTS idx_transactions_archive_account_id_date;
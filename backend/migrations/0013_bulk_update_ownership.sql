@@ -0,0 +1,76 @@
+-- 0013: Bulk updates check that every row belongs to the caller's account
+--
+-- The backend calls bulk_update_budgets() and bulk_update_cards() (0010) with
+-- the service-role key, which bypasses row level security, so p_account_id is
+-- the only thing scoping the update. Both functions now lock the rows named in
+-- p_rows first and refuse the whole batch if any of them belongs to another
+-- account, instead of quietly matching nothing; IDs that do not exist are
+-- still skipped. Neither function is callable through the API with the anon
+-- or authenticated keys, which would let a client pick any p_account_id.
+
+CREATE OR REPLACE FUNCTION bulk_update_budgets(p_account_id UUID, p_rows JSONB)
+RETURNS SETOF budgets
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM 1
+    FROM budgets b
+    JOIN jsonb_to_recordset(p_rows) AS r(id UUID) ON b.id = r.id
+    WHERE b.account_id IS DISTINCT FROM p_account_id
+    FOR UPDATE OF b;
+    IF FOUND THEN
+        RAISE EXCEPTION 'budget_not_owned' USING ERRCODE = 'insufficient_privilege';
+    END IF;
+
+    RETURN QUERY
+    UPDATE budgets b
+    SET name = r.name, limit_amount = r.limit_amount, period = r.period, require_receipts = r.require_receipts
+    FROM jsonb_to_recordset(p_rows) AS r(id UUID, name TEXT, limit_amount NUMERIC, period TEXT, require_receipts BOOLEAN)
+    WHERE b.id = r.id AND b.account_id = p_account_id
+    RETURNING b.*;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION bulk_update_cards(p_account_id UUID, p_rows JSONB)
+RETURNS SETOF cards
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM 1
+    FROM cards c
+    JOIN jsonb_to_recordset(p_rows) AS r(id UUID) ON c.id = r.id
+    WHERE c.account_id IS DISTINCT FROM p_account_id
+    FOR UPDATE OF c;
+    IF FOUND THEN
+        RAISE EXCEPTION 'card_not_owned' USING ERRCODE = 'insufficient_privilege';
+    END IF;
+
+    RETURN QUERY
+    UPDATE cards c
+    SET name = r.name, status = r.status, cardholder_name = r.cardholder_name, cvv = r.cvv,
+        expiry = r.expiry, zipcode = r.zipcode, address = r.address
+    FROM jsonb_to_recordset(p_rows) AS r(id UUID, name TEXT, status TEXT, cardholder_name TEXT, cvv TEXT, expiry TEXT, zipcode TEXT, address TEXT)
+    WHERE c.id = r.id AND c.account_id = p_account_id
+    RETURNING c.*;
+END;
+$$;
+
+-- Only the backend may call them. The Supabase roles are missing on a plain
+-- local Postgres, so each is revoked only where it exists.
+REVOKE EXECUTE ON FUNCTION bulk_update_budgets(UUID, JSONB) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION bulk_update_cards(UUID, JSONB) FROM PUBLIC;
+
+DO $$
+DECLARE
+    role_name TEXT;
+BEGIN
+    FOR role_name IN SELECT rolname FROM pg_roles WHERE rolname IN ('anon', 'authenticated') LOOP
+        EXECUTE format('REVOKE EXECUTE ON FUNCTION bulk_update_budgets(UUID, JSONB) FROM %I', role_name);
+        EXECUTE format('REVOKE EXECUTE ON FUNCTION bulk_update_cards(UUID, JSONB) FROM %I', role_name);
+    END LOOP;
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN
+        GRANT EXECUTE ON FUNCTION bulk_update_budgets(UUID, JSONB) TO service_role;
+        GRANT EXECUTE ON FUNCTION bulk_update_cards(UUID, JSONB) TO service_role;
+    END IF;
+END;
+$$;
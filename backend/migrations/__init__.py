@@ -0,0 +1 @@
+"""Numbered SQL migrations and the runner that applies them (see runner.py)"""
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Apply the numbered SQL migrations in this directory, in order.
+
+Each NNNN_name.sql file runs once, inside its own transaction, and is recorded
+in schema_migrations with a checksum. An advisory lock keeps concurrent
+deploys from applying the same migration twice. Connects to DATABASE_URL
+(the Supabase Postgres connection string, or a local Postgres).
+
+Requires psycopg 3 (pip install "psycopg[binary]"), which the app itself does
+not need.
+
+Usage:
+    python -m migrations.runner            # Apply pending migrations
+    python -m migrations.runner --status   # List applied and pending migrations
+    python -m migrations.runner --dry-run  # Show what would be applied
+"""
+
+import argparse
+import hashlib
+import re
+import sys
+from pathlib import Path
+
+MIGRATIONS_DIR = Path(__file__).parent
+MIGRATION_FILE_RE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+# Arbitrary constant shared by every runner so only one applies migrations at a time
+ADVISORY_LOCK_ID = 7265063
+
+def discover() -> list:
+    """Return (version, name, path) for every migration file, ordered by version"""
+    migrations = []
+    for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        match = MIGRATION_FILE_RE.match(path.name)
+        if match:
+            migrations.append((match.group(1), match.group(2), path))
+    versions = [version for version, _, _ in migrations]
+    duplicates = sorted({version for version in versions if versions.count(version) > 1})
+    if duplicates:
+        raise RuntimeError(f"Duplicate migration versions: {', '.join(duplicates)}")
+    return migrations
+
+def checksum(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+def connect(database_url: str = None):
+    """Open a psycopg connection to DATABASE_URL"""
+    try:
+        import psycopg
+    except ImportError:
+        raise RuntimeError('psycopg is required to run migrations: pip install "psycopg[binary]"')
+
+    if database_url is None:
+        from app.config.settings import settings
+        database_url = settings.DATABASE_URL
+    if not database_url:
+        raise RuntimeError("DATABASE_URL is not set")
+    return psycopg.connect(database_url)
+
+def ensure_migrations_table(conn):
+    with conn.transaction():
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                checksum TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+        """)
+
+def applied_migrations(conn) -> dict:
+    """Map of applied version -> checksum"""
+    rows = conn.execute("SELECT version, checksum FROM schema_migrations").fetchall()
+    return {version: digest for version, digest in rows}
+
+def pending_migrations(conn) -> list:
+    applied = applied_migrations(conn)
+    pending = []
+    for version, name, path in discover():
+        if version not in applied:
+            pending.append((version, name, path))
+        elif applied[version] != checksum(path):
+            print(f"WARNING: {path.name} changed after it was applied; edit migrations by adding a new one")
+    return pending
+
+def migrate(conn, dry_run: bool = False) -> list:
+    """Apply pending migrations; returns the versions applied"""
+    ensure_migrations_table(conn)
+    conn.execute("SELECT pg_advisory_lock(%s)", (ADVISORY_LOCK_ID,))
+    try:
+        applied = []
+        for version, name, path in pending_migrations(conn):
+            if dry_run:
+                print(f"DEBUG: Would apply {path.name}")
+                continue
+            print(f"DEBUG: Applying {path.name}")
+            with conn.transaction():
+                conn.execute(path.read_text())
+                conn.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                    (version, name, checksum(path))
+                )
+            applied.append(version)
+        return applied
+    finally:
+        conn.execute("SELECT pg_advisory_unlock(%s)", (ADVISORY_LOCK_ID,))
+
+def print_status(conn):
+    ensure_migrations_table(conn)
+    applied = applied_migrations(conn)
+    for version, name, path in discover():
+        state = "applied" if version in applied else "pending"
+        if version in applied and applied[version] != checksum(path):
+            state = "applied (modified since)"
+        print(f"{version}  {name:<40} {state}")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Apply TakeBack database migrations")
+    parser.add_argument("--status", action="store_true", help="List applied and pending migrations")
+    parser.add_argument("--dry-run", action="store_true", help="Show pending migrations without applying them")
+    parser.add_argument("--database-url", help="Override DATABASE_URL")
+    args = parser.parse_args(argv)
+
+    try:
+        with connect(args.database_url) as conn:
+            # Transactions are managed per migration
+            conn.autocommit = True
+            if args.status:
+                print_status(conn)
+            else:
+                applied = migrate(conn, dry_run=args.dry_run)
+                if not args.dry_run:
+                    print(f"DEBUG: Applied {len(applied)} migrations")
+        return 0
+    except Exception as e:
+        print(f"ERROR: Migration failed: {e}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
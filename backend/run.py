@@ -1,43 +1,153 @@
 #!/usr/bin/env python3
 """
-TakeBack Backend - Development Server Entry Point
-================================================
+TakeBack Backend - Server Entry Point
+=====================================
 
-This file serves as the primary entry point for running the TakeBack backend
-in development mode. It provides a clean interface for starting the FastAPI
-server with development-friendly settings.
+This file serves as the primary entry point for running the TakeBack backend.
+Development mode starts a single auto-reloading process; production mode
+starts one worker per available core without the reload watcher.
 
 Key Features:
 - Auto-reload enabled for development
+- Multi-worker production mode sized to the available cores
+- uvloop/httptools used automatically when installed
+- Keep-alive, backlog and graceful shutdown tuned from settings
 - Comprehensive error handling and debugging
 - Clear startup messages and status information
 - Proper exit codes for CI/CD integration
 
 Usage:
     python3 run.py                    # Start development server
+    python3 run.py --production       # Start production server (or APP_ENV=production)
     uvicorn app.main:app --reload    # Alternative direct command
+
+In production the app is preloaded once in a gunicorn master and forked into
+UvicornWorker processes when gunicorn is installed; otherwise uvicorn's own
+process manager is used and each worker imports the app itself. Either way
+the Supabase client is only created in the workers, by the app's lifespan,
+so no connection pool is shared across a fork.
 """
 
-import uvicorn
+import importlib.util
+import os
 import sys
 import traceback
 
-if __name__ == "__main__":
+import uvicorn
+
+from app.config.settings import settings
+
+APP = "app.main:app"
+
+def worker_count() -> int:
+    """Workers to start: WEB_CONCURRENCY, or one per core this process may use"""
+    if settings.WEB_CONCURRENCY > 0:
+        return settings.WEB_CONCURRENCY
+    try:
+        # Honours CPU affinity and container cpusets, unlike os.cpu_count()
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def event_loop_and_parser() -> tuple:
+    """Prefer uvloop and httptools, falling back to asyncio and h11"""
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    return loop, http
+
+def warn_per_worker_state(workers: int):
+    """Point out features whose state each worker keeps to itself"""
+    if workers <= 1:
+        return
+    if settings.RATE_LIMIT_ENABLED and settings.RATE_LIMIT_BACKEND == "local":
+        print(f"WARNING: RATE_LIMIT_BACKEND=local with {workers} workers; each worker enforces the limits "
+              f"on its own, so an account can reach {workers}x the configured rates. Set RATE_LIMIT_BACKEND=redis")
+    if settings.EVENTS_TRANSPORT == "local":
+        print(f"WARNING: EVENTS_TRANSPORT=local with {workers} workers; live updates only reach streams "
+              f"held by the worker that made the write. Set EVENTS_TRANSPORT=redis")
+    if settings.IDEMPOTENCY_BACKEND == "local":
+        print(f"WARNING: IDEMPOTENCY_BACKEND=local with {workers} workers; a retry routed to another worker "
+              f"repeats the write. Set IDEMPOTENCY_BACKEND=database")
+
+def run_development():
+    print("=== Starting TakeBack Backend Server ===")
+    print(f"DEBUG: Server will run on http://{settings.HOST}:{settings.PORT}")
+    print(f"DEBUG: API documentation will be available at http://localhost:{settings.PORT}/docs")
+
+    # Start the FastAPI server with development settings
+    # - reload=True: Enable auto-reload when code changes (development only)
+    # - "app.main:app": Import the FastAPI app from app.main module
+    uvicorn.run(APP, host=settings.HOST, port=settings.PORT, reload=True)
+
+def run_gunicorn(workers: int):
+    """Preload the app in a gunicorn master and fork UvicornWorkers from it"""
+    from gunicorn.app.base import BaseApplication
+
+    class TakeBackApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{settings.HOST}:{settings.PORT}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("worker_class", "uvicorn.workers.UvicornWorker")
+            self.cfg.set("preload_app", True)
+            self.cfg.set("keepalive", settings.KEEPALIVE_TIMEOUT)
+            self.cfg.set("backlog", settings.SERVER_BACKLOG)
+            self.cfg.set("graceful_timeout", settings.GRACEFUL_TIMEOUT)
+            # UvicornWorker passes this on to uvicorn, which reads proxy headers by default
+            self.cfg.set("forwarded_allow_ips", settings.FORWARDED_ALLOW_IPS)
+            if settings.MAX_REQUESTS > 0:
+                self.cfg.set("max_requests", settings.MAX_REQUESTS)
+                self.cfg.set("max_requests_jitter", max(1, settings.MAX_REQUESTS // 10))
+
+        def load(self):
+            from app.main import app
+            return app
+
+    TakeBackApplication().run()
+
+def run_production():
+    workers = worker_count()
+    loop, http = event_loop_and_parser()
+    server = "gunicorn" if importlib.util.find_spec("gunicorn") else "uvicorn"
+
+    print("=== Starting TakeBack Backend Server (production) ===")
+    print(f"DEBUG: Server will run on http://{settings.HOST}:{settings.PORT}")
+    print(f"DEBUG: {workers} {server} workers, loop={loop}, http={http}")
+    print(f"DEBUG: Trusting forwarded client addresses from {settings.FORWARDED_ALLOW_IPS}")
+    warn_per_worker_state(workers)
+
+    if server == "gunicorn":
+        # UvicornWorker picks uvloop/httptools itself when they are installed
+        run_gunicorn(workers)
+        return
+
+    uvicorn.run(
+        APP,
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=workers,
+        loop=loop,
+        http=http,
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.KEEPALIVE_TIMEOUT,
+        timeout_graceful_shutdown=settings.GRACEFUL_TIMEOUT,
+        limit_max_requests=settings.MAX_REQUESTS or None,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.FORWARDED_ALLOW_IPS
+    )
+
+def main():
+    production = "--production" in sys.argv[1:] or settings.APP_ENV == "production"
     try:
-        # Display startup information
-        print("=== Starting TakeBack Backend Server ===")
-        print(f"DEBUG: Server will run on http://0.0.0.0:8000")
-        print(f"DEBUG: API documentation will be available at http://localhost:8000/docs")
-        
-        # Start the FastAPI server with development settings
-        # - host="0.0.0.0": Bind to all network interfaces (accessible from other devices)
-        # - port=8000: Standard development port
-        # - reload=True: Enable auto-reload when code changes (development only)
-        # - "app.main:app": Import the FastAPI app from app.main module
-        uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
-        
+        if production:
+            run_production()
+        else:
+            run_development()
+
     except Exception as e:
-        # Comprehensive error handling for development debugging
+        # Comprehensive error handling for debugging
         print(f"DEBUG: Failed to start server: {e}")
         traceback.print_exc()  # Print full stack trace for debugging
-        sys.exit(1)  # Exit with error code for CI/CD systems 
\ No newline at end of file
+        sys.exit(1)  # Exit with error code for CI/CD systems
+
+if __name__ == "__main__":
+    main()
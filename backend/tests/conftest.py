@@ -0,0 +1,12 @@
+import pytest
+
+from app.config import database
+from fakes import FakeSupabase
+
+@pytest.fixture
+def db(monkeypatch):
+    """A FakeSupabase installed as the app's client for one test"""
+    fake = FakeSupabase()
+    monkeypatch.setattr(database, "_client", fake)
+    monkeypatch.setattr(database, "_initialized", True)
+    return fake
@@ -0,0 +1,340 @@
+"""In-memory stand-ins for Supabase, enough for service-level tests"""
+
+import copy
+import uuid
+from types import SimpleNamespace
+
+class PostgrestError(Exception):
+    """Shaped like postgrest's APIError: a SQLSTATE code and a message"""
+
+    def __init__(self, code: str, message: str = ""):
+        super().__init__(message or code)
+        self.code = code
+        self.message = message or code
+
+class FakeQuery:
+    def __init__(self, db, table: str):
+        self.db = db
+        self.table = table
+        self.action = "select"
+        self.columns = "*"
+        self.payload = None
+        self.filters = []
+        self.ordering = []
+        self.bounds = None
+        self.limit_count = None
+
+    def select(self, columns="*", count=None):
+        self.columns = columns
+        return self
+
+    def insert(self, payload):
+        self.action, self.payload = "insert", payload
+        return self
+
+    def update(self, payload):
+        self.action, self.payload = "update", payload
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and str(row[column]) >= str(value))
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and str(row[column]) < str(value))
+        return self
+
+    def order(self, column, desc=False):
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.limit_count = count
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end)
+        return self
+
+    def _project(self, row):
+        if self.columns.strip() == "*":
+            return dict(row)
+        return {column.strip(): row.get(column.strip()) for column in self.columns.split(",")}
+
+    def execute(self):
+        self.db.queries.append((self.table, self.action))
+        error = self.db.errors.get(self.table)
+        if error is not None:
+            raise error
+        rows = self.db.tables.setdefault(self.table, [])
+        if self.action == "insert":
+            inserted = []
+            for item in self.payload if isinstance(self.payload, list) else [self.payload]:
+                row = {"id": str(uuid.uuid4()), "created_at": "2025-01-01T00:00:00+00:00",
+                       **self.db.defaults.get(self.table, {}), **copy.deepcopy(item)}
+                rows.append(row)
+                inserted.append(dict(row))
+            return SimpleNamespace(data=inserted)
+
+        matched = [row for row in rows if all(f(row) for f in self.filters)]
+        if self.action == "update":
+            for row in matched:
+                row.update(copy.deepcopy(self.payload))
+            return SimpleNamespace(data=[dict(row) for row in matched])
+        if self.action == "delete":
+            self.db.tables[self.table] = [row for row in rows if row not in matched]
+            return SimpleNamespace(data=[dict(row) for row in matched])
+
+        for column, desc in reversed(self.ordering):
+            matched.sort(key=lambda row: (row.get(column) is None, row.get(column) or ""), reverse=desc)
+        if self.bounds:
+            matched = matched[self.bounds[0]:self.bounds[1] + 1]
+        if self.limit_count is not None:
+            matched = matched[:self.limit_count]
+        return SimpleNamespace(data=[self._project(row) for row in matched])
+
+class FakeRpc:
+    def __init__(self, db, name: str, params: dict):
+        self.db = db
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        self.db.queries.append(("rpc", self.name))
+        return SimpleNamespace(data=self.db.functions[self.name](self.db, self.params))
+
+class FakeSupabase:
+    """Tables are lists of row dicts; database functions are registered in
+    functions by name and called with (db, params); errors[table] makes every
+    query on that table raise; defaults holds column defaults for inserts"""
+
+    def __init__(self):
+        self.tables = {}
+        self.defaults = {"cards": {"balance": 0}}
+        self.functions = {}
+        self.errors = {}
+        self.queries = []
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: dict) -> FakeRpc:
+        return FakeRpc(self, name, params)
+
+    def count(self, table: str, action: str = "select") -> int:
+        return self.queries.count((table, action))
+
+def new_id() -> str:
+    return str(uuid.uuid4())
+
+def seed_account(db, periods=("monthly",), cards=1, limit_amount=1000.0) -> SimpleNamespace:
+    """One account with cards x budgets all associated; returns their IDs.
+
+    Accounts get fresh UUIDs, so per-account caches never leak between tests.
+    """
+    account_id = new_id()
+    card_ids = [new_id() for _ in range(cards)]
+    budget_ids = [new_id() for _ in periods]
+    db.tables.setdefault("cards", []).extend(
+        {"id": card_id, "account_id": account_id, "name": f"Card {i}", "status": "issued", "balance": 0,
+         "cardholder_name": "A Holder", "cvv": "123", "expiry": "12/30", "zipcode": "00000", "address": "1 Street",
+         "created_at": "2025-01-01T00:00:00+00:00"}
+        for i, card_id in enumerate(card_ids)
+    )
+    db.tables.setdefault("budgets", []).extend(
+        {"id": budget_id, "account_id": account_id, "name": f"Budget {i}", "limit_amount": limit_amount,
+         "period": period, "require_receipts": False, "created_at": "2025-01-01T00:00:00+00:00"}
+        for i, (budget_id, period) in enumerate(zip(budget_ids, periods))
+    )
+    card_budget_ids = {}
+    for card_id in card_ids:
+        for budget_id in budget_ids:
+            card_budget_id = new_id()
+            card_budget_ids[(card_id, budget_id)] = card_budget_id
+            db.tables.setdefault("card_budgets", []).append(
+                {"id": card_budget_id, "account_id": account_id, "card_id": card_id, "budget_id": budget_id,
+                 "created_at": "2025-01-01T00:00:00+00:00"}
+            )
+    return SimpleNamespace(account_id=account_id, card_ids=card_ids, budget_ids=budget_ids, card_budget_ids=card_budget_ids)
+
+def add_transaction(db, account, card_budget_id: str, amount: float, days_ago: float = 0, table: str = "transactions", **fields) -> dict:
+    """Insert a transaction row dated days_ago, as create_transaction() would"""
+    from datetime import datetime, timedelta
+
+    row = {
+        "id": new_id(), "account_id": account.account_id, "card_budget_id": card_budget_id, "amount": amount,
+        "name": fields.pop("name", "Purchase"), "description": None, "category": None, "merchant": None,
+        "receipt_id": None, "date": (datetime.utcnow() - timedelta(days=days_ago)).isoformat(),
+        "created_at": "2025-01-01T00:00:00+00:00", **fields,
+    }
+    db.tables.setdefault(table, []).append(row)
+    return row
+
+def running_totals(db) -> tuple:
+    """Card balances and daily spend as summed from the transactions"""
+    card_budgets = {cb["id"]: cb for cb in db.tables.get("card_budgets", [])}
+    balances = {}
+    daily = {}
+    for table in ("transactions", "transactions_archive"):
+        for row in db.tables.get(table, []):
+            card_budget = card_budgets[row["card_budget_id"]]
+            balances[card_budget["card_id"]] = balances.get(card_budget["card_id"], 0) + row["amount"]
+            key = (row["card_budget_id"], row["account_id"], row["date"][:10])
+            daily[key] = daily.get(key, 0) + row["amount"]
+    return balances, daily
+
+def refresh_running_totals(db):
+    """Recompute cards.balance and card_budget_daily_spend from the
+    transactions, as the triggers of migrations/0004 keep them"""
+    balances, daily = running_totals(db)
+    for card in db.tables.get("cards", []):
+        card["balance"] = balances.get(card["id"], 0)
+    db.tables["card_budget_daily_spend"] = [
+        {"card_budget_id": card_budget_id, "account_id": account_id, "day": day, "amount": amount}
+        for (card_budget_id, account_id, day), amount in daily.items()
+    ]
+
+def bump_entity_version(db, account_id: str):
+    """What the triggers of migrations/0011 do on a card, budget or card_budget write"""
+    rows = db.tables.setdefault("entity_versions", [])
+    for row in rows:
+        if row["account_id"] == account_id:
+            row["version"] += 1
+            return
+    rows.append({"account_id": account_id, "version": 1})
+
+BUDGET_WINDOW_DAYS = {"weekly": 7, "quarterly": 90}
+
+def create_transaction(db, params: dict) -> list:
+    """create_transaction() of migrations/0007: check the card and budget, then insert"""
+    from datetime import datetime, timedelta
+
+    card_budget = next((cb for cb in db.tables.get("card_budgets", [])
+                        if cb["id"] == params["p_card_budget_id"] and cb["account_id"] == params["p_account_id"]), None)
+    if card_budget is None:
+        raise PostgrestError("P0002", "card_budget_not_found")
+    card = next(c for c in db.tables["cards"] if c["id"] == card_budget["card_id"])
+    budget = next(b for b in db.tables["budgets"] if b["id"] == card_budget["budget_id"])
+    if card["status"] in ("frozen", "cancelled"):
+        raise PostgrestError("23514", f"card_{card['status']}")
+
+    date = params.get("p_date") or datetime.utcnow().isoformat()
+    if params["p_amount"] > 0:
+        start = (datetime.fromisoformat(date[:10]) - timedelta(days=BUDGET_WINDOW_DAYS.get(budget["period"], 30))).date().isoformat()
+        spent = sum(row["amount"] for row in db.tables.get("card_budget_daily_spend", [])
+                    if row["card_budget_id"] == card_budget["id"] and start <= row["day"] <= date[:10])
+        if spent + params["p_amount"] > budget["limit_amount"]:
+            raise PostgrestError("23514", "insufficient_budget")
+
+    row = {
+        "id": new_id(), "account_id": params["p_account_id"], "card_budget_id": card_budget["id"],
+        "amount": params["p_amount"], "name": params["p_name"], "date": date,
+        "description": params.get("p_description"), "category": params.get("p_category"),
+        "merchant": None, "receipt_id": params.get("p_receipt_id"), "created_at": "2025-01-01T00:00:00+00:00",
+    }
+    db.tables.setdefault("transactions", []).append(row)
+    refresh_running_totals(db)
+    return [dict(row)]
+
+def create_receipt(db, params: dict) -> list:
+    """create_receipt() of migrations/0005: insert the receipt and link its transaction"""
+    from datetime import datetime
+
+    receipt = {
+        "id": new_id(), "account_id": params["p_account_id"], "name": params["p_name"], "type": params["p_type"],
+        "description": params.get("p_description"), "amount": params.get("p_amount"), "url": params["p_url"],
+        "date_of_purchase": params.get("p_date_of_purchase") or datetime.utcnow().isoformat(),
+        "date_added": datetime.utcnow().isoformat(),
+    }
+    if params.get("p_transaction_id"):
+        # Both writes commit together, so a missing transaction leaves no receipt behind
+        linked = [row for table in ("transactions", "transactions_archive") for row in db.tables.get(table, [])
+                  if row["id"] == params["p_transaction_id"] and row["account_id"] == params["p_account_id"]]
+        if not linked:
+            raise PostgrestError("P0002", f"Transaction {params['p_transaction_id']} not found")
+        linked[0]["receipt_id"] = receipt["id"]
+    db.tables.setdefault("receipts", []).append(receipt)
+    return [dict(receipt)]
+
+def archive_transactions(db, params: dict) -> int:
+    """archive_transactions() of migrations/0001: move one batch past the horizon"""
+    from datetime import datetime, timedelta
+
+    horizon = (datetime.utcnow() - timedelta(days=params["horizon_days"])).isoformat()
+    hot = db.tables.setdefault("transactions", [])
+    moved = sorted((row for row in hot if row["date"] < horizon), key=lambda row: row["date"])[:params["batch_size"]]
+    db.tables["transactions"] = [row for row in hot if row not in moved]
+    db.tables.setdefault("transactions_archive", []).extend(moved)
+    return len(moved)
+
+def update_archived_transaction(db, params: dict) -> list:
+    """update_archived_transaction() of migrations/0009: update in place, or
+    move the row back to the hot table when its new date is inside the horizon"""
+    from datetime import datetime, timedelta
+
+    archive = db.tables.setdefault("transactions_archive", [])
+    row = next((row for row in archive
+                if row["id"] == params["p_transaction_id"] and row["account_id"] == params["p_account_id"]), None)
+    if row is None:
+        return []
+    row.update({column[2:]: value for column, value in params.items()
+                if column not in ("p_account_id", "p_transaction_id", "p_horizon_days")})
+    if row["date"] >= (datetime.utcnow() - timedelta(days=params["p_horizon_days"])).isoformat():
+        archive.remove(row)
+        db.tables.setdefault("transactions", []).append(row)
+    return [dict(row)]
+
+def bulk_update(table: str, not_owned: str):
+    """bulk_update_budgets() / bulk_update_cards() of migrations/0013: refuse
+    the batch if any row belongs to another account, else update the rest"""
+    def update(db, params: dict) -> list:
+        rows = {row["id"]: row for row in db.tables.get(table, [])}
+        if any(item["id"] in rows and rows[item["id"]]["account_id"] != params["p_account_id"] for item in params["p_rows"]):
+            raise PostgrestError("42501", not_owned)
+        updated = []
+        for item in params["p_rows"]:
+            if item["id"] in rows:
+                rows[item["id"]].update(copy.deepcopy(item))
+                updated.append(dict(rows[item["id"]]))
+        return updated
+    return update
+
+def reconcile_card_balances(db, params: dict) -> list:
+    """reconcile_card_balances() of migrations/0004: repair one chunk of cards, in ID order"""
+    ids = sorted(card["id"] for card in db.tables.get("cards", [])
+                 if params["after_id"] is None or card["id"] > params["after_id"])[:params["batch_size"]]
+    if not ids:
+        return [{"last_id": None, "checked": 0, "repaired_balances": 0, "repaired_days": 0}]
+    balances, daily = running_totals(db)
+    repaired_balances = 0
+    for card in db.tables["cards"]:
+        if card["id"] in ids and card["balance"] != balances.get(card["id"], 0):
+            card["balance"] = balances.get(card["id"], 0)
+            repaired_balances += 1
+
+    chunk = {cb["id"] for cb in db.tables.get("card_budgets", []) if cb["card_id"] in ids}
+    stored = {(row["card_budget_id"], row["account_id"], row["day"]): row["amount"]
+              for row in db.tables.get("card_budget_daily_spend", []) if row["card_budget_id"] in chunk}
+    actual = {key: amount for key, amount in daily.items() if key[0] in chunk}
+    # Zero rows left behind by deletes are not drift
+    repaired_days = sum(1 for key in set(stored) | set(actual) if stored.get(key, 0) != actual.get(key, 0))
+    db.tables["card_budget_daily_spend"] = [
+        row for row in db.tables.get("card_budget_daily_spend", []) if row["card_budget_id"] not in chunk
+    ] + [
+        {"card_budget_id": card_budget_id, "account_id": account_id, "day": day, "amount": amount}
+        for (card_budget_id, account_id, day), amount in actual.items()
+    ]
+    return [{"last_id": ids[-1], "checked": len(ids), "repaired_balances": repaired_balances, "repaired_days": repaired_days}]
@@ -0,0 +1,80 @@
+import asyncio
+from types import SimpleNamespace
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.api import auth
+from app.config.settings import settings
+from app.services.analytics_service import AnalyticsService
+from app.services.authorization_service import period_spend_cache
+from app.utils.cache import invalidate_account
+from fakes import add_transaction, refresh_running_totals, seed_account
+
+def gather(*calls):
+    async def main():
+        return await asyncio.gather(*calls, return_exceptions=True)
+    return asyncio.run(main())
+
+def test_concurrent_duplicate_requests_share_one_computation(db):
+    account = seed_account(db)
+    add_transaction(db, account, account.card_budget_ids[(account.card_ids[0], account.budget_ids[0])], 25.0)
+    refresh_running_totals(db)
+
+    results = gather(*(AnalyticsService.get_balances(account.account_id, "month") for _ in range(3)))
+    assert all(result is results[0] for result in results)
+    assert results[0].total_spent == 25.0
+    assert db.count("budgets") == 1
+
+    # Another period or endpoint is its own computation
+    gather(AnalyticsService.get_balances(account.account_id, "week"), AnalyticsService.get_spending_analytics(account.account_id, "month"))
+    assert db.count("card_budget_daily_spend") == 3
+
+def test_results_are_kept_until_the_account_writes(db):
+    account = seed_account(db)
+    first = asyncio.run(AnalyticsService.get_balances(account.account_id))
+    assert asyncio.run(AnalyticsService.get_balances(account.account_id)) is first
+
+    invalidate_account(account.account_id)
+    assert asyncio.run(AnalyticsService.get_balances(account.account_id)) is not first
+    assert db.count("card_budget_daily_spend") == 2
+
+def test_failures_reach_every_caller_and_are_not_kept(db):
+    account = seed_account(db)
+    db.errors["card_budget_daily_spend"] = RuntimeError("connection reset")
+
+    results = gather(*(AnalyticsService.get_balances(account.account_id) for _ in range(2)))
+    assert [r.status_code for r in results if isinstance(r, HTTPException)] == [400, 400]
+    assert db.count("card_budget_daily_spend") == 1
+
+    del db.errors["card_budget_daily_spend"]
+    assert asyncio.run(AnalyticsService.get_balances(account.account_id)).total_spent == 0
+
+def test_login_warms_the_dashboard_and_spend_totals(db, monkeypatch):
+    account = seed_account(db)
+    db.tables["accounts"] = [{"id": account.account_id, "first_name": "A", "last_name": "Holder"}]
+    db.auth = SimpleNamespace(sign_in_with_password=lambda credentials: SimpleNamespace(user=SimpleNamespace(id=account.account_id)))
+    monkeypatch.setattr(settings, "LOGIN_WARMUP_TTL", 30)
+    app = FastAPI()
+    app.include_router(auth.router)
+
+    # The warm-up runs as a background task once the response is sent
+    response = TestClient(app).post("/api/auth/login", json={"email": "a@example.com", "password": "secret"})
+    assert response.status_code == 200
+    assert db.count("card_budget_daily_spend") == 2
+    card_budget_id = account.card_budget_ids[(account.card_ids[0], account.budget_ids[0])]
+    assert period_spend_cache.get((account.account_id, "spend", card_budget_id)) == 0
+
+    # The first dashboard after sign-in is served without a query
+    db.queries.clear()
+    asyncio.run(AnalyticsService.get_dashboard(account.account_id))
+    assert db.queries == []
+
+def test_failed_warm_up_is_ignored(db):
+    account = seed_account(db)
+    db.errors["cards"] = RuntimeError("connection reset")
+    asyncio.run(AnalyticsService.warm_account(account.account_id))
+
+    # Nothing failed was kept, so the dashboard loads cold once the database is back
+    del db.errors["cards"]
+    assert len(asyncio.run(AnalyticsService.get_dashboard(account.account_id)).cards) == 1
@@ -0,0 +1,79 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from app.config.settings import settings
+from app.models.transaction import TransactionCreate
+from app.services.archive_service import ArchiveService
+from app.services.transaction_service import TransactionService
+from fakes import add_transaction, archive_transactions, seed_account, update_archived_transaction
+
+@pytest.fixture
+def account(db, monkeypatch):
+    monkeypatch.setattr(settings, "TRANSACTION_ARCHIVE_DAYS", 365)
+    db.functions["archive_transactions"] = archive_transactions
+    db.functions["update_archived_transaction"] = update_archived_transaction
+    account = seed_account(db, cards=2)
+    account.card_budget_id = account.card_budget_ids[(account.card_ids[0], account.budget_ids[0])]
+    return account
+
+def listed(account, **filters):
+    return asyncio.run(TransactionService.get_transactions(account.account_id, **filters))
+
+def test_list_is_newest_first_across_tables_and_pages(db, account, monkeypatch):
+    fetch_all = ArchiveService.fetch_all
+    monkeypatch.setattr(ArchiveService, "fetch_all", staticmethod(lambda build_query: fetch_all(build_query, page_size=2)))
+    other = account.card_budget_ids[(account.card_ids[1], account.budget_ids[0])]
+    rows = [
+        add_transaction(db, account, account.card_budget_id, 1.0, days_ago=3),
+        add_transaction(db, account, account.card_budget_id, 2.0, days_ago=1),
+        add_transaction(db, account, other, 3.0, days_ago=400),
+        add_transaction(db, account, account.card_budget_id, 4.0, days_ago=700, table="transactions_archive"),
+        add_transaction(db, account, other, 5.0, days_ago=500, table="transactions_archive"),
+    ]
+    # Two on the same date, ordered by id
+    tie = add_transaction(db, account, other, 6.0, date=rows[0]["date"])
+
+    result = listed(account)
+    expected = sorted(rows + [tie], key=lambda row: (row["date"], row["id"]), reverse=True)
+    assert [t.id for t in result] == [row["id"] for row in expected]
+    # The row past the horizon that is still in the hot table sorts among the archived ones
+    assert [t.amount for t in result][3:] == [3.0, 5.0, 4.0]
+
+    assert [t.amount for t in listed(account, card_id=account.card_ids[1])] == [6.0, 3.0, 5.0]
+
+def test_archive_job_moves_rows_past_the_horizon_in_batches(db, account):
+    for days_ago in (10, 400, 500, 600):
+        add_transaction(db, account, account.card_budget_id, 1.0, days_ago=days_ago)
+    assert ArchiveService.archive_old_transactions(batch_size=2) == 3
+    assert db.count("rpc", "archive_transactions") == 2
+    assert len(db.tables["transactions"]) == 1
+    assert len(db.tables["transactions_archive"]) == 3
+    # Everything is still listed
+    assert len(listed(account)) == 4
+
+def update(account, transaction_id, **fields):
+    transaction = TransactionCreate(card_budget_id=account.card_budget_id, amount=9.0, name="Edited", **fields)
+    return asyncio.run(TransactionService.update_transaction(account.account_id, transaction_id, transaction))
+
+def test_updating_an_archived_transaction(db, account):
+    archived = add_transaction(db, account, account.card_budget_id, 1.0, days_ago=500, table="transactions_archive")
+
+    # Still before the horizon: updated where it is
+    result = update(account, archived["id"], date=archived["date"])
+    assert (result.id, result.name, result.amount) == (archived["id"], "Edited", 9.0)
+    assert [row["id"] for row in db.tables["transactions_archive"]] == [archived["id"]]
+
+    # Redated inside the horizon: moved back to the hot table in the same call
+    result = update(account, archived["id"])
+    assert db.tables["transactions_archive"] == []
+    assert [row["id"] for row in db.tables["transactions"]] == [archived["id"]]
+    assert db.count("rpc", "update_archived_transaction") == 2
+
+def test_reads_inside_the_horizon_skip_the_archive(db, account):
+    since = ArchiveService.horizon() + timedelta(days=1)
+    assert ArchiveService.tables_for(since) == ["transactions"]
+    assert ArchiveService.tables_for() == ["transactions", "transactions_archive"]
+    ArchiveService.select_transactions("*", account.account_id, since=since)
+    assert db.count("transactions_archive") == 0
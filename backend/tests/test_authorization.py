@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.config.settings import settings
+from app.models.transaction import TransactionCreate
+from app.services.authorization_service import AuthorizationService, period_spend_cache
+from app.services.transaction_service import TransactionService
+from fakes import FakeQuery, add_transaction, create_transaction, refresh_running_totals, seed_account
+
+def authorize(account, card_budget_id, amount):
+    return asyncio.run(AuthorizationService.authorize(account.account_id, card_budget_id, amount))
+
+@pytest.fixture
+def account(db):
+    account = seed_account(db, limit_amount=100.0)
+    account.card_budget_id = next(iter(account.card_budget_ids.values()))
+    add_transaction(db, account, account.card_budget_id, 60.0, days_ago=2)
+    # Outside the monthly window
+    add_transaction(db, account, account.card_budget_id, 500.0, days_ago=45)
+    refresh_running_totals(db)
+    return account
+
+def test_approves_within_the_remaining_budget(account):
+    decision = authorize(account, account.card_budget_id, 30.0)
+    assert (decision.approved, decision.decision, decision.reason) == (True, "approve", None)
+    assert (decision.limit_amount, decision.spent_amount, decision.remaining_amount) == (100.0, 60.0, 10.0)
+
+def test_declines_past_the_remaining_budget(account):
+    decision = authorize(account, account.card_budget_id, 50.0)
+    assert (decision.approved, decision.reason) == (False, "insufficient_budget")
+    assert decision.remaining_amount == 40.0
+    # Refunds never exceed the budget
+    assert authorize(account, account.card_budget_id, -500.0).approved
+
+def test_declines_frozen_cards_and_unknown_card_budgets(db, account):
+    db.tables["cards"][0]["status"] = "frozen"
+    assert authorize(account, account.card_budget_id, 1.0).reason == "card_frozen"
+    assert authorize(account, "no-such-card-budget", 1.0).reason == "card_budget_not_found"
+
+def test_cold_account_is_warmed_before_the_latency_budget(db, account, monkeypatch):
+    # Every query takes 40ms: a cold decision needs five, a warm one only the version check
+    execute = FakeQuery.execute
+
+    def slow_execute(self):
+        time.sleep(0.04)
+        return execute(self)
+    monkeypatch.setattr(FakeQuery, "execute", slow_execute)
+    monkeypatch.setattr(settings, "AUTHORIZATION_TIMEOUT_MS", 120)
+
+    decision = authorize(account, account.card_budget_id, 30.0)
+    assert decision.approved and decision.reason is None
+    assert period_spend_cache.get((account.account_id, "spend", account.card_budget_id)) == 60.0
+
+@pytest.mark.parametrize("fail_open", [False, True])
+def test_timeout_falls_back_to_the_configured_decision(account, monkeypatch, fail_open):
+    monkeypatch.setattr(settings, "AUTHORIZATION_TIMEOUT_MS", 20)
+    monkeypatch.setattr(settings, "AUTHORIZATION_FAIL_OPEN", fail_open)
+    AuthorizationService.warm_spend(account.account_id)
+    decide = AuthorizationService._decide
+
+    def slow_decide(*args):
+        time.sleep(0.1)
+        return decide(*args)
+    monkeypatch.setattr(AuthorizationService, "_decide", staticmethod(slow_decide))
+
+    decision = authorize(account, account.card_budget_id, 1.0)
+    assert (decision.approved, decision.reason) == (fail_open, "authorization_timeout")
+
+def create(account, card_budget_id, amount):
+    transaction = TransactionCreate(card_budget_id=card_budget_id, amount=amount, name="Purchase")
+    return asyncio.run(TransactionService.create_transaction(account.account_id, transaction))
+
+def test_create_declines_with_403(db, account):
+    db.functions["create_transaction"] = create_transaction
+
+    created = create(account, account.card_budget_id, 40.0)
+    assert created.amount == 40.0 and created.card_id == account.card_ids[0]
+
+    with pytest.raises(HTTPException) as e:
+        create(account, account.card_budget_id, 0.01)
+    assert (e.value.status_code, e.value.detail) == (403, "Transaction declined: insufficient_budget")
+
+    db.tables["cards"][0]["status"] = "cancelled"
+    with pytest.raises(HTTPException) as e:
+        create(account, account.card_budget_id, -5.0)
+    assert (e.value.status_code, e.value.detail) == (403, "Transaction declined: card_cancelled")
+
+    with pytest.raises(HTTPException) as e:
+        create(account, "no-such-card-budget", 1.0)
+    assert (e.value.status_code, e.value.detail) == (403, "Card-Budget combination not found")
+    assert len(db.tables["transactions"]) == 3
@@ -0,0 +1,54 @@
+import asyncio
+
+from app.models.transaction import TransactionCreate
+from app.services.card_service import CardService
+from app.services.transaction_service import TransactionService
+from fakes import add_transaction, create_transaction, reconcile_card_balances, refresh_running_totals, seed_account
+from jobs import reconcile_balances
+
+def test_card_balance_reads_the_running_totals(db):
+    db.functions["create_transaction"] = create_transaction
+    account = seed_account(db, periods=("monthly", "weekly"))
+    card_id = account.card_ids[0]
+    monthly, weekly = (account.card_budget_ids[(card_id, budget_id)] for budget_id in account.budget_ids)
+    add_transaction(db, account, monthly, 100.0, days_ago=60)
+    add_transaction(db, account, weekly, 7.5, days_ago=10)
+    refresh_running_totals(db)
+    # Created through the database function, which keeps the totals as it inserts
+    asyncio.run(TransactionService.create_transaction(account.account_id, TransactionCreate(card_budget_id=monthly, amount=20.0, name="Lunch")))
+    db.queries.clear()
+
+    balance = asyncio.run(CardService.get_card_balance(account.account_id, card_id, "month"))
+
+    # Every transaction counts toward the balance, only the period's toward spend
+    assert balance.balance == 127.5
+    assert balance.total_spent == 27.5
+    assert {b.budget_id: b.spent_amount for b in balance.budget_balances} == dict(zip(account.budget_ids, (20.0, 7.5)))
+    # Read from cards.balance and the daily totals, never from the transactions
+    assert db.count("transactions") == 0
+    assert db.count("card_budget_daily_spend") == 1
+
+def test_reconcile_repairs_drift_chunk_by_chunk(db, monkeypatch, capsys):
+    db.functions["reconcile_card_balances"] = reconcile_card_balances
+    account = seed_account(db, cards=5)
+    for i, card_id in enumerate(account.card_ids):
+        add_transaction(db, account, account.card_budget_ids[(card_id, account.budget_ids[0])], 10.0 * (i + 1), days_ago=i)
+    refresh_running_totals(db)
+    # Drift: a balance edited by hand and a day's total lost
+    db.tables["cards"][1]["balance"] = 999
+    lost = db.tables["card_budget_daily_spend"].pop(3)
+    monkeypatch.setattr(reconcile_balances, "init_supabase_client", lambda: True)
+    monkeypatch.setattr(reconcile_balances, "close_supabase_client", lambda: None)
+
+    assert reconcile_balances.main(["--batch-size", "2"]) == 0
+
+    assert db.count("rpc", "reconcile_card_balances") == 4
+    out = capsys.readouterr().out
+    assert "Checked 2 cards" in out and "Checked 4 cards" in out
+    assert "Checked 5 cards, repaired 1 balances and 1 daily totals" in out
+    assert sorted(card["balance"] for card in db.tables["cards"]) == [10.0, 20.0, 30.0, 40.0, 50.0]
+    assert lost in db.tables["card_budget_daily_spend"]
+
+    # Nothing left to repair on a second run
+    assert reconcile_balances.main([]) == 0
+    assert "repaired 0 balances and 0 daily totals" in capsys.readouterr().out
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from app.models.budget import BudgetBulkRequest, BudgetBulkResult, BudgetBulkUpdate, BudgetCreate
+from app.models.card import CardBulkRequest, CardBulkUpdate, CardCreate
+from app.services.budget_service import BudgetService
+from app.services.card_service import CardService
+from app.utils.bulk import duplicate_ids, is_uuid, sort_results
+from fakes import bulk_update, new_id, seed_account
+
+@pytest.mark.parametrize("value, expected", [
+    ("5f0c2a9e-8f7b-4a61-9d0e-1b2c3d4e5f60", True),
+    ("5F0C2A9E8F7B4A619D0E1B2C3D4E5F60", True),
+    ("not-a-uuid", False),
+    ("", False),
+    (None, False),
+])
+def test_is_uuid(value, expected):
+    assert is_uuid(value) is expected
+
+def test_duplicate_ids():
+    assert duplicate_ids(["a", "b", "a", "c", "b", "a"]) == {"a", "b"}
+    assert duplicate_ids(["a", "b"]) == set()
+    assert duplicate_ids([]) == set()
+
+def test_sort_results_by_operation_then_index():
+    results = [
+        BudgetBulkResult(operation="delete", index=0, status="deleted"),
+        BudgetBulkResult(operation="update", index=1, status="updated"),
+        BudgetBulkResult(operation="create", index=1, status="created"),
+        BudgetBulkResult(operation="update", index=0, status="invalid"),
+        BudgetBulkResult(operation="create", index=0, status="failed"),
+    ]
+    sort_results(results)
+    assert [(r.operation, r.index) for r in results] == [
+        ("create", 0), ("create", 1), ("update", 0), ("update", 1), ("delete", 0),
+    ]
+
+def test_budget_validation():
+    budget = BudgetCreate(name="Travel", limit_amount=100, period="monthly")
+    assert BudgetService._validate(budget) is None
+    assert "period must be one of" in BudgetService._validate(budget.model_copy(update={"period": "yearly"}))
+
+def test_card_validation():
+    card = CardCreate(name="Card", cardholder_name="A", cvv="123", expiry="12/30", zipcode="00000", address="Street")
+    assert CardService._validate(card) is None
+    assert "status must be one of" in CardService._validate(card.model_copy(update={"status": "lost"}))
+
+def bulk_budgets(account, *updates):
+    request = BudgetBulkRequest(update=[
+        BudgetBulkUpdate(id=budget_id, name=name, limit_amount=100, period="monthly") for budget_id, name in updates
+    ])
+    return asyncio.run(BudgetService.bulk_budgets(account.account_id, request)).results
+
+def test_bulk_update_refuses_rows_of_another_account(db):
+    db.functions["bulk_update_budgets"] = bulk_update("budgets", "budget_not_owned")
+    account, other = seed_account(db), seed_account(db)
+    own, theirs = account.budget_ids[0], other.budget_ids[0]
+
+    results = bulk_budgets(account, (own, "Mine"), (new_id(), "Missing"))
+    assert [(r.status, r.budget and r.budget.name) for r in results] == [("updated", "Mine"), ("not_found", None)]
+
+    results = bulk_budgets(account, (own, "Again"), (theirs, "Taken"))
+    assert [r.status for r in results] == ["failed", "failed"]
+    assert results[0].error == "Update includes a budget of another account; nothing was updated"
+    names = {budget["id"]: budget["name"] for budget in db.tables["budgets"]}
+    assert (names[own], names[theirs]) == ("Mine", "Budget 0")
+
+def test_bulk_card_update_refuses_rows_of_another_account(db):
+    db.functions["bulk_update_cards"] = bulk_update("cards", "card_not_owned")
+    account, other = seed_account(db), seed_account(db)
+    card = CardBulkUpdate(id=other.card_ids[0], name="Taken", cardholder_name="A", cvv="123",
+                          expiry="12/30", zipcode="00000", address="Street")
+
+    results = asyncio.run(CardService.bulk_cards(account.account_id, CardBulkRequest(update=[card]))).results
+    assert [(r.status, r.error) for r in results] == [("failed", "Update includes a card of another account; nothing was updated")]
+    assert next(c for c in db.tables["cards"] if c["id"] == other.card_ids[0])["name"] == "Card 0"
+    # The other account's budget associations are untouched
+    assert db.count("card_budgets", "delete") == 0
@@ -0,0 +1,71 @@
+import asyncio
+
+from app.models.card import CardCreate
+from app.services.card_service import CardService
+from fakes import add_transaction, seed_account
+
+def card(budget_ids, **fields):
+    return CardCreate(name=fields.pop("name", "Card"), cardholder_name="A Holder", cvv="123", expiry="12/30",
+                      zipcode="00000", address="1 Street", budget_ids=budget_ids, **fields)
+
+def associations(db, card_id):
+    return {cb["budget_id"]: cb["id"] for cb in db.tables["card_budgets"] if cb["card_id"] == card_id}
+
+def test_create_card_verifies_and_links_budgets_in_bulk(db):
+    account = seed_account(db, periods=("monthly",) * 20)
+    other = seed_account(db)
+    requested = account.budget_ids + [other.budget_ids[0], "not-a-uuid", account.budget_ids[0]]
+
+    created = asyncio.run(CardService.create_card(account.account_id, card(requested)))
+
+    assert created.budget_ids == account.budget_ids
+    # Another account's budget and malformed IDs are reported, not linked
+    assert created.invalid_budget_ids == [other.budget_ids[0], "not-a-uuid"]
+    assert set(associations(db, created.id)) == set(account.budget_ids)
+    assert all(cb["account_id"] == account.account_id for cb in db.tables["card_budgets"] if cb["card_id"] == created.id)
+    # One ownership query and one insert, however many budgets
+    assert db.count("budgets") == 1
+    assert db.count("card_budgets", "insert") == 1
+
+def test_create_card_without_budgets_skips_the_lookups(db):
+    account = seed_account(db)
+    created = asyncio.run(CardService.create_card(account.account_id, card([])))
+    assert (created.budget_ids, created.invalid_budget_ids) == ([], [])
+    assert db.count("budgets") == 0
+    assert db.count("card_budgets", "insert") == 0
+
+def test_update_card_applies_only_the_association_diff(db):
+    account = seed_account(db, periods=("monthly", "weekly", "quarterly"))
+    card_id = account.card_ids[0]
+    kept, removed, unlinked = account.budget_ids
+    before = associations(db, card_id)
+    transaction = add_transaction(db, account, before[kept], 12.0)
+    budget = seed_account(db).budget_ids[0]
+    db.queries.clear()
+
+    # Two budgets are dropped; a budget of another account is reported
+    updated = asyncio.run(CardService.update_card(account.account_id, card_id, card([kept, budget], name="Renamed")))
+
+    assert (updated.name, updated.budget_ids, updated.invalid_budget_ids) == ("Renamed", [kept], [budget])
+    after = associations(db, card_id)
+    assert after == {kept: before[kept]}
+    assert removed not in after and unlinked not in after
+    # The unchanged association kept its ID, so its transactions survive
+    assert transaction["card_budget_id"] == after[kept]
+    assert db.count("card_budgets", "delete") == 1
+    assert db.count("card_budgets", "insert") == 0
+
+def test_update_card_adds_new_associations_in_one_insert(db):
+    account = seed_account(db, periods=("monthly", "weekly", "quarterly"))
+    card_id = asyncio.run(CardService.create_card(account.account_id, card(account.budget_ids[:1]))).id
+    first = associations(db, card_id)
+    db.queries.clear()
+
+    updated = asyncio.run(CardService.update_card(account.account_id, card_id, card(account.budget_ids)))
+
+    assert updated.budget_ids == account.budget_ids
+    after = associations(db, card_id)
+    assert set(after) == set(account.budget_ids)
+    assert after[account.budget_ids[0]] == first[account.budget_ids[0]]
+    assert db.count("card_budgets", "delete") == 0
+    assert db.count("card_budgets", "insert") == 1
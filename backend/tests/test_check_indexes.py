@@ -0,0 +1,42 @@
+from migrations.check_indexes import HOT_QUERIES, problems
+
+def index_scan(index, relation="cards", **fields):
+    return {"Node Type": "Index Scan", "Index Name": index, "Relation Name": relation, **fields}
+
+def test_index_condition_on_the_expected_index_passes():
+    plan = index_scan("idx_cards_account_id", **{"Index Cond": "(account_id = 'a'::uuid)"})
+    assert problems(plan, "idx_cards_account_id") == []
+    # A leftover filter is fine once the index has narrowed the rows
+    plan["Filter"] = "(id = 'b'::uuid)"
+    assert problems(plan, ("cards_pkey", "idx_cards_account_id")) == []
+
+def test_full_index_read_with_a_filter_fails():
+    # What enable_seqscan = off produces when the right index is missing
+    plan = {"Node Type": "Limit", "Plans": [
+        index_scan("receipts_pkey", "receipts", Filter="(account_id = 'a'::uuid)"),
+    ]}
+    found = problems(plan, "idx_receipts_account_id_date_added")
+    assert len(found) == 2
+    assert "filters (account_id = 'a'::uuid) without an index condition" in found[0]
+    assert found[1] == "uses receipts_pkey, expected idx_receipts_account_id_date_added"
+
+def test_sequential_scan_fails():
+    plan = {"Node Type": "Seq Scan", "Relation Name": "policies", "Filter": "(account_id = 'a'::uuid)"}
+    assert problems(plan, "idx_policies_account_id") == [
+        "sequential scan on policies",
+        "uses no index, expected idx_policies_account_id",
+    ]
+
+def test_bitmap_scans_count_as_index_backed():
+    plan = {
+        "Node Type": "Bitmap Heap Scan", "Relation Name": "transactions",
+        "Recheck Cond": "(account_id = 'a'::uuid)", "Filter": "(date >= now())",
+        "Plans": [{"Node Type": "Bitmap Index Scan", "Index Name": "idx_transactions_account_id_date_id",
+                   "Index Cond": "(account_id = 'a'::uuid)"}],
+    }
+    assert problems(plan, "idx_transactions_account_id_date_id") == []
+
+def test_every_hot_query_names_its_index():
+    for name, sql, params, expected in HOT_QUERIES:
+        assert expected, name
+        assert sql.count("%s") == len(params), name
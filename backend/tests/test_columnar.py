@@ -0,0 +1,98 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils import columnar
+from app.utils.columnar import (
+    COLUMNAR_JSON_MEDIA_TYPE,
+    JSON_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    columnar_response,
+    negotiate_format,
+    to_columnar,
+)
+
+ROWS = [
+    {"id": "t1", "card_budget_id": "cb1", "amount": 12.5, "category": "travel"},
+    {"id": "t2", "card_budget_id": "cb2", "amount": 3.0, "category": None},
+    {"id": "t3", "card_budget_id": "cb1", "amount": -1.25, "category": "travel"},
+]
+COLUMNS = ["id", "card_budget_id", "amount", "category"]
+
+def decode(payload: dict) -> list:
+    """Mirror of decodeColumnar in frontend/config.ts"""
+    rows = []
+    for i in range(payload["count"]):
+        row = {}
+        for name, values in payload["columns"].items():
+            dictionary = payload["dictionaries"].get(name)
+            value = values[i]
+            row[name] = dictionary[value] if dictionary is not None and value is not None else value
+        rows.append(row)
+    return rows
+
+def test_round_trip_with_dictionary_columns():
+    payload = to_columnar(ROWS, COLUMNS, ["card_budget_id", "category"])
+    assert payload["count"] == 3
+    assert payload["columns"]["card_budget_id"] == [0, 1, 0]
+    assert payload["dictionaries"]["card_budget_id"] == ["cb1", "cb2"]
+    # None is kept as None rather than given a code
+    assert payload["columns"]["category"] == [0, None, 0]
+    assert "amount" not in payload["dictionaries"]
+    assert decode(payload) == ROWS
+
+def test_empty_rows():
+    payload = to_columnar([], COLUMNS, ["card_budget_id"])
+    assert payload["count"] == 0
+    assert payload["columns"] == {column: [] for column in COLUMNS}
+    assert decode(payload) == []
+
+def test_columnar_json_response():
+    response = columnar_response(ROWS, COLUMNS, ["card_budget_id"], COLUMNAR_JSON_MEDIA_TYPE)
+    assert response.media_type == COLUMNAR_JSON_MEDIA_TYPE
+    assert response.headers["vary"] == "Accept"
+    assert decode(json.loads(response.body)) == ROWS
+
+def test_msgpack_response_round_trip():
+    msgpack = pytest.importorskip("msgpack")
+    response = columnar_response(ROWS, COLUMNS, ["card_budget_id"], MSGPACK_MEDIA_TYPE)
+    assert response.media_type == MSGPACK_MEDIA_TYPE
+    assert decode(msgpack.unpackb(response.body, raw=False)) == ROWS
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, JSON_MEDIA_TYPE),
+    ("*/*", JSON_MEDIA_TYPE),
+    (COLUMNAR_JSON_MEDIA_TYPE, COLUMNAR_JSON_MEDIA_TYPE),
+    (f"application/json, {COLUMNAR_JSON_MEDIA_TYPE}", JSON_MEDIA_TYPE),
+    (f"{COLUMNAR_JSON_MEDIA_TYPE};q=0, application/json", JSON_MEDIA_TYPE),
+    ("text/html", JSON_MEDIA_TYPE),
+    # Highest q wins, whatever the order
+    (f"application/json;q=0.5, {COLUMNAR_JSON_MEDIA_TYPE}", COLUMNAR_JSON_MEDIA_TYPE),
+    (f"{COLUMNAR_JSON_MEDIA_TYPE};q=0.2, application/json;q=0.9", JSON_MEDIA_TYPE),
+    (f"application/json, {MSGPACK_MEDIA_TYPE};q=0.1", JSON_MEDIA_TYPE),
+    (f"application/json;q=0.1, {MSGPACK_MEDIA_TYPE}", MSGPACK_MEDIA_TYPE),
+    # The most specific range decides
+    (f"application/*;q=0.8, {COLUMNAR_JSON_MEDIA_TYPE};q=0.3", JSON_MEDIA_TYPE),
+    (f"*/*;q=0.1, {COLUMNAR_JSON_MEDIA_TYPE}", COLUMNAR_JSON_MEDIA_TYPE),
+    ("application/json;q=0, */*", COLUMNAR_JSON_MEDIA_TYPE),
+    (f"{COLUMNAR_JSON_MEDIA_TYPE};q=bad, application/json;q=0.5", JSON_MEDIA_TYPE),
+    (f"{COLUMNAR_JSON_MEDIA_TYPE}; Q=0.9, application/json;q=0.5", COLUMNAR_JSON_MEDIA_TYPE),
+])
+def test_negotiate_from_accept(accept, expected):
+    assert negotiate_format(accept) == expected
+
+def test_format_parameter_overrides_accept():
+    assert negotiate_format("application/json", "columnar") == COLUMNAR_JSON_MEDIA_TYPE
+    assert negotiate_format(COLUMNAR_JSON_MEDIA_TYPE, "JSON") == JSON_MEDIA_TYPE
+
+def test_unknown_format_parameter_is_rejected():
+    with pytest.raises(HTTPException) as excinfo:
+        negotiate_format(None, "xml")
+    assert excinfo.value.status_code == 400
+
+def test_msgpack_falls_back_to_columnar_json_without_msgpack(monkeypatch):
+    monkeypatch.setattr(columnar, "_msgpack", False)
+    assert negotiate_format(None, "msgpack") == COLUMNAR_JSON_MEDIA_TYPE
+    assert negotiate_format(f"{MSGPACK_MEDIA_TYPE}, application/json") == JSON_MEDIA_TYPE
+    assert negotiate_format(f"{MSGPACK_MEDIA_TYPE}, {COLUMNAR_JSON_MEDIA_TYPE};q=0.5") == COLUMNAR_JSON_MEDIA_TYPE
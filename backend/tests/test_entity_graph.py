@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from fakes import add_transaction, bump_entity_version, new_id, refresh_running_totals, seed_account
+
+from app.services.analytics_service import AnalyticsService
+from app.services.card_budget_service import CardBudgetService
+from app.services.transaction_service import TransactionService
+
+def add_card_on_another_worker(db, account):
+    """Create a card associated with the account's first budget, bypassing this worker's caches"""
+    card_id = new_id()
+    card_budget_id = new_id()
+    db.tables["cards"].append({**db.tables["cards"][0], "id": card_id, "account_id": account.account_id, "name": "New card"})
+    db.tables["card_budgets"].append({"id": card_budget_id, "account_id": account.account_id, "card_id": card_id,
+                                      "budget_id": account.budget_ids[0], "created_at": "2025-01-01T00:00:00+00:00"})
+    for _ in range(2):
+        bump_entity_version(db, account.account_id)
+    return card_id, card_budget_id
+
+def test_graph_is_reused_while_the_version_is_unchanged(db):
+    account = seed_account(db)
+    AnalyticsService._load_entity_graph(account.account_id)
+    AnalyticsService._load_entity_graph(account.account_id)
+    assert db.count("cards") == 1
+    assert db.count("entity_versions") == 2
+
+def test_writes_on_another_worker_are_seen_at_once(db):
+    account = seed_account(db)
+    assert len(asyncio.run(CardBudgetService.get_card_budgets(account.account_id))) == 1
+
+    card_id, card_budget_id = add_card_on_another_worker(db, account)
+    add_transaction(db, account, card_budget_id, 42.0)
+
+    listed = asyncio.run(CardBudgetService.get_card_budgets(account.account_id))
+    assert {cb["card_id"] for cb in listed} == {account.card_ids[0], card_id}
+    transactions = asyncio.run(TransactionService.get_transactions(account.account_id, card_id=card_id))
+    assert [t.amount for t in transactions] == [42.0]
+
+def test_graph_is_read_fresh_without_a_version(db):
+    account = seed_account(db)
+    db.errors["entity_versions"] = RuntimeError("relation \"entity_versions\" does not exist")
+    AnalyticsService._load_entity_graph(account.account_id)
+    card_id, _ = add_card_on_another_worker(db, account)
+    graph = AnalyticsService._load_entity_graph(account.account_id)
+    assert card_id in graph["cards_by_id"]
+    assert db.count("cards") == 2
+
+def test_dashboard_matches_totals_summed_from_transactions(db):
+    account = seed_account(db, periods=("monthly", "weekly"), cards=2)
+    card_of = {cb: card_id for (card_id, _), cb in account.card_budget_ids.items()}
+    budget_of = {cb: budget_id for (_, budget_id), cb in account.card_budget_ids.items()}
+    for i, card_budget_id in enumerate(card_of):
+        for days_ago, amount in ((1, 10.0 + i), (3, 2.5 * i), (45, 100.0)):
+            add_transaction(db, account, card_budget_id, amount, days_ago)
+    refresh_running_totals(db)
+
+    dashboard = asyncio.run(AnalyticsService.get_dashboard(account.account_id, "month"))
+
+    # What the per-card queries used to compute: the period's transactions, summed
+    def summed(match, days=30):
+        return sum(t["amount"] for t in db.tables["transactions"]
+                   if match(t["card_budget_id"]) and t["date"] >= (datetime.utcnow() - timedelta(days=days)).isoformat())
+
+    for card_balance in dashboard.balances.card_balances:
+        assert card_balance.total_spent == summed(lambda cb: card_of[cb] == card_balance.card_id)
+        # The running balance counts every transaction on the card
+        assert card_balance.balance == summed(lambda cb: card_of[cb] == card_balance.card_id, days=3650)
+    assert dashboard.balances.total_spent == summed(lambda cb: True)
+    assert len(dashboard.spending) == 2
+    for item in dashboard.spending:
+        assert item.total_spent == summed(lambda cb: budget_of[cb] == item.budget_id)
+    assert len(dashboard.recent_transactions) == 10
+    assert {card.id for card in dashboard.cards} == set(account.card_ids)
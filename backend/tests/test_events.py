@@ -0,0 +1,48 @@
+import asyncio
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.api.events import create_stream_token, stream_events
+from app.config.settings import settings
+from app.utils.events import STREAM_TOKEN_PURPOSE
+from app.utils.jwt import create_access_token, create_signed_token, verify_signed_token
+
+def bearer(token):
+    return SimpleNamespace(credentials=token)
+
+def open_stream(token=None, stream_token=None):
+    return asyncio.run(stream_events(token=token, stream_token=stream_token))
+
+def test_stream_token_is_short_lived_and_scoped(monkeypatch):
+    monkeypatch.setattr(settings, "EVENTS_TOKEN_TTL", 30)
+    issued = asyncio.run(create_stream_token(bearer(create_access_token({"sub": "u1"}))))
+    assert issued.expires_in == 30
+    payload = verify_signed_token(issued.token, STREAM_TOKEN_PURPOSE)
+    assert payload["sub"] == "u1"
+    assert 0 < payload["exp"] - time.time() <= 31
+
+    response = open_stream(stream_token=issued.token)
+    assert isinstance(response, StreamingResponse)
+    assert response.media_type == "text/event-stream"
+
+def test_access_tokens_do_not_open_streams_from_the_query():
+    with pytest.raises(HTTPException) as e:
+        open_stream(stream_token=create_access_token({"sub": "u1"}))
+    assert e.value.status_code == 401
+
+def test_expired_stream_token_is_refused():
+    expired = create_signed_token({"sub": "u1"}, STREAM_TOKEN_PURPOSE, timedelta(seconds=-1))
+    with pytest.raises(HTTPException) as e:
+        open_stream(stream_token=expired)
+    assert e.value.status_code == 401
+
+def test_header_clients_still_use_their_access_token():
+    assert isinstance(open_stream(token=bearer(create_access_token({"sub": "u1"}))), StreamingResponse)
+    with pytest.raises(HTTPException) as e:
+        open_stream()
+    assert e.value.status_code == 403
@@ -0,0 +1,327 @@
+import asyncio
+import io
+import threading
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from app.utils import idempotency
+from app.utils.idempotency import (
+    DatabaseIdempotencyBackend,
+    IdempotencyStore,
+    LocalIdempotencyBackend,
+    create_backend,
+    file_digest,
+    fingerprint,
+    parse_timestamp,
+)
+
+class Created(BaseModel):
+    id: str
+    amount: float
+
+class Write:
+    """A write endpoint body that counts its runs"""
+
+    def __init__(self, fail: bool = False):
+        self.calls = 0
+        self.fail = fail
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.fail:
+            raise HTTPException(status_code=400, detail="declined")
+        return Created(id=f"t{self.calls}", amount=12.5)
+
+def store() -> IdempotencyStore:
+    return IdempotencyStore(LocalIdempotencyBackend(), poll_interval=0.01)
+
+def test_fingerprint_is_stable_and_payload_sensitive():
+    assert fingerprint("cb1", 12.5, None) == fingerprint("cb1", 12.5, None)
+    assert fingerprint("cb1", 12.5) != fingerprint("cb1", 12.6)
+    # Parts are delimited, so shifting text between them changes the digest
+    assert fingerprint("ab", "c") != fingerprint("a", "bc")
+
+def test_file_digest_rewinds():
+    file = io.BytesIO(b"receipt" * 1000)
+    file.read(10)
+    first = file_digest(file, chunk_size=64)
+    assert file.tell() == 0
+    assert first == file_digest(file)
+    assert first != file_digest(io.BytesIO(b"other"))
+
+def test_without_key_every_request_runs():
+    write = Write()
+
+    async def main():
+        s = store()
+        return [await s.run("u1", "create", None, "fp", write) for _ in range(2)]
+
+    results = asyncio.run(main())
+    assert write.calls == 2
+    assert [replayed for _, replayed in results] == [False, False]
+
+def test_retry_is_replayed_from_the_store():
+    write = Write()
+
+    async def main():
+        s = store()
+        first = await s.run("u1", "create", "key-1", "fp", write)
+        retry = await s.run("u1", "create", "key-1", "fp", write)
+        other_account = await s.run("u2", "create", "key-1", "fp", write)
+        return first, retry, other_account
+
+    (first, first_replayed), (retry, retry_replayed), (other, other_replayed) = asyncio.run(main())
+    assert write.calls == 2
+    assert isinstance(first, Created) and not first_replayed
+    # Stored as JSON, the form the endpoint would have sent
+    assert retry == {"id": "t1", "amount": 12.5} and retry_replayed
+    assert other == Created(id="t2", amount=12.5) and not other_replayed
+
+def test_key_reused_with_another_payload_is_rejected():
+    async def main():
+        s = store()
+        await s.run("u1", "create", "key-1", "fp-a", Write())
+        await s.run("u1", "create", "key-1", "fp-b", Write())
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(main())
+    assert excinfo.value.status_code == 422
+
+@pytest.mark.parametrize("key", ["", "k" * 256])
+def test_invalid_key_is_rejected(key):
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(store().run("u1", "create", key, "fp", Write()))
+    assert excinfo.value.status_code == 400
+
+def test_failed_request_releases_its_key():
+    async def main():
+        s = store()
+        with pytest.raises(HTTPException):
+            await s.run("u1", "create", "key-1", "fp", Write(fail=True))
+        return await s.run("u1", "create", "key-1", "fp", Write())
+
+    response, replayed = asyncio.run(main())
+    assert response == Created(id="t1", amount=12.5) and not replayed
+
+def test_concurrent_retry_waits_for_the_original():
+    write = Write()
+    write.release.clear()
+
+    async def main():
+        s = store()
+        original = asyncio.create_task(s.run("u1", "create", "key-1", "fp", write))
+        await asyncio.sleep(0)
+        retry = asyncio.create_task(s.run("u1", "create", "key-1", "fp", write))
+        await asyncio.sleep(0.05)
+        assert not retry.done()
+        write.release.set()
+        return await original, await retry
+
+    (_, original_replayed), (retry, retry_replayed) = asyncio.run(main())
+    assert write.calls == 1
+    assert not original_replayed
+    assert retry == {"id": "t1", "amount": 12.5} and retry_replayed
+
+def test_cancelled_original_lets_a_waiting_retry_run():
+    write = Write()
+    write.release.clear()
+
+    async def main():
+        s = store()
+        original = asyncio.create_task(s.run("u1", "create", "key-1", "fp", write))
+        await asyncio.sleep(0)
+        retry = asyncio.create_task(s.run("u1", "create", "key-1", "fp", write))
+        await asyncio.sleep(0.02)
+        # The client that sent the original disconnects
+        original.cancel()
+        await asyncio.sleep(0.02)
+        write.release.set()
+        return await retry
+
+    response, replayed = asyncio.run(main())
+    assert write.calls == 2
+    assert response == Created(id="t2", amount=12.5) and not replayed
+
+def test_store_failure_is_a_500():
+    class Broken(LocalIdempotencyBackend):
+        def claim(self, store_key, request_fingerprint):
+            raise ConnectionError("database down")
+
+    write = Write()
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(IdempotencyStore(Broken()).run("u1", "create", "key-1", "fp", write))
+    assert excinfo.value.status_code == 500
+    assert write.calls == 0
+
+def test_local_backend_claim_complete_release():
+    backend = LocalIdempotencyBackend()
+    key = ("u1", "create", "k")
+    assert backend.claim(key, "fp") is None
+    assert backend.claim(key, "fp") == ("fp", None)
+    backend.complete(key, {"id": "t1"})
+    assert backend.claim(key, "fp") == ("fp", {"id": "t1"})
+    backend.release(key)
+    assert backend.claim(key, "fp") is None
+
+def test_backend_calls_run_off_the_event_loop():
+    threads = []
+
+    class Recording(LocalIdempotencyBackend):
+        def claim(self, store_key, request_fingerprint):
+            threads.append(threading.current_thread())
+            return super().claim(store_key, request_fingerprint)
+
+    asyncio.run(IdempotencyStore(Recording()).run("u1", "create", "key-1", "fp", Write()))
+    assert threads and threading.main_thread() not in threads
+
+@pytest.mark.parametrize("value", [
+    "2025-01-01T12:00:00.12345+00:00",
+    "2025-01-01T12:00:00.1+00:00",
+    "2025-01-01T12:00:00.123456789Z",
+    "2025-01-01 12:00:00.12345+00",
+])
+def test_parse_timestamp_accepts_postgrest_fractions(value):
+    parsed = parse_timestamp(value)
+    assert parsed.tzinfo is not None
+    assert parsed.replace(microsecond=0) == datetime(2025, 1, 1, 12, tzinfo=timezone.utc)
+
+def test_parse_timestamp_assumes_utc():
+    assert parse_timestamp("2025-01-01T12:00:00") == datetime(2025, 1, 1, 12, tzinfo=timezone.utc)
+
+def test_create_backend():
+    assert isinstance(create_backend("local"), LocalIdempotencyBackend)
+    database = create_backend("database", ttl=10, lease=5, prune_interval=30)
+    assert isinstance(database, DatabaseIdempotencyBackend)
+    assert (database.ttl, database.lease, database.prune_interval) == (10, 5, 30)
+    with pytest.raises(RuntimeError):
+        create_backend("memcached")
+
+class UniqueViolation(Exception):
+    code = "23505"
+
+class FakeTable:
+    """Just enough of the Supabase query builder for idempotency_keys"""
+
+    KEY = ("account_id", "endpoint", "key")
+
+    def __init__(self):
+        self.rows = []
+
+    def table(self, name):
+        return FakeQuery(self)
+
+class FakeQuery:
+    def __init__(self, table):
+        self.table = table
+        self.action = None
+        self.payload = None
+        self.filters = []
+
+    def insert(self, row):
+        self.action, self.payload = "insert", row
+        return self
+
+    def select(self, columns):
+        self.action = "select"
+        return self
+
+    def update(self, values):
+        self.action, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row[column] == value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row[column] < value)
+        return self
+
+    def execute(self):
+        rows = self.table.rows
+        if self.action == "insert":
+            if any(all(row[k] == self.payload[k] for k in FakeTable.KEY) for row in rows):
+                raise UniqueViolation()
+            rows.append({"response": None, "created_at": datetime.now(timezone.utc).isoformat(), **self.payload})
+            return SimpleNamespace(data=[self.payload])
+        matched = [row for row in rows if all(f(row) for f in self.filters)]
+        if self.action == "update":
+            for row in matched:
+                row.update(self.payload)
+        elif self.action == "delete":
+            self.table.rows = [row for row in rows if row not in matched]
+        return SimpleNamespace(data=matched)
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeTable()
+    monkeypatch.setattr(idempotency, "supabase", db)
+    return db
+
+def age(db, seconds):
+    """Backdate every claim by seconds, formatted as PostgREST does (5 fraction digits)"""
+    for row in db.rows:
+        row["created_at"] = (datetime.now(timezone.utc) - timedelta(seconds=seconds)).isoformat(timespec="microseconds")[:-7] + "+00:00"
+
+def test_database_backend_replays_completed_claims(fake_db):
+    backend = DatabaseIdempotencyBackend(ttl=3600, lease=60)
+    key = ("u1", "create", "k")
+    assert backend.claim(key, "fp") is None
+    assert backend.claim(key, "fp") == ("fp", None)
+    backend.complete(key, {"id": "t1"})
+    age(fake_db, 600)
+    # Past the lease but inside the TTL: still replayed
+    assert backend.claim(key, "fp") == ("fp", {"id": "t1"})
+
+def test_database_backend_takes_over_abandoned_and_expired_claims(fake_db):
+    backend = DatabaseIdempotencyBackend(ttl=3600, lease=60)
+    key = ("u1", "create", "k")
+    backend.claim(key, "fp")
+    age(fake_db, 61)
+    # The worker holding the claim died mid-request
+    assert backend.claim(key, "fp") is None
+    assert len(fake_db.rows) == 1
+
+    backend.complete(key, {"id": "t1"})
+    age(fake_db, 3601)
+    assert backend.claim(key, "fp-new") is None
+    assert fake_db.rows[0]["fingerprint"] == "fp-new"
+    assert fake_db.rows[0]["response"] is None
+
+def test_database_backend_prune(fake_db):
+    backend = DatabaseIdempotencyBackend(ttl=3600, lease=60)
+    backend.claim(("u1", "create", "old"), "fp")
+    age(fake_db, 7200)
+    backend.claim(("u1", "create", "new"), "fp")
+    assert backend.prune() == 1
+    assert [row["key"] for row in fake_db.rows] == ["new"]
+
+def test_database_backend_prunes_at_claim_time(fake_db):
+    backend = DatabaseIdempotencyBackend(ttl=3600, lease=60, prune_interval=600)
+    backend.claim(("u1", "create", "old"), "fp")
+    age(fake_db, 7200)
+    # The first claim pruned (nothing yet); the next is due in 600 seconds
+    backend.claim(("u1", "create", "new"), "fp")
+    assert len(fake_db.rows) == 2
+
+    backend._next_prune = 0
+    backend.claim(("u1", "create", "newer"), "fp")
+    assert sorted(row["key"] for row in fake_db.rows) == ["new", "newer"]
+
+def test_database_backend_prune_interval_zero_leaves_it_to_the_job(fake_db):
+    backend = DatabaseIdempotencyBackend(ttl=3600, lease=60, prune_interval=0)
+    backend.claim(("u1", "create", "old"), "fp")
+    age(fake_db, 7200)
+    backend.claim(("u1", "create", "new"), "fp")
+    assert len(fake_db.rows) == 2
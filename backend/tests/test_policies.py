@@ -0,0 +1,49 @@
+import pytest
+
+from app.services.policy_service import CompiledPolicySet
+
+POLICIES = [
+    {"id": "p100", "name": "Over 100", "memo_threshold": 100, "memo_prompt": None},
+    {"id": "p25", "name": "Over 25", "memo_threshold": "25.50", "memo_prompt": "Explain this one"},
+    {"id": "pnone", "name": "No rule", "memo_threshold": None},
+    {"id": "p500", "name": "Over 500", "memo_threshold": 500},
+]
+
+def broken(policies, amount, description=None):
+    violations = CompiledPolicySet(policies).evaluate({"amount": amount, "description": description})
+    return [violation.policy_id for violation in violations]
+
+@pytest.mark.parametrize("amount, expected", [
+    (0, []),
+    (25.49, []),
+    # Thresholds are inclusive
+    (25.5, ["p25"]),
+    (99.99, ["p25"]),
+    (100, ["p25", "p100"]),
+    (10_000, ["p25", "p100", "p500"]),
+    (-200, []),
+])
+def test_rules_broken_by_amount(amount, expected):
+    assert broken(POLICIES, amount) == expected
+
+def test_memo_satisfies_every_rule():
+    assert broken(POLICIES, 1000, "Team dinner") == []
+    # Whitespace is not a memo
+    assert broken(POLICIES, 1000, "   ") == ["p25", "p100", "p500"]
+
+def test_violation_messages():
+    violations = CompiledPolicySet(POLICIES).evaluate({"amount": 150, "description": ""})
+    assert [v.message for v in violations] == ["Explain this one", "A memo is required for transactions of 100.00 or more"]
+    assert violations[0].threshold == 25.5
+    assert violations[0].rule == "memo_threshold"
+
+def test_empty_set_is_falsy():
+    assert not CompiledPolicySet([])
+    assert not CompiledPolicySet([{"id": "p", "name": "n", "memo_threshold": None}])
+    assert CompiledPolicySet(POLICIES)
+    assert CompiledPolicySet([]).evaluate({"amount": 1e9}) == []
+
+def test_compiled_set_is_immutable():
+    compiled = CompiledPolicySet(POLICIES)
+    with pytest.raises(AttributeError):
+        compiled._memo_rules = ()
@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.config.settings import settings
+from app.models.receipt import ReceiptCompleteRequest, ReceiptPresignRequest
+from app.services import upload_service
+from app.services.upload_service import PRESIGN_TOKEN_PURPOSE, PresignedUploadService
+from app.utils.jwt import create_signed_token
+from fakes import create_receipt, new_id
+
+class FakeStorage:
+    def __init__(self):
+        self.objects = {}
+
+    async def create_signed_upload_url(self, bucket, path):
+        return f"https://storage.test/object/upload/sign/{bucket}/{path}?token=t"
+
+    def public_url(self, bucket, path):
+        return f"https://storage.test/object/public/{bucket}/{path}"
+
+    async def info(self, bucket, path):
+        return self.objects.get(path)
+
+@pytest.fixture
+def storage(db, monkeypatch):
+    fake = FakeStorage()
+    monkeypatch.setattr(upload_service, "get_storage_client", lambda: fake)
+    monkeypatch.setattr(settings, "RECEIPT_PRESIGN_TTL", 600)
+    db.functions["create_receipt"] = create_receipt
+    return fake
+
+def presign(user_id):
+    return asyncio.run(PresignedUploadService.presign(user_id, ReceiptPresignRequest(filename="lunch.pdf", size=1000)))
+
+def complete(user_id, upload_id):
+    return asyncio.run(PresignedUploadService.complete(user_id, ReceiptCompleteRequest(upload_id=upload_id)))
+
+def test_completes_within_the_ttl(db, storage):
+    user_id = new_id()
+    presigned = presign(user_id)
+    assert presigned.expires_in == 600
+    assert presigned.path.startswith(f"receipts/{user_id}/")
+
+    storage.objects[presigned.path] = {"size": 1000, "content_type": "application/pdf"}
+    result = complete(user_id, presigned.upload_id)
+    assert result.receipt.name == "lunch.pdf" and result.receipt.type == "document"
+    assert len(db.tables["receipts"]) == 1
+
+def late_upload_id(user_id, path, seconds_ago):
+    return create_signed_token(
+        {"sub": user_id, "path": path, "filename": "lunch.pdf", "iat": int(time.time()) - seconds_ago},
+        PRESIGN_TOKEN_PURPOSE,
+        upload_service.timedelta(seconds=600 - seconds_ago)
+    )
+
+def test_completion_after_the_ttl_is_refused(db, storage):
+    user_id = new_id()
+    path = f"receipts/{user_id}/late.pdf"
+    storage.objects[path] = {"size": 1000, "content_type": "application/pdf"}
+
+    # The file landed through the still-open upload URL, but too late
+    with pytest.raises(HTTPException) as e:
+        complete(user_id, late_upload_id(user_id, path, 601))
+    assert e.value.status_code == 410
+    assert db.tables.get("receipts", []) == []
+    assert complete(user_id, late_upload_id(user_id, path, 500)).url.endswith(path)
+
+def test_lowered_ttl_applies_to_issued_upload_ids(db, storage, monkeypatch):
+    user_id = new_id()
+    presigned = presign(user_id)
+    storage.objects[presigned.path] = {"size": 1000, "content_type": "application/pdf"}
+    monkeypatch.setattr(settings, "RECEIPT_PRESIGN_TTL", -1)
+    with pytest.raises(HTTPException) as e:
+        complete(user_id, presigned.upload_id)
+    assert e.value.status_code == 410
+
+def test_repeated_completion_returns_the_receipt_after_the_ttl(db, storage, monkeypatch):
+    user_id = new_id()
+    presigned = presign(user_id)
+    storage.objects[presigned.path] = {"size": 1000, "content_type": "application/pdf"}
+    first = complete(user_id, presigned.upload_id)
+
+    monkeypatch.setattr(settings, "RECEIPT_PRESIGN_TTL", -1)
+    assert complete(user_id, presigned.upload_id).receipt_id == first.receipt_id
+    assert len(db.tables["receipts"]) == 1
+
+def test_upload_ids_of_other_users_are_not_found(db, storage):
+    presigned = presign(new_id())
+    with pytest.raises(HTTPException) as e:
+        complete(new_id(), presigned.upload_id)
+    assert e.value.status_code == 404
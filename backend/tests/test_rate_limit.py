@@ -0,0 +1,166 @@
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import run
+from app.config.settings import settings
+from app.middleware import rate_limit
+from app.middleware.rate_limit import (
+    LocalRateLimitBackend,
+    RateLimiter,
+    RateLimitMiddleware,
+    create_backend,
+    parse_route_costs,
+)
+from app.utils.events import STREAM_TOKEN_PURPOSE
+from app.utils.jwt import create_access_token, create_signed_token
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+def take(backend, cost=1.0, rate=2.0, burst=4.0, key="account:u1"):
+    return asyncio.run(backend.take(key, cost, rate, burst))
+
+def test_bucket_starts_full_then_reports_retry_after(clock):
+    backend = LocalRateLimitBackend()
+    assert [take(backend) for _ in range(4)] == [0.0] * 4
+    # Empty: one token refills in 1 / rate seconds
+    assert take(backend) == pytest.approx(0.5)
+    # A refused request spends nothing
+    assert take(backend, cost=3.0) == pytest.approx(1.5)
+
+def test_bucket_refills_over_time_up_to_burst(clock):
+    backend = LocalRateLimitBackend()
+    assert take(backend, cost=4.0) == 0.0
+    clock.now += 1.0
+    assert take(backend, cost=2.0) == 0.0
+    assert take(backend) == pytest.approx(0.5)
+
+    clock.now += 3600
+    # Refill stops at the burst
+    assert take(backend, cost=4.0) == 0.0
+    assert take(backend) == pytest.approx(0.5)
+
+def test_buckets_are_per_key_and_forgotten_past_max_accounts(clock):
+    backend = LocalRateLimitBackend(max_accounts=2)
+    take(backend, cost=4.0, key="a")
+    take(backend, cost=4.0, key="b")
+    assert take(backend, key="b") > 0
+    take(backend, cost=4.0, key="c")
+    # "a" was least recently seen, so it is back to a full bucket
+    assert take(backend, cost=4.0, key="a") == 0.0
+
+def test_concurrency_slots():
+    backend = LocalRateLimitBackend()
+
+    async def main():
+        taken = [await backend.acquire("k", 2) for _ in range(3)]
+        await backend.release("k")
+        again = await backend.acquire("k", 2)
+        await backend.release("k")
+        await backend.release("k")
+        await backend.release("k")
+        return taken, again, backend._inflight
+
+    taken, again, inflight = asyncio.run(main())
+    assert taken == [True, True, False]
+    assert again is True
+    assert inflight == {}
+
+def test_parse_route_costs_longest_prefix_first():
+    costs = parse_route_costs(" /api/analytics=5, /api/analytics/dashboard=10 ,bad, /api/receipts=3")
+    assert costs == [("/api/analytics/dashboard", 10.0), ("/api/analytics", 5.0), ("/api/receipts", 3.0)]
+    assert parse_route_costs("") == []
+
+def test_route_cost_is_capped_at_burst():
+    limiter = RateLimiter(rate=1, burst=6, route_costs=parse_route_costs("/api/a=10,/api/a/b=2"))
+    assert limiter.cost("/api/a/b/c") == 2.0
+    assert limiter.cost("/api/a") == 6
+    assert limiter.cost("/api/other") == 1.0
+
+def test_client_key():
+    token = create_access_token({"sub": "u1"})
+    scope = {"headers": [(b"authorization", f"Bearer {token}".encode())], "client": ("10.0.0.1", 5000)}
+    assert RateLimiter.client_key(scope) == "account:u1"
+    stream_token = create_signed_token({"sub": "u1"}, STREAM_TOKEN_PURPOSE, timedelta(minutes=1))
+    assert RateLimiter.client_key({"headers": [], "query_string": f"token={stream_token}".encode()}) == "account:u1"
+    # Access tokens are never taken from the query string
+    assert RateLimiter.client_key({"headers": [], "query_string": f"access_token={token}".encode()}) == "client:unknown"
+    assert RateLimiter.client_key({"headers": [], "query_string": f"token={token}".encode()}) == "client:unknown"
+    # Invalid tokens fall back to the client address
+    bad = {"headers": [(b"authorization", b"Bearer nope")], "client": ("10.0.0.1", 5000)}
+    assert RateLimiter.client_key(bad) == "client:10.0.0.1"
+    assert RateLimiter.client_key({"headers": []}) == "client:unknown"
+
+def test_backend_errors_admit_requests():
+    class Broken:
+        async def take(self, *args):
+            raise ConnectionError("redis down")
+
+        async def acquire(self, *args):
+            raise ConnectionError("redis down")
+
+    limiter = RateLimiter(Broken())
+    assert asyncio.run(limiter.take("k", 1)) == 0.0
+    assert asyncio.run(limiter.acquire("k")) is True
+
+def test_create_backend():
+    assert isinstance(create_backend("local"), LocalRateLimitBackend)
+    with pytest.raises(RuntimeError):
+        create_backend("redis")
+    with pytest.raises(RuntimeError):
+        create_backend("memcached")
+
+def test_middleware_answers_429_with_retry_after(clock):
+    async def ok(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/api/things", ok), Route("/health", ok)])
+    limiter = RateLimiter(rate=0.25, burst=2)
+    client = TestClient(RateLimitMiddleware(app, limiter))
+    statuses = [client.get("/api/things").status_code for _ in range(2)]
+    refused = client.get("/api/things")
+    assert statuses == [200, 200]
+    assert refused.status_code == 429
+    # Rounded up to whole seconds
+    assert refused.headers["retry-after"] == "4"
+    assert refused.json() == {"detail": "Rate limit exceeded"}
+    # Paths outside /api are never limited
+    assert client.get("/health").status_code == 200
+    # Every concurrency slot was given back
+    assert limiter.backend._inflight == {}
+
+def test_warns_about_per_worker_state(monkeypatch, capsys):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BACKEND", "local")
+    monkeypatch.setattr(settings, "EVENTS_TRANSPORT", "local")
+    monkeypatch.setattr(settings, "IDEMPOTENCY_BACKEND", "local")
+    run.warn_per_worker_state(1)
+    assert capsys.readouterr().out == ""
+    run.warn_per_worker_state(4)
+    out = capsys.readouterr().out
+    assert "RATE_LIMIT_BACKEND=local with 4 workers" in out
+    assert "EVENTS_TRANSPORT=local with 4 workers" in out
+    assert "IDEMPOTENCY_BACKEND=local with 4 workers" in out
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_BACKEND", "redis")
+    monkeypatch.setattr(settings, "EVENTS_TRANSPORT", "redis")
+    monkeypatch.setattr(settings, "IDEMPOTENCY_BACKEND", "database")
+    run.warn_per_worker_state(4)
+    assert capsys.readouterr().out == ""
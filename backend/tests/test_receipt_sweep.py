@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services import receipt_cleanup_service
+from app.services.receipt_cleanup_service import ReceiptCleanupService
+
+ACCOUNT = "5f0c2a9e-8f7b-4a61-9d0e-1b2c3d4e5f60"
+OLD = (datetime.now(timezone.utc) - timedelta(days=5)).isoformat()
+NEW = datetime.now(timezone.utc).isoformat()
+
+class FakeStorage:
+    """Objects listed one level at a time by name, like Supabase storage"""
+
+    def __init__(self, objects: dict):
+        self.objects = dict(objects)
+        self.removed = []
+
+    async def list(self, bucket, prefix, limit=100, offset=0):
+        entries = {}
+        for path, created_at in self.objects.items():
+            if not path.startswith(f"{prefix}/"):
+                continue
+            name, _, rest = path[len(prefix) + 1:].partition("/")
+            entries[name] = {"name": name, "id": None} if rest else {"name": name, "id": path, "created_at": created_at}
+        return [entries[name] for name in sorted(entries)][offset:offset + limit]
+
+    async def remove(self, bucket, paths):
+        self.removed.extend(paths)
+        for path in paths:
+            del self.objects[path]
+
+@pytest.fixture
+def storage(monkeypatch):
+    def install(objects, referenced):
+        fake = FakeStorage(objects)
+        monkeypatch.setattr(receipt_cleanup_service, "get_storage_client", lambda: fake)
+        monkeypatch.setattr(receipt_cleanup_service, "supabase", object())
+        monkeypatch.setattr(ReceiptCleanupService, "_referenced_paths", staticmethod(lambda account_id: referenced))
+        return fake
+    return install
+
+def sweep(batch_size=3, dry_run=False):
+    async def main():
+        return [page async for page in ReceiptCleanupService.sweep(timedelta(hours=48), batch_size, dry_run=dry_run)]
+    return asyncio.run(main())
+
+def test_removals_do_not_skip_files_on_later_pages(storage):
+    objects = {f"receipts/{ACCOUNT}/old{i}.pdf": OLD for i in range(7)}
+    objects[f"receipts/{ACCOUNT}/kept.pdf"] = OLD
+    objects[f"receipts/{ACCOUNT}/new.pdf"] = NEW
+    fake = storage(objects, {f"receipts/{ACCOUNT}/kept.pdf"})
+
+    pages = sweep()
+    assert sorted(fake.removed) == sorted(f"receipts/{ACCOUNT}/old{i}.pdf" for i in range(7))
+    assert sorted(fake.objects) == [f"receipts/{ACCOUNT}/kept.pdf", f"receipts/{ACCOUNT}/new.pdf"]
+    # Every file was checked exactly once
+    assert sum(page["checked"] for page in pages) == 9
+
+def test_dry_run_pages_through_everything_without_removing(storage):
+    objects = {f"receipts/{ACCOUNT}/old{i}.pdf": OLD for i in range(7)}
+    fake = storage(objects, set())
+
+    pages = sweep(dry_run=True)
+    assert fake.removed == []
+    assert sum(len(page["orphaned"]) for page in pages) == 7
+    assert sum(page["removed"] for page in pages) == 0
+
+def test_folders_not_named_after_an_account_are_skipped(storage):
+    fake = storage({
+        "receipts/tmp/stray.pdf": OLD,
+        f"receipts/{ACCOUNT}/old.pdf": OLD,
+        f"receipts/{ACCOUNT}/nested/deep.pdf": OLD,
+    }, set())
+
+    pages = sweep()
+    assert {page["folder"] for page in pages} == {ACCOUNT}
+    assert fake.removed == [f"receipts/{ACCOUNT}/old.pdf"]
+    assert "receipts/tmp/stray.pdf" in fake.objects
+    # Subfolders are not files and are left alone
+    assert f"receipts/{ACCOUNT}/nested/deep.pdf" in fake.objects
+
+def test_path_from_url():
+    bucket = receipt_cleanup_service.RECEIPTS_BUCKET
+    url = f"https://old-host.supabase.co/storage/v1/object/public/{bucket}/receipts/{ACCOUNT}/r.pdf?download="
+    assert ReceiptCleanupService._path_from_url(url) == f"receipts/{ACCOUNT}/r.pdf"
+    assert ReceiptCleanupService._path_from_url("https://example.com/r.pdf") is None
+    assert ReceiptCleanupService._path_from_url(None) is None
@@ -0,0 +1,87 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+
+from app.models.receipt import ReceiptCreate
+from app.services import receipt_service
+from app.services.receipt_service import ReceiptService
+from fakes import PostgrestError, add_transaction, create_receipt, seed_account
+
+class FakeStorage:
+    def __init__(self):
+        self.objects = {}
+
+    async def upload(self, bucket, path, data, content_type=None, upsert=False):
+        self.objects[path] = data
+
+    def public_url(self, bucket, path):
+        return f"https://storage.test/object/public/{bucket}/{path}"
+
+    async def remove(self, bucket, paths):
+        for path in paths:
+            self.objects.pop(path, None)
+
+@pytest.fixture
+def storage(db, monkeypatch):
+    fake = FakeStorage()
+    monkeypatch.setattr(receipt_service, "get_storage_client", lambda: fake)
+    db.functions["create_receipt"] = create_receipt
+    return fake
+
+@pytest.fixture
+def account(db):
+    account = seed_account(db)
+    account.transaction = add_transaction(db, account, account.card_budget_ids[(account.card_ids[0], account.budget_ids[0])], 12.0)
+    return account
+
+def upload(account, transaction_id=None):
+    content = b"%PDF-1.4 lunch"
+    file = UploadFile(io.BytesIO(content), size=len(content), filename="lunch.pdf",
+                      headers=Headers({"content-type": "application/pdf"}))
+    receipt = ReceiptCreate(name="Lunch", type="document", amount=12.0)
+    return asyncio.run(ReceiptService.upload_and_create_receipt(account.account_id, file, receipt, transaction_id))
+
+def test_one_request_stores_the_file_and_links_the_record(db, storage, account):
+    response = upload(account, account.transaction["id"])
+
+    [(path, data)] = storage.objects.items()
+    assert path.startswith(f"receipts/{account.account_id}/") and data == b"%PDF-1.4 lunch"
+    assert response.url.endswith(path)
+    assert response.receipt_id == response.receipt.id == db.tables["receipts"][0]["id"]
+    assert response.transaction_id == account.transaction["id"]
+    assert account.transaction["receipt_id"] == response.receipt_id
+    assert db.count("rpc", "create_receipt") == 1
+
+def test_missing_transaction_is_refused_before_the_upload(db, storage, account):
+    other = seed_account(db)
+    foreign = add_transaction(db, other, other.card_budget_ids[(other.card_ids[0], other.budget_ids[0])], 1.0)
+    with pytest.raises(HTTPException) as e:
+        upload(account, foreign["id"])
+    assert e.value.status_code == 404
+    assert storage.objects == {}
+    assert db.tables.get("receipts", []) == []
+
+def test_file_is_removed_when_the_transaction_goes_away_mid_request(db, storage, account):
+    def delete_then_create(db, params):
+        db.tables["transactions"].clear()
+        return create_receipt(db, params)
+    db.functions["create_receipt"] = delete_then_create
+
+    with pytest.raises(HTTPException) as e:
+        upload(account, account.transaction["id"])
+    assert e.value.status_code == 404
+    assert storage.objects == {}
+    assert db.tables.get("receipts", []) == []
+
+def test_file_is_removed_when_the_insert_fails(db, storage, account):
+    def fail(db, params):
+        raise PostgrestError("57014", "canceling statement due to statement timeout")
+    db.functions["create_receipt"] = fail
+
+    with pytest.raises(HTTPException) as e:
+        upload(account)
+    assert e.value.status_code == 500
+    assert storage.objects == {}
@@ -0,0 +1,153 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.config import storage as storage_module
+from app.config.settings import settings
+from app.config.storage import AsyncStorageClient, StorageError
+from app.services import upload_service
+from app.services.receipt_service import RECEIPTS_BUCKET
+from app.services.upload_service import ResumableUploadService
+
+USER = "5f0c2a9e-8f7b-4a61-9d0e-1b2c3d4e5f60"
+STORAGE_URL = "https://project.supabase.co/storage/v1"
+UPSTREAM = f"{STORAGE_URL}/upload/resumable/u1"
+CHUNK = 4
+
+class FakeBucket:
+    """Supabase storage over HTTP: plain objects, plus one TUS upload that
+    takes only whole chunks before the last"""
+
+    def __init__(self, length: int):
+        self.length = length
+        self.received = bytearray()
+        self.objects = {}
+        self.patches = []
+        self.fail_next = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        if url == UPSTREAM:
+            if request.method == "HEAD":
+                return httpx.Response(200, headers={"Upload-Offset": str(len(self.received))})
+            body = request.read()
+            self.patches.append((int(request.headers["Upload-Offset"]), len(body)))
+            if self.fail_next:
+                # keep is how many bytes of this body land before the failure
+                keep = self.fail_next.pop(0)
+                self.received.extend(body[:keep])
+                return httpx.Response(503)
+            if int(request.headers["Upload-Offset"]) != len(self.received):
+                return httpx.Response(409)
+            if len(body) != CHUNK and len(self.received) + len(body) != self.length:
+                return httpx.Response(400, text="chunk size")
+            self.received.extend(body)
+            return httpx.Response(204, headers={"Upload-Offset": str(len(self.received))})
+
+        path = url.split(f"/object/{RECEIPTS_BUCKET}/", 1)[-1]
+        if request.method == "POST":
+            if path in self.objects and request.headers["x-upsert"] != "true":
+                return httpx.Response(400, text="exists")
+            self.objects[path] = request.read()
+            return httpx.Response(200)
+        if request.method in ("GET", "HEAD"):
+            if path not in self.objects:
+                return httpx.Response(400)
+            return httpx.Response(200, content=self.objects[path] if request.method == "GET" else b"",
+                                  headers={"Content-Length": str(len(self.objects[path]))})
+        if request.method == "DELETE":
+            for prefix in json.loads(request.read())["prefixes"]:
+                self.objects.pop(prefix, None)
+            return httpx.Response(200)
+        return httpx.Response(404)
+
+@pytest.fixture
+def bucket(monkeypatch):
+    def install(length):
+        fake = FakeBucket(length)
+        client = AsyncStorageClient(STORAGE_URL, "key")
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(fake.handle))
+        monkeypatch.setattr(settings, "STORAGE_CHUNK_SIZE", CHUNK)
+        monkeypatch.setattr(upload_service, "get_storage_client", lambda: client)
+
+        async def no_sleep(seconds):
+            pass
+        monkeypatch.setattr(storage_module, "asyncio", SimpleNamespace(sleep=no_sleep))
+        return fake
+    return install
+
+def upload_id(length):
+    return upload_service.create_signed_token(
+        {"sub": USER, "path": f"receipts/{USER}/r.pdf", "length": length, "upstream": UPSTREAM},
+        upload_service.UPLOAD_TOKEN_PURPOSE,
+        upload_service.timedelta(minutes=5),
+    )
+
+def patch(upload, offset, *parts):
+    async def body():
+        for part in parts:
+            yield part
+
+    return asyncio.run(ResumableUploadService.append(USER, upload, offset, body()))
+
+def head(upload):
+    return asyncio.run(ResumableUploadService.get_offset(USER, upload))
+
+def test_small_patches_advance_the_offset(bucket):
+    fake = bucket(10)
+    upload = upload_id(10)
+
+    assert patch(upload, 0, b"abc") == (3, 10, None)
+    assert head(upload) == (3, 10)
+    # The held bytes go out ahead of the next body, in whole chunks
+    assert patch(upload, 3, b"d", b"ef") == (6, 10, None)
+    assert bytes(fake.received) == b"abcd"
+    assert head(upload) == (6, 10)
+
+    offset, length, url = patch(upload, 6, b"ghij")
+    assert (offset, length) == (10, 10)
+    assert url.endswith(f"/{RECEIPTS_BUCKET}/receipts/{USER}/r.pdf")
+    assert bytes(fake.received) == b"abcdefghij"
+    # Every held tail was removed once sent
+    assert fake.objects == {}
+
+def test_offset_must_match_including_held_bytes(bucket):
+    bucket(10)
+    upload = upload_id(10)
+    patch(upload, 0, b"abcdef")
+    with pytest.raises(HTTPException) as e:
+        patch(upload, 4, b"efgh")
+    assert e.value.status_code == 409
+    assert head(upload) == (6, 10)
+
+def test_failed_chunk_is_resent_whole(bucket):
+    fake = bucket(8)
+    upload = upload_id(8)
+    fake.fail_next = [0]
+
+    assert patch(upload, 0, b"abcdefgh")[0] == 8
+    assert bytes(fake.received) == b"abcdefgh"
+    assert fake.patches == [(0, 4), (0, 4), (4, 4)]
+
+def test_chunk_that_landed_before_the_failure_is_not_resent(bucket):
+    fake = bucket(8)
+    upload = upload_id(8)
+    fake.fail_next = [4]
+
+    assert patch(upload, 0, b"abcdefgh")[0] == 8
+    assert fake.patches == [(0, 4), (4, 4)]
+
+def test_partly_kept_chunk_is_not_resumed_part_way(bucket):
+    fake = bucket(8)
+    fake.fail_next = [2]
+    client = upload_service.get_storage_client()
+
+    with pytest.raises(StorageError) as e:
+        asyncio.run(client.upload_chunk(UPSTREAM, 0, b"abcd"))
+    assert e.value.status == 409
+    # No short chunk was sent after the failure
+    assert fake.patches == [(0, 4)]
@@ -0,0 +1,86 @@
+import sys
+from types import ModuleType, SimpleNamespace
+
+import pytest
+
+import run
+from app.config.settings import settings
+
+@pytest.fixture
+def installed(monkeypatch):
+    """Pretend exactly the given optional packages are installed"""
+    def install(*names):
+        monkeypatch.setattr(run.importlib.util, "find_spec", lambda name: SimpleNamespace() if name in names else None)
+    return install
+
+def test_worker_count(monkeypatch):
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 3)
+    assert run.worker_count() == 3
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 0)
+    monkeypatch.setattr(run.os, "sched_getaffinity", lambda pid: {0, 1, 2, 3, 4, 5}, raising=False)
+    assert run.worker_count() == 6
+
+def test_event_loop_and_parser(installed):
+    installed("uvloop", "httptools")
+    assert run.event_loop_and_parser() == ("uvloop", "httptools")
+    installed()
+    assert run.event_loop_and_parser() == ("asyncio", "h11")
+
+def test_production_runs_uvicorn_workers_without_reload(monkeypatch, installed):
+    calls = []
+    monkeypatch.setattr(run.uvicorn, "run", lambda app, **options: calls.append((app, options)))
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 4)
+    monkeypatch.setattr(settings, "MAX_REQUESTS", 0)
+    monkeypatch.setattr(sys, "argv", ["run.py", "--production"])
+    installed("uvloop")
+
+    run.main()
+
+    [(app, options)] = calls
+    assert app == run.APP
+    assert "reload" not in options
+    assert (options["workers"], options["loop"], options["http"]) == (4, "uvloop", "h11")
+    assert options["backlog"] == settings.SERVER_BACKLOG
+    assert options["timeout_keep_alive"] == settings.KEEPALIVE_TIMEOUT
+    assert options["timeout_graceful_shutdown"] == settings.GRACEFUL_TIMEOUT
+    assert options["limit_max_requests"] is None
+
+def test_development_reloads_in_one_process(monkeypatch):
+    calls = []
+    monkeypatch.setattr(run.uvicorn, "run", lambda app, **options: calls.append(options))
+    monkeypatch.setattr(settings, "APP_ENV", "development")
+    monkeypatch.setattr(sys, "argv", ["run.py"])
+    run.main()
+    assert calls == [{"host": settings.HOST, "port": settings.PORT, "reload": True}]
+
+def test_production_preloads_the_app_under_gunicorn(monkeypatch, installed):
+    configured = {}
+
+    class BaseApplication:
+        def __init__(self):
+            self.cfg = SimpleNamespace(set=configured.__setitem__)
+            self.load_config()
+
+        def run(self):
+            configured["app"] = self.load()
+
+    base = ModuleType("gunicorn.app.base")
+    base.BaseApplication = BaseApplication
+    monkeypatch.setitem(sys.modules, "gunicorn", ModuleType("gunicorn"))
+    monkeypatch.setitem(sys.modules, "gunicorn.app", ModuleType("gunicorn.app"))
+    monkeypatch.setitem(sys.modules, "gunicorn.app.base", base)
+    monkeypatch.setattr(settings, "APP_ENV", "production")
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 2)
+    monkeypatch.setattr(settings, "MAX_REQUESTS", 1000)
+    monkeypatch.setattr(sys, "argv", ["run.py"])
+    installed("gunicorn")
+
+    run.main()
+
+    from app.main import app
+    assert configured["app"] is app
+    assert configured["workers"] == 2
+    assert configured["worker_class"] == "uvicorn.workers.UvicornWorker"
+    assert configured["preload_app"] is True
+    assert configured["graceful_timeout"] == settings.GRACEFUL_TIMEOUT
+    assert (configured["max_requests"], configured["max_requests_jitter"]) == (1000, 100)
@@ -0,0 +1,65 @@
+from app.utils.search_index import InvertedIndex, tokenize, trigrams
+
+FIELDS = {"name": 3.0, "description": 1.0}
+
+def build():
+    index = InvertedIndex(FIELDS)
+    index.add_many([
+        ("t1", {"name": "Coffee Shop", "description": "Morning latte"}),
+        ("t2", {"name": "Airline tickets", "description": "Flight to Berlin"}),
+        ("t3", {"name": "Office supplies", "description": "coffee filters"}),
+        ("t4", {"name": "Hotel Berlin", "description": None}),
+    ])
+    return index
+
+def ids(results):
+    return {doc_id for doc_id, _, _ in results}
+
+def ranked(results):
+    return [doc_id for doc_id, _, _ in sorted(results, key=lambda result: -result[1])]
+
+def test_tokenize_and_trigrams():
+    assert tokenize("Coffee, SHOP #12") == ["coffee", "shop", "12"]
+    assert tokenize(None) == []
+    assert trigrams("ab") == {"  a", " ab", "ab "}
+
+def test_exact_match_ranks_higher_weighted_field_first():
+    results = build().search("coffee")
+    assert ids(results) == {"t1", "t3"}
+    # In the name (weight 3) beats in the description (weight 1)
+    assert ranked(results) == ["t1", "t3"]
+
+def test_prefix_match():
+    assert ids(build().search("berl", fuzzy=False)) == {"t2", "t4"}
+
+def test_fuzzy_match_tolerates_typos():
+    index = build()
+    assert ids(index.search("cofee")) == {"t1", "t3"}
+    assert index.search("cofee", fuzzy=False) == []
+
+def test_every_term_must_match():
+    index = build()
+    assert ids(index.search("hotel berlin")) == {"t4"}
+    assert index.search("coffee berlin") == []
+    assert index.search("   ") == []
+
+def test_add_replaces_and_remove_forgets_tokens():
+    index = build()
+    index.add("t1", {"name": "Bakery", "description": None})
+    assert ids(index.search("coffee")) == {"t3"}
+    assert ids(index.search("bakery")) == {"t1"}
+
+    assert index.remove("t1")
+    assert not index.remove("t1")
+    assert index.search("bakery") == []
+    # Unused tokens leave the vocabulary, so they stop matching by prefix too
+    assert "bakery" not in index._postings
+    assert index.search("bak", fuzzy=False) == []
+    assert len(index) == 3
+
+def test_rarer_terms_score_higher():
+    index = InvertedIndex({"name": 1.0})
+    index.add_many([(f"common{i}", {"name": "taxi"}) for i in range(5)] + [("rare", {"name": "ferry"})])
+    taxi = index.search("taxi")[0][1]
+    ferry = index.search("ferry")[0][1]
+    assert ferry > taxi
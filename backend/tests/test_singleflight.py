@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+from app.utils.singleflight import SingleFlight
+
+KEY = ("u1", "dashboard", "month")
+
+class Computation:
+    """Counts calls and holds each one until released"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        call = self.calls
+        await self.release.wait()
+        return f"result {call}"
+
+def test_concurrent_calls_share_one_computation():
+    async def main():
+        flight = SingleFlight()
+        compute = Computation()
+        callers = [asyncio.create_task(flight.do(KEY, compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        compute.release.set()
+        results = await asyncio.gather(*callers)
+        return compute.calls, results
+
+    calls, results = asyncio.run(main())
+    assert calls == 1
+    assert results == ["result 1"] * 3
+
+def test_cancelled_caller_leaves_computation_running():
+    async def main():
+        flight = SingleFlight(ttl=60)
+        compute = Computation()
+        first = asyncio.create_task(flight.do(KEY, compute))
+        second = asyncio.create_task(flight.do(KEY, compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        compute.release.set()
+        result = await second
+        # The finished computation was cached despite its first caller leaving
+        cached = await flight.do(KEY, compute)
+        return first.cancelled(), result, cached, compute.calls
+
+    first_cancelled, result, cached, calls = asyncio.run(main())
+    assert first_cancelled
+    assert result == cached == "result 1"
+    assert calls == 1
+
+def test_results_are_cached_for_ttl_and_dropped_on_invalidate():
+    async def main():
+        flight = SingleFlight(ttl=60)
+        compute = Computation()
+        compute.release.set()
+        first = await flight.do(KEY, compute)
+        second = await flight.do(KEY, compute)
+        other = await flight.do(("u2",) + KEY[1:], compute)
+        flight.invalidate_account("u1")
+        third = await flight.do(KEY, compute)
+        return first, second, other, third
+
+    assert asyncio.run(main()) == ("result 1", "result 1", "result 2", "result 3")
+
+def test_without_ttl_only_in_flight_work_is_shared():
+    async def main():
+        flight = SingleFlight()
+        compute = Computation()
+        compute.release.set()
+        return await flight.do(KEY, compute), await flight.do(KEY, compute)
+
+    assert asyncio.run(main()) == ("result 1", "result 2")
+
+def test_invalidate_detaches_in_flight_computation():
+    async def main():
+        flight = SingleFlight(ttl=60)
+        stale = Computation()
+        before = asyncio.create_task(flight.do(KEY, stale))
+        await asyncio.sleep(0)
+        # A write lands while the computation is reading
+        flight.invalidate_account("u1")
+
+        fresh = Computation()
+        fresh.release.set()
+        after = await flight.do(KEY, fresh)
+        stale.release.set()
+        stale_result = await before
+        # The detached result must not have replaced the fresh one in the cache
+        cached = await flight.do(KEY, fresh)
+        return stale_result, after, cached, fresh.calls
+
+    stale_result, after, cached, fresh_calls = asyncio.run(main())
+    assert stale_result == "result 1"
+    assert after == cached == "result 1"
+    assert fresh_calls == 1
+
+def test_errors_reach_every_caller_and_are_not_cached():
+    async def main():
+        flight = SingleFlight(ttl=60)
+        calls = 0
+
+        async def fail():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(flight.do(KEY, fail), flight.do(KEY, fail), return_exceptions=True)
+        with pytest.raises(ValueError):
+            await flight.do(KEY, fail)
+        return results, calls
+
+    results, calls = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert calls == 2
+
+def test_per_call_ttl_overrides_default():
+    async def main():
+        flight = SingleFlight(ttl=0)
+        compute = Computation()
+        compute.release.set()
+        first = await flight.do(KEY, compute, ttl=60)
+        second = await flight.do(KEY, compute)
+        return first, second
+
+    assert asyncio.run(main()) == ("result 1", "result 1")
@@ -0,0 +1,65 @@
+from datetime import date
+
+import pytest
+
+from app.services.analytics_service import AnalyticsService
+
+GRAPH = {
+    "card_budgets_by_id": {
+        "cb1": {"id": "cb1", "card_id": "c1", "budget_id": "b1"},
+        "cb2": {"id": "cb2", "card_id": "c2", "budget_id": "b1"},
+    },
+    "cards_by_id": {"c1": {"name": "Travel card"}, "c2": {"name": "Office card"}},
+    "budgets_by_id": {"b1": {"name": "Operations"}},
+}
+
+TRANSACTIONS = [
+    {"date": "2024-01-01T09:00:00", "amount": 10.0, "card_budget_id": "cb1", "category": "travel"},
+    {"date": "2024-01-01T18:30:00", "amount": 5.25, "card_budget_id": "cb2", "category": None},
+    {"date": "2024-01-09", "amount": 20.0, "card_budget_id": "cb1", "category": "travel"},
+    {"date": "2024-02-29", "amount": 7.0, "card_budget_id": "cb2", "category": "office"},
+    # Outside the range, and on an unknown card_budget
+    {"date": "2023-12-31", "amount": 99.0, "card_budget_id": "cb1", "category": "travel"},
+    {"date": "2024-01-02", "amount": 1.0, "card_budget_id": "gone", "category": "travel"},
+]
+
+def test_daily_buckets_include_both_ends():
+    starts = AnalyticsService._bucket_starts(date(2024, 2, 27), date(2024, 3, 1), "day")
+    assert starts == [date(2024, 2, 27), date(2024, 2, 28), date(2024, 2, 29), date(2024, 3, 1)]
+
+def test_weekly_buckets_start_on_monday():
+    # 2024-01-03 is a Wednesday
+    starts = AnalyticsService._bucket_starts(date(2024, 1, 3), date(2024, 1, 15), "week")
+    assert starts == [date(2024, 1, 1), date(2024, 1, 8), date(2024, 1, 15)]
+
+def test_monthly_buckets_cross_years():
+    starts = AnalyticsService._bucket_starts(date(2023, 11, 20), date(2024, 2, 3), "month")
+    assert starts == [date(2023, 11, 1), date(2023, 12, 1), date(2024, 1, 1), date(2024, 2, 1)]
+
+def test_empty_buckets_are_filled():
+    result = AnalyticsService._build_timeseries(GRAPH, [], "year", date(2024, 1, 1), date(2024, 3, 31), "month")
+    assert result.buckets == ["2024-01-01", "2024-02-01", "2024-03-01"]
+    assert result.totals == [0.0, 0.0, 0.0]
+    assert result.series == []
+
+@pytest.mark.parametrize("interval, totals", [
+    ("month", [36.25, 7.0]),
+    ("week", [16.25, 20.0] + [0.0] * 6 + [7.0]),
+])
+def test_totals_per_bucket(interval, totals):
+    result = AnalyticsService._build_timeseries(GRAPH, TRANSACTIONS, "year", date(2024, 1, 1), date(2024, 2, 29), interval)
+    assert result.totals == totals
+
+def test_split_by_card_sorted_by_total():
+    result = AnalyticsService._build_timeseries(GRAPH, TRANSACTIONS, "year", date(2024, 1, 1), date(2024, 2, 29), "month", "card")
+    assert [(s.key, s.label, s.values, s.total) for s in result.series] == [
+        ("c1", "Travel card", [30.0, 0.0], 30.0),
+        ("c2", "Office card", [5.25, 7.0], 12.25),
+    ]
+    # Transactions on unknown card_budgets still count towards the totals
+    assert result.totals == [36.25, 7.0]
+
+def test_split_by_category_labels_missing_category():
+    result = AnalyticsService._build_timeseries(GRAPH, TRANSACTIONS, "year", date(2024, 1, 1), date(2024, 2, 29), "month", "category")
+    labels = {s.key: s.label for s in result.series}
+    assert labels == {"travel": "travel", "": "Uncategorized", "office": "office"}
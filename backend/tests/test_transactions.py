@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.transaction import TransactionCreate
+from app.services.transaction_service import TransactionService
+from fakes import add_transaction, create_transaction, seed_account
+
+@pytest.fixture
+def accounts(db):
+    db.functions["create_transaction"] = create_transaction
+    mine, theirs = seed_account(db), seed_account(db)
+    for account in (mine, theirs):
+        account.card_budget_id = account.card_budget_ids[(account.card_ids[0], account.budget_ids[0])]
+        account.transaction = add_transaction(db, account, account.card_budget_id, 10.0)
+    return mine, theirs
+
+def spend(account, card_budget_id, amount=5.0):
+    transaction = TransactionCreate(card_budget_id=card_budget_id, amount=amount, name="Lunch")
+    return asyncio.run(TransactionService.create_transaction(account.account_id, transaction))
+
+def test_created_transactions_carry_the_account(db, accounts):
+    mine, _ = accounts
+    created = spend(mine, mine.card_budget_id)
+    row = next(row for row in db.tables["transactions"] if row["id"] == created.id)
+    assert row["account_id"] == mine.account_id
+    assert (created.card_id, created.budget_id) == (mine.card_ids[0], mine.budget_ids[0])
+
+def test_another_accounts_card_budget_is_refused(db, accounts):
+    mine, theirs = accounts
+    with pytest.raises(HTTPException) as e:
+        spend(mine, theirs.card_budget_id)
+    assert e.value.status_code == 403
+    assert len(db.tables["transactions"]) == 2
+
+def test_reads_filter_on_the_account_alone(db, accounts):
+    mine, theirs = accounts
+    db.queries.clear()
+    listed = asyncio.run(TransactionService.get_transactions(mine.account_id))
+    assert [t.id for t in listed] == [mine.transaction["id"]]
+    # One transactions query, no walk through cards and card_budgets beyond the cached graph
+    assert db.count("transactions") == 1
+    assert db.count("card_budgets") == 1
+
+    # Filters naming another account's card match nothing, without a query
+    db.queries.clear()
+    assert asyncio.run(TransactionService.get_transactions(mine.account_id, card_id=theirs.card_ids[0])) == []
+    assert db.count("transactions") == 0
+
+def test_writes_only_match_the_accounts_own_rows(db, accounts):
+    mine, theirs = accounts
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(TransactionService.delete_transaction(mine.account_id, theirs.transaction["id"]))
+    assert e.value.status_code == 404
+
+    edit = TransactionCreate(card_budget_id=mine.card_budget_id, amount=1.0, name="Edited")
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(TransactionService.update_transaction(mine.account_id, theirs.transaction["id"], edit))
+    assert e.value.status_code == 400
+
+    row = next(row for row in db.tables["transactions"] if row["id"] == theirs.transaction["id"])
+    assert (row["name"], row["amount"], row["account_id"]) == ("Purchase", 10.0, theirs.account_id)
@@ -179,71 +179,29 @@ export default function DashboardPage() {
         try {
             console.log('Fetching dashboard data...')
 
-            // Always fetch fresh data on initial load (ignore cache for now)
-            const promises = [
-                api.get(API_URLS.CARDS)
-                    .then(response => {
-                        if (!response.ok) throw new Error('Failed to fetch cards')
-                        return response.json()
-                    })
-                    .then(data => {
-                        console.log('Cards loaded:', data)
-                        setCards(data)
-                        setCardsLoading(false)
-                    })
-                    .catch(error => {
-                        console.error('Error fetching cards:', error)
-                        setCardsLoading(false)
-                    }),
-
-                api.get(`${API_URLS.ANALYTICS_BALANCES}?period=${selectedTimePeriod}`)
-                    .then(response => {
-                        if (!response.ok) throw new Error('Failed to fetch balances')
-                        return response.json()
-                    })
-                    .then(data => {
-                        console.log('Balances loaded:', data)
-                        setBalances(data)
-                        setBalancesLoading(false)
-                    })
-                    .catch(error => {
-                        console.error('Error fetching balances:', error)
-                        setBalancesLoading(false)
-                    }),
-
-                api.get(`${API_URLS.ANALYTICS_SPENDING}?period=${selectedTimePeriod}`)
-                    .then(response => {
-                        if (!response.ok) throw new Error('Failed to fetch analytics')
-                        return response.json()
-                    })
-                    .then(data => {
-                        console.log('Analytics loaded:', data)
-                        setSpendingAnalytics(data)
-                        setAnalyticsLoading(false)
-                    })
-                    .catch(error => {
-                        console.error('Error fetching analytics:', error)
-                        setAnalyticsLoading(false)
-                    }),
-
-                api.get(`${API_URLS.ANALYTICS_RECENT_TRANSACTIONS}?limit=10`)
-                    .then(response => {
-                        if (!response.ok) throw new Error('Failed to fetch transactions')
-                        return response.json()
-                    })
-                    .then(data => {
-                        console.log('Transactions loaded:', data)
-                        setRecentTransactions(data)
-                        setTransactionsLoading(false)
-                    })
-                    .catch(error => {
-                        console.error('Error fetching transactions:', error)
-                        setTransactionsLoading(false)
-                    })
-            ]
-
-            // Wait for all promises to complete
-            await Promise.all(promises)
+            // One request returns cards, balances, spending and recent transactions
+            // computed from a single server-side snapshot of the account
+            await api.get(`${API_URLS.ANALYTICS_DASHBOARD}?period=${selectedTimePeriod}&recent_limit=10`)
+                .then(response => {
+                    if (!response.ok) throw new Error('Failed to fetch dashboard')
+                    return response.json()
+                })
+                .then(data => {
+                    console.log('Dashboard loaded:', data)
+                    setCards(data.cards)
+                    setBalances(data.balances)
+                    setSpendingAnalytics(data.spending)
+                    setRecentTransactions(data.recent_transactions)
+                })
+                .catch(error => {
+                    console.error('Error fetching dashboard:', error)
+                })
+                .finally(() => {
+                    setCardsLoading(false)
+                    setBalancesLoading(false)
+                    setAnalyticsLoading(false)
+                    setTransactionsLoading(false)
+                })
 
             console.log('All data loaded, setting isLoading to false')
             setIsLoading(false)
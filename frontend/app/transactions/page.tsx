@@ -4,6 +4,7 @@ import { useState, useEffect } from 'react'
 import { Plus, Filter, ArrowLeftRight, Edit, Trash2 } from 'lucide-react'
 import DashboardLayout from '../../components/DashboardLayout'
 import TransactionModal from '../../components/TransactionModal'
+import { COLUMNAR_MEDIA_TYPE, decodeColumnar } from '../../config'
 
 interface Transaction {
     id: string
@@ -67,13 +68,14 @@ export default function TransactionsPage() {
 
             const response = await fetch(url, {
                 headers: {
-                    'Authorization': `Bearer ${token}`
+                    'Authorization': `Bearer ${token}`,
+                    'Accept': COLUMNAR_MEDIA_TYPE
                 }
             })
 
             if (response.ok) {
                 const data = await response.json()
-                setTransactions(data)
+                setTransactions(decodeColumnar<Transaction>(data))
             } else {
                 console.error('Failed to fetch transactions')
             }
@@ -28,6 +28,7 @@ export const API_CONFIG = {
         ANALYTICS_BALANCES: '/api/analytics/balances',
         ANALYTICS_SPENDING: '/api/analytics/spending',
         ANALYTICS_RECENT_TRANSACTIONS: '/api/analytics/transactions/recent',
+        ANALYTICS_DASHBOARD: '/api/analytics/dashboard',
 
         // Card budgets endpoints
         CARD_BUDGETS: '/api/card-budgets',
@@ -77,6 +78,7 @@ export const API_URLS = {
     ANALYTICS_BALANCES: buildApiUrl(API_CONFIG.ENDPOINTS.ANALYTICS_BALANCES),
     ANALYTICS_SPENDING: buildApiUrl(API_CONFIG.ENDPOINTS.ANALYTICS_SPENDING),
     ANALYTICS_RECENT_TRANSACTIONS: buildApiUrl(API_CONFIG.ENDPOINTS.ANALYTICS_RECENT_TRANSACTIONS),
+    ANALYTICS_DASHBOARD: buildApiUrl(API_CONFIG.ENDPOINTS.ANALYTICS_DASHBOARD),
 
     // Card budgets URLs
     CARD_BUDGETS: buildApiUrl(API_CONFIG.ENDPOINTS.CARD_BUDGETS),
@@ -138,4 +140,27 @@ export const api = {
     delete: (url: string) => apiRequest(url, {
         method: 'DELETE',
     }),
-}; 
\ No newline at end of file
+}; 
+// Columnar transaction listings
+// Request with `Accept: application/vnd.takeback.columnar+json` and decode the
+// parallel column arrays (dictionary-encoded ID columns) back into row objects.
+export const COLUMNAR_MEDIA_TYPE = 'application/vnd.takeback.columnar+json';
+
+export const decodeColumnar = <T = Record<string, any>>(payload: {
+    count: number;
+    columns: Record<string, any[]>;
+    dictionaries: Record<string, any[]>;
+}): T[] => {
+    const names = Object.keys(payload.columns);
+    const rows: T[] = new Array(payload.count);
+    for (let i = 0; i < payload.count; i++) {
+        const row: Record<string, any> = {};
+        for (const name of names) {
+            const value = payload.columns[name][i];
+            const dictionary = payload.dictionaries[name];
+            row[name] = dictionary && value !== null ? dictionary[value] : value;
+        }
+        rows[i] = row as T;
+    }
+    return rows;
+};